@@ -0,0 +1,75 @@
+from logging.config import fileConfig
+
+from sqlalchemy import engine_from_config
+from sqlalchemy import pool
+
+from alembic import context
+
+from app.config import settings
+from app.database.database import Base, sync_database_url
+from app.models import models  # noqa: F401  (registers the tables on Base.metadata)
+
+config = context.config
+# Migrations always run on the sync driver, even when DATABASE_URL names an async one
+config.set_main_option(
+    "sqlalchemy.url",
+    sync_database_url(settings.DATABASE_URL).render_as_string(hide_password=False).replace("%", "%%"),
+)
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# The full-text index (migration 0010) lives outside the ORM metadata; on SQLite
+# FTS5 also creates response_search_* shadow tables next to it
+UNMANAGED_TABLE_PREFIX = "response_search"
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from proposing drops for tables the ORM does not describe."""
+    if type_ == "table" and reflected and compare_to is None and name.startswith(UNMANAGED_TABLE_PREFIX):
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    """Run migrations in 'offline' mode, emitting SQL for the configured URL."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    """Run migrations in 'online' mode against a live connection."""
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+
+    with connectable.connect() as connection:
+        # Batch mode lets ALTER TABLE operations work on SQLite
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=True,
+            include_object=include_object,
+        )
+
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,90 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Create the original tables unless app startup already did."""
+    if not _has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String()),
+            sa.Column("username", sa.String()),
+            sa.Column("password", sa.String()),
+            sa.Column("full_name", sa.String()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+
+    if not _has_table("surveys"):
+        op.create_table(
+            "surveys",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("title", sa.String()),
+            sa.Column("description", sa.String(), nullable=True),
+        )
+        op.create_index("ix_surveys_id", "surveys", ["id"])
+        op.create_index("ix_surveys_title", "surveys", ["title"])
+
+    if not _has_table("questions"):
+        op.create_table(
+            "questions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id")),
+            sa.Column("question_text", sa.String()),
+            sa.Column("question_type", sa.String()),
+            sa.Column("options", sa.String(), nullable=True),
+            sa.Column("required", sa.Integer()),
+            sa.Column("order", sa.Integer()),
+        )
+        op.create_index("ix_questions_id", "questions", ["id"])
+
+    if not _has_table("question_options"):
+        op.create_table(
+            "question_options",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id")),
+            sa.Column("option_text", sa.String()),
+            sa.Column("is_correct", sa.Integer()),
+        )
+        op.create_index("ix_question_options_id", "question_options", ["id"])
+
+    if not _has_table("responses"):
+        op.create_table(
+            "responses",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id")),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("response_data", sa.JSON()),
+        )
+        op.create_index("ix_responses_id", "responses", ["id"])
+
+
+def downgrade() -> None:
+    """Drop the original tables."""
+    op.drop_table("responses")
+    op.drop_table("question_options")
+    op.drop_table("questions")
+    op.drop_table("surveys")
+    op.drop_table("users")
@@ -0,0 +1,36 @@
+"""add surveys.schema_version
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Version counter used to key compiled validators and caches."""
+    if not _has_column("surveys", "schema_version"):
+        with op.batch_alter_table("surveys") as batch_op:
+            batch_op.add_column(
+                sa.Column("schema_version", sa.Integer(), nullable=False, server_default="1")
+            )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("surveys") as batch_op:
+        batch_op.drop_column("schema_version")
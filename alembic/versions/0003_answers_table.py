@@ -0,0 +1,167 @@
+"""normalized answers table with backfill
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+import json
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+questions = sa.table(
+    "questions",
+    sa.column("id", sa.Integer),
+    sa.column("options", sa.String),
+)
+question_options = sa.table(
+    "question_options",
+    sa.column("id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("option_text", sa.String),
+    sa.column("is_correct", sa.Integer),
+)
+responses = sa.table(
+    "responses",
+    sa.column("id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("response_data", sa.JSON),
+)
+answers = sa.table(
+    "answers",
+    sa.column("response_id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("option_id", sa.Integer),
+    sa.column("value_text", sa.String),
+    sa.column("value_number", sa.Float),
+    sa.column("value_date", sa.Date),
+)
+
+
+def _has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def _typed_values(question_type, value):
+    value_text = value if isinstance(value, str) or value is None else json.dumps(value)
+    value_number = None
+    value_date = None
+    if value is not None and question_type == "number" and not isinstance(value, bool):
+        try:
+            value_number = float(value)
+        except (TypeError, ValueError):
+            pass
+    elif value is not None and question_type == "date":
+        try:
+            value_date = date.fromisoformat(str(value)[:10])
+        except ValueError:
+            pass
+    return {"value_text": value_text, "value_number": value_number, "value_date": value_date}
+
+
+def _backfill_question_options(bind) -> None:
+    """Create QuestionOption rows for questions whose options only live in the JSON column."""
+    has_rows = sa.select(question_options.c.id).where(
+        question_options.c.question_id == questions.c.id
+    ).exists()
+    rows = []
+    for question_id, options in bind.execute(
+        sa.select(questions.c.id, questions.c.options).where(
+            questions.c.options.isnot(None), ~has_rows
+        )
+    ):
+        try:
+            parsed = json.loads(options)
+        except ValueError:
+            continue
+        if isinstance(parsed, list):
+            rows.extend(
+                {"question_id": question_id, "option_text": str(option), "is_correct": 0}
+                for option in parsed
+            )
+    if rows:
+        bind.execute(question_options.insert(), rows)
+
+
+def _backfill_answers(bind) -> None:
+    option_ids = {
+        (question_id, option_text): option_id
+        for option_id, question_id, option_text in bind.execute(
+            sa.select(question_options.c.id, question_options.c.question_id, question_options.c.option_text)
+        )
+    }
+    # Responses written by the app after the table existed already have answer rows
+    has_answers = sa.select(answers.c.response_id).where(
+        answers.c.response_id == responses.c.id
+    ).exists()
+
+    last_id = 0
+    while True:
+        batch = bind.execute(
+            sa.select(responses.c.id, responses.c.survey_id, responses.c.response_data)
+            .where(responses.c.id > last_id, ~has_answers)
+            .order_by(responses.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not batch:
+            break
+
+        rows = []
+        for response_id, survey_id, response_data in batch:
+            for data in (response_data or {}).values():
+                if not isinstance(data, dict) or data.get("question_id") is None:
+                    continue
+                values = data.get("answer")
+                for value in values if isinstance(values, list) else [values]:
+                    row = _typed_values(data.get("question_type"), value)
+                    row.update(
+                        response_id=response_id,
+                        survey_id=survey_id,
+                        question_id=data["question_id"],
+                        option_id=option_ids.get((data["question_id"], value)) if isinstance(value, str) else None,
+                    )
+                    rows.append(row)
+        if rows:
+            bind.execute(answers.insert(), rows)
+        last_id = batch[-1][0]
+
+
+def upgrade() -> None:
+    """Add the answers table and fill it from existing response_data blobs."""
+    if not _has_table("answers"):
+        op.create_table(
+            "answers",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("response_id", sa.Integer(), sa.ForeignKey("responses.id"), nullable=False),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("question_id", sa.Integer(), sa.ForeignKey("questions.id"), nullable=False),
+            sa.Column("option_id", sa.Integer(), sa.ForeignKey("question_options.id"), nullable=True),
+            sa.Column("value_text", sa.String(), nullable=True),
+            sa.Column("value_number", sa.Float(), nullable=True),
+            sa.Column("value_date", sa.Date(), nullable=True),
+        )
+        op.create_index("ix_answers_id", "answers", ["id"])
+        op.create_index("ix_answers_response_id", "answers", ["response_id"])
+        op.create_index("ix_answers_survey_question", "answers", ["survey_id", "question_id"])
+        op.create_index("ix_answers_question_option", "answers", ["question_id", "option_id"])
+
+    bind = op.get_bind()
+    _backfill_question_options(bind)
+    _backfill_answers(bind)
+
+
+def downgrade() -> None:
+    op.drop_table("answers")
@@ -0,0 +1,32 @@
+"""index answers by question and numeric value
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_index(table: str, name: str) -> bool:
+    return name in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Serves MIN/MAX and percentile lookups for number questions."""
+    if not _has_index("answers", "ix_answers_question_number"):
+        op.create_index("ix_answers_question_number", "answers", ["question_id", "value_number"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_answers_question_number", table_name="answers")
@@ -0,0 +1,134 @@
+"""incrementally maintained survey_stats counters
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 09:40:00.000000
+
+"""
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of the counter rules at this revision (app.services.stats)
+CHOICE_TYPES = ("multiple_choice", "checkbox")
+SURVEY_TOTAL = 0
+QUESTION_BUCKET = ""
+
+questions = sa.table(
+    "questions",
+    sa.column("id", sa.Integer),
+    sa.column("question_type", sa.String),
+)
+responses = sa.table(
+    "responses",
+    sa.column("id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+)
+answers = sa.table(
+    "answers",
+    sa.column("id", sa.Integer),
+    sa.column("response_id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("value_text", sa.String),
+    sa.column("value_number", sa.Float),
+    sa.column("value_date", sa.Date),
+)
+survey_stats = sa.table(
+    "survey_stats",
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("bucket", sa.String),
+    sa.column("count", sa.Integer),
+    sa.column("value_count", sa.Integer),
+    sa.column("value_sum", sa.Float),
+)
+
+
+def _backfill_stats(bind) -> None:
+    """Compute every survey's counters from responses and answers."""
+    rows = defaultdict(lambda: [0, 0, 0.0])
+
+    totals = sa.select(responses.c.survey_id, sa.func.count(responses.c.id)).group_by(responses.c.survey_id)
+    for survey_id, count in bind.execute(totals):
+        rows[(survey_id, SURVEY_TOTAL, QUESTION_BUCKET)][0] = count
+
+    per_question = sa.select(
+        answers.c.survey_id,
+        answers.c.question_id,
+        sa.func.count(sa.distinct(answers.c.response_id)),
+        sa.func.count(answers.c.value_number),
+        sa.func.coalesce(sa.func.sum(answers.c.value_number), 0.0),
+    ).group_by(answers.c.survey_id, answers.c.question_id)
+    for survey_id, question_id, answered, value_count, value_sum in bind.execute(per_question):
+        rows[(survey_id, question_id, QUESTION_BUCKET)] = [answered, value_count, value_sum]
+
+    per_value = sa.select(
+        answers.c.survey_id,
+        answers.c.question_id,
+        questions.c.question_type,
+        answers.c.value_text,
+        answers.c.value_date,
+        sa.func.count(answers.c.id),
+    ).select_from(
+        answers.join(questions, questions.c.id == answers.c.question_id)
+    ).where(
+        questions.c.question_type.in_(CHOICE_TYPES + ("date",))
+    ).group_by(
+        answers.c.survey_id, answers.c.question_id, questions.c.question_type, answers.c.value_text, answers.c.value_date
+    )
+    for survey_id, question_id, question_type, value_text, value_date, count in bind.execute(per_value):
+        if question_type in CHOICE_TYPES:
+            bucket = value_text
+        elif value_date is not None:
+            bucket = value_date.strftime("%Y-%m")
+        else:
+            continue
+        rows[(survey_id, question_id, bucket)][0] += count
+
+    if rows:
+        bind.execute(survey_stats.insert(), [
+            {
+                "survey_id": survey_id,
+                "question_id": question_id,
+                "bucket": bucket,
+                "count": count,
+                "value_count": value_count,
+                "value_sum": value_sum,
+            }
+            for (survey_id, question_id, bucket), (count, value_count, value_sum) in rows.items()
+        ])
+
+
+def upgrade() -> None:
+    """Create survey_stats and fill it from the existing answers."""
+    if not sa.inspect(op.get_bind()).has_table("survey_stats"):
+        op.create_table(
+            "survey_stats",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("question_id", sa.Integer(), nullable=False),
+            sa.Column("bucket", sa.String(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("value_count", sa.Integer(), nullable=False),
+            sa.Column("value_sum", sa.Float(), nullable=False),
+            sa.UniqueConstraint("survey_id", "question_id", "bucket", name="uq_survey_stats_key"),
+        )
+        op.create_index("ix_survey_stats_id", "survey_stats", ["id"])
+
+    bind = op.get_bind()
+    bind.execute(survey_stats.delete())
+    _backfill_stats(bind)
+
+
+def downgrade() -> None:
+    op.drop_table("survey_stats")
@@ -0,0 +1,44 @@
+"""response versions for in-place editing
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 09:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add responses.version and the append-only response_versions history."""
+    inspector = sa.inspect(op.get_bind())
+    if "version" not in {c["name"] for c in inspector.get_columns("responses")}:
+        with op.batch_alter_table("responses") as batch_op:
+            batch_op.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+
+    if not inspector.has_table("response_versions"):
+        op.create_table(
+            "response_versions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("response_id", sa.Integer(), sa.ForeignKey("responses.id"), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+            sa.Column("response_data", sa.JSON()),
+            sa.UniqueConstraint("response_id", "version", name="uq_response_versions_response_version"),
+        )
+        op.create_index("ix_response_versions_id", "response_versions", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("response_versions")
+    with op.batch_alter_table("responses") as batch_op:
+        batch_op.drop_column("version")
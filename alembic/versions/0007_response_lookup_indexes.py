@@ -0,0 +1,37 @@
+"""composite indexes for survey and user response listings
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, Sequence[str], None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "ix_responses_survey_id_id": ["survey_id", "id"],
+    "ix_responses_survey_user_id": ["survey_id", "user_id", "id"],
+    "ix_responses_user_id_id": ["user_id", "id"],
+}
+
+
+def upgrade() -> None:
+    """Keyset pagination of responses by survey, by user, and by both."""
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("responses")}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "responses", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="responses")
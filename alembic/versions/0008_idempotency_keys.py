@@ -0,0 +1,41 @@
+"""idempotency keys for response submissions
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 10:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add idempotency_keys with a unique key and an expiry index for purging."""
+    if sa.inspect(op.get_bind()).has_table("idempotency_keys"):
+        return
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("request_hash", sa.String(), nullable=False),
+        sa.Column("response_id", sa.Integer(), sa.ForeignKey("responses.id"), nullable=True),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("response_body", sa.JSON(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("key"),
+    )
+    op.create_index("ix_idempotency_keys_id", "idempotency_keys", ["id"])
+    op.create_index("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("idempotency_keys")
@@ -0,0 +1,78 @@
+"""survey schema snapshots referenced by responses
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add survey_schema_versions, snapshot every survey's current form, and point
+    responses at snapshots. Existing responses keep their text-keyed data with a
+    NULL schema_version_id, which readers still understand."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if not inspector.has_table("survey_schema_versions"):
+        op.create_table(
+            "survey_schema_versions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("survey_id", sa.Integer(), sa.ForeignKey("surveys.id"), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("questions", sa.JSON(), nullable=False),
+            sa.UniqueConstraint("survey_id", "version", name="uq_survey_schema_versions_survey_version"),
+        )
+        op.create_index("ix_survey_schema_versions_id", "survey_schema_versions", ["id"])
+
+    for table in ("responses", "response_versions"):
+        if "schema_version_id" not in {c["name"] for c in inspector.get_columns(table)}:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.add_column(sa.Column("schema_version_id", sa.Integer(), nullable=True))
+                batch_op.create_foreign_key(
+                    f"fk_{table}_schema_version_id", "survey_schema_versions", ["schema_version_id"], ["id"]
+                )
+
+    metadata = sa.MetaData()
+    surveys = sa.Table("surveys", metadata, autoload_with=bind)
+    questions = sa.Table("questions", metadata, autoload_with=bind)
+    snapshots = sa.Table("survey_schema_versions", metadata, autoload_with=bind)
+
+    existing = set(bind.execute(sa.select(snapshots.c.survey_id, snapshots.c.version)).all())
+    by_survey = {}
+    for row in bind.execute(
+        sa.select(questions).order_by(questions.c.survey_id, questions.c.order, questions.c.id)
+    ).mappings():
+        by_survey.setdefault(row["survey_id"], []).append({
+            "id": row["id"],
+            "question_text": row["question_text"],
+            "question_type": row["question_type"],
+            "options": row["options"],
+            "required": row["required"],
+            "order": row["order"],
+        })
+    rows = [
+        {"survey_id": survey_id, "version": version or 1, "questions": by_survey.get(survey_id, [])}
+        for survey_id, version in bind.execute(sa.select(surveys.c.id, surveys.c.schema_version))
+        if (survey_id, version or 1) not in existing
+    ]
+    if rows:
+        bind.execute(snapshots.insert(), rows)
+
+
+def downgrade() -> None:
+    for table in ("response_versions", "responses"):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_constraint(f"fk_{table}_schema_version_id", type_="foreignkey")
+            batch_op.drop_column("schema_version_id")
+    op.drop_table("survey_schema_versions")
@@ -0,0 +1,95 @@
+"""full-text index over text answers
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 14:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+
+# Frozen copies of the index definition at this revision (app.services.search)
+TEXT_TYPES = ("short_text", "long_text", "text")
+
+SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS response_search "
+        "USING fts5(content, survey_id UNINDEXED, tokenize = 'porter unicode61')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS response_search ("
+        "response_id INTEGER PRIMARY KEY REFERENCES responses (id), "
+        "survey_id INTEGER NOT NULL, "
+        "content TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_response_search_document "
+        "ON response_search USING GIN (to_tsvector('english', content))",
+        "CREATE INDEX IF NOT EXISTS ix_response_search_survey_id ON response_search (survey_id)",
+    ],
+}
+
+# On SQLite the FTS5 rowid is the response id
+KEY_COLUMNS = {"sqlite": "rowid", "postgresql": "response_id"}
+
+questions = sa.table(
+    "questions",
+    sa.column("id", sa.Integer),
+    sa.column("question_type", sa.String),
+)
+answers = sa.table(
+    "answers",
+    sa.column("id", sa.Integer),
+    sa.column("response_id", sa.Integer),
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("value_text", sa.String),
+)
+
+
+def _backfill_search(bind) -> None:
+    """Index each response's text answers as one document."""
+    insert = sa.text(
+        f"INSERT INTO response_search ({KEY_COLUMNS[bind.dialect.name]}, survey_id, content) "
+        "VALUES (:response_id, :survey_id, :content)"
+    )
+    rows = bind.execute(
+        sa.select(answers.c.survey_id, answers.c.response_id, answers.c.value_text)
+        .select_from(answers.join(questions, questions.c.id == answers.c.question_id))
+        .where(questions.c.question_type.in_(TEXT_TYPES), answers.c.value_text.isnot(None), answers.c.value_text != "")
+        .order_by(answers.c.response_id, answers.c.id)
+    ).all()
+
+    documents = []
+    for survey_id, response_id, value_text in rows:
+        if documents and documents[-1]["response_id"] == response_id:
+            documents[-1]["content"] += "\n" + value_text
+        else:
+            documents.append({"response_id": response_id, "survey_id": survey_id, "content": value_text})
+    for start in range(0, len(documents), BATCH_SIZE):
+        bind.execute(insert, documents[start:start + BATCH_SIZE])
+
+
+def upgrade() -> None:
+    """Create response_search and index the existing text answers."""
+    bind = op.get_bind()
+    if bind.dialect.name not in SEARCH_DDL:
+        return
+    for statement in SEARCH_DDL[bind.dialect.name]:
+        bind.execute(sa.text(statement))
+    bind.execute(sa.text("DELETE FROM response_search"))
+    _backfill_search(bind)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name in SEARCH_DDL:
+        op.execute("DROP TABLE IF EXISTS response_search")
@@ -0,0 +1,35 @@
+"""index answers by question and text / date value
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, Sequence[str], None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_index(table: str, name: str) -> bool:
+    return name in {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Serves answer filters on text and date questions."""
+    if not _has_index("answers", "ix_answers_question_text"):
+        op.create_index("ix_answers_question_text", "answers", ["question_id", "value_text"])
+    if not _has_index("answers", "ix_answers_question_date"):
+        op.create_index("ix_answers_question_date", "answers", ["question_id", "value_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_answers_question_date", table_name="answers")
+    op.drop_index("ix_answers_question_text", table_name="answers")
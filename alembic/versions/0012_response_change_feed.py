@@ -0,0 +1,70 @@
+"""response timestamps and the response_changes feed
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, Sequence[str], None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add created_at/updated_at to responses and start the change feed with one
+    insert per existing response, so a consumer polling from 0 sees everything.
+    Existing rows are stamped with the migration time."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    columns = {c["name"] for c in inspector.get_columns("responses")}
+    for name in ("created_at", "updated_at"):
+        if name not in columns:
+            op.add_column("responses", sa.Column(name, sa.DateTime(), nullable=True))
+    responses = sa.table(
+        "responses", sa.column("id"), sa.column("survey_id"), sa.column("version"),
+        sa.column("created_at"), sa.column("updated_at"),
+    )
+    bind.execute(responses.update().where(responses.c.created_at.is_(None)).values(created_at=now))
+    bind.execute(responses.update().where(responses.c.updated_at.is_(None)).values(updated_at=now))
+
+    if not inspector.has_table("response_changes"):
+        op.create_table(
+            "response_changes",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("response_id", sa.Integer(), nullable=False),
+            sa.Column("survey_id", sa.Integer(), nullable=False),
+            sa.Column("operation", sa.String(), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("changed_at", sa.DateTime(), nullable=False),
+        )
+        op.create_index("ix_response_changes_id", "response_changes", ["id"])
+        op.create_index("ix_response_changes_survey_id_id", "response_changes", ["survey_id", "id"])
+
+        changes = sa.table(
+            "response_changes", sa.column("response_id"), sa.column("survey_id"),
+            sa.column("operation"), sa.column("version"), sa.column("changed_at"),
+        )
+        bind.execute(changes.insert().from_select(
+            ["response_id", "survey_id", "operation", "version", "changed_at"],
+            sa.select(
+                responses.c.id, responses.c.survey_id, sa.literal("insert"), responses.c.version, sa.literal(now)
+            ).order_by(responses.c.id),
+        ))
+
+
+def downgrade() -> None:
+    op.drop_table("response_changes")
+    with op.batch_alter_table("responses") as batch_op:
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("created_at")
@@ -0,0 +1,43 @@
+"""jobs table for the background job runner
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, Sequence[str], None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("jobs"):
+        op.create_table(
+            "jobs",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("job_type", sa.String(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("params", sa.JSON(), nullable=False),
+            sa.Column("progress", sa.Float(), nullable=False),
+            sa.Column("cancel_requested", sa.Boolean(), nullable=False),
+            sa.Column("error", sa.String(), nullable=True),
+            sa.Column("result", sa.JSON(), nullable=True),
+            sa.Column("result_path", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("started_at", sa.DateTime(), nullable=True),
+            sa.Column("finished_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_jobs_id", "jobs", ["id"])
+        op.create_index("ix_jobs_status", "jobs", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_table("jobs")
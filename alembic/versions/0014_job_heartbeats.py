@@ -0,0 +1,29 @@
+"""jobs.heartbeat_at, refreshed while a job runs
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-18 18:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0014"
+down_revision: Union[str, Sequence[str], None] = "0013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    columns = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("jobs")}
+    if "heartbeat_at" not in columns:
+        op.add_column("jobs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("heartbeat_at")
@@ -0,0 +1,91 @@
+"""survey_stats buckets for number answers, used for percentiles
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-18 19:10:00.000000
+
+"""
+import math
+from collections import defaultdict
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0015"
+down_revision: Union[str, Sequence[str], None] = "0014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of the bucket rule at this revision (app.services.stats.number_bucket)
+NUMBER_BUCKET_DIGITS = 3
+QUESTION_BUCKET = ""
+
+questions = sa.table(
+    "questions",
+    sa.column("id", sa.Integer),
+    sa.column("question_type", sa.String),
+)
+answers = sa.table(
+    "answers",
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("value_number", sa.Float),
+)
+survey_stats = sa.table(
+    "survey_stats",
+    sa.column("survey_id", sa.Integer),
+    sa.column("question_id", sa.Integer),
+    sa.column("bucket", sa.String),
+    sa.column("count", sa.Integer),
+    sa.column("value_count", sa.Integer),
+    sa.column("value_sum", sa.Float),
+)
+
+
+def _number_bucket(value):
+    if not math.isfinite(value):
+        return None
+    return f"{float(f'{value:.{NUMBER_BUCKET_DIGITS}g}') + 0.0:.{NUMBER_BUCKET_DIGITS}g}"
+
+
+def _number_question_ids():
+    return sa.select(questions.c.id).where(questions.c.question_type == "number")
+
+
+def upgrade() -> None:
+    """Count every number question's answers per rounded value."""
+    bind = op.get_bind()
+    bind.execute(survey_stats.delete().where(
+        survey_stats.c.question_id.in_(_number_question_ids()), survey_stats.c.bucket != QUESTION_BUCKET
+    ))
+
+    counts = defaultdict(int)
+    for survey_id, question_id, value, count in bind.execute(
+        sa.select(answers.c.survey_id, answers.c.question_id, answers.c.value_number, sa.func.count())
+        .where(answers.c.question_id.in_(_number_question_ids()), answers.c.value_number.isnot(None))
+        .group_by(answers.c.survey_id, answers.c.question_id, answers.c.value_number)
+    ):
+        bucket = _number_bucket(value)
+        if bucket is not None:
+            counts[(survey_id, question_id, bucket)] += count
+    if counts:
+        bind.execute(survey_stats.insert(), [
+            {
+                "survey_id": survey_id,
+                "question_id": question_id,
+                "bucket": bucket,
+                "count": count,
+                "value_count": 0,
+                "value_sum": 0.0,
+            }
+            for (survey_id, question_id, bucket), count in counts.items()
+        ])
+
+
+def downgrade() -> None:
+    op.get_bind().execute(survey_stats.delete().where(
+        survey_stats.c.question_id.in_(_number_question_ids()), survey_stats.c.bucket != QUESTION_BUCKET
+    ))
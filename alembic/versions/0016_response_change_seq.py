@@ -0,0 +1,51 @@
+"""commit-ordered seq cursor on response_changes
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-18 19:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0016"
+down_revision: Union[str, Sequence[str], None] = "0015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+response_changes = sa.table("response_changes", sa.column("id", sa.Integer), sa.column("seq", sa.Integer))
+
+
+def upgrade() -> None:
+    """Add seq and keep every existing cursor valid by numbering existing changes with their id."""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if "seq" not in {c["name"] for c in inspector.get_columns("response_changes")}:
+        op.add_column("response_changes", sa.Column("seq", sa.Integer(), nullable=True))
+    bind.execute(response_changes.update().where(response_changes.c.seq.is_(None)).values(seq=response_changes.c.id))
+
+    indexes = {index["name"] for index in inspector.get_indexes("response_changes")}
+    if "ix_response_changes_survey_id_id" in indexes:
+        op.drop_index("ix_response_changes_survey_id_id", table_name="response_changes")
+    if "ix_response_changes_seq" not in indexes:
+        op.create_index("ix_response_changes_seq", "response_changes", ["seq"], unique=True)
+    if "ix_response_changes_survey_id_seq" not in indexes:
+        op.create_index("ix_response_changes_survey_id_seq", "response_changes", ["survey_id", "seq"])
+    if "ix_response_changes_unsequenced" not in indexes:
+        op.create_index(
+            "ix_response_changes_unsequenced", "response_changes", ["id"],
+            postgresql_where=sa.text("seq IS NULL"), sqlite_where=sa.text("seq IS NULL"),
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_response_changes_unsequenced", table_name="response_changes")
+    op.drop_index("ix_response_changes_survey_id_seq", table_name="response_changes")
+    op.drop_index("ix_response_changes_seq", table_name="response_changes")
+    op.create_index("ix_response_changes_survey_id_id", "response_changes", ["survey_id", "id"])
+    with op.batch_alter_table("response_changes") as batch_op:
+        batch_op.drop_column("seq")
@@ -0,0 +1,40 @@
+"""never reuse response ids on SQLite
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0017"
+down_revision: Union[str, Sequence[str], None] = "0016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _recreate_responses(autoincrement: bool) -> None:
+    # SQLite only sets AUTOINCREMENT when a table is created, so batch mode copies
+    # the table; copied ids seed sqlite_sequence with the current maximum
+    with op.batch_alter_table(
+        "responses", recreate="always", table_kwargs={"sqlite_autoincrement": autoincrement}
+    ):
+        pass
+
+
+def upgrade() -> None:
+    """Rebuild responses with AUTOINCREMENT so the id of a deleted newest response is not handed out again.
+
+    Other databases already use sequences that never go back.
+    """
+    if op.get_bind().dialect.name == "sqlite":
+        _recreate_responses(True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "sqlite":
+        _recreate_responses(False)
@@ -1,9 +1,63 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./test.db"
     
+    # Connection pool (ignored for in-memory SQLite, which uses a single connection)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a pooled connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    
+    # SQLite connection tuning applied by a connect hook
+    SQLITE_PERFORMANCE_MODE: bool = True
+    SQLITE_CACHE_SIZE_KB: int = 65536
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    
+    VALIDATOR_CACHE_SIZE: int = 256
+    SCHEMA_SNAPSHOT_CACHE_SIZE: int = 1024
+    SURVEY_CACHE_SIZE: int = 1024
+    SURVEY_CACHE_TTL: float = 300.0  # Seconds a cached survey definition stays valid
+    
+    IDEMPOTENCY_KEY_TTL: int = 86400  # Seconds a stored Idempotency-Key result is replayed
+    
+    # Write-behind ingestion: POST /responses/ submissions are committed in groups by one writer
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_BATCH_SIZE: int = 500  # Flush once this many submissions are waiting
+    WRITE_BEHIND_FLUSH_MS: float = 10.0  # ... or once the oldest has waited this long
+    WRITE_BEHIND_QUEUE_SIZE: int = 10000  # Submissions buffered before backpressure applies
+    WRITE_BEHIND_OVERFLOW: str = "wait"  # "wait" up to WRITE_BEHIND_ENQUEUE_TIMEOUT for room, or "reject" at once
+    WRITE_BEHIND_ENQUEUE_TIMEOUT: float = 1.0  # Seconds; a full queue then answers 429
+    
+    # Build plain dicts for large read endpoints and encode them with orjson
+    FAST_JSON_RESPONSES: bool = False
+    
+    # Password hashing runs in a dedicated process pool
+    BCRYPT_ROUNDS: int = 12  # Hashes below this cost are upgraded on the next login
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 32  # Waiting operations allowed before answering 429
+    
+    # Background jobs (exports, counter rebuilds, bulk imports) run in a dedicated process pool
+    JOB_WORKERS: int = 2
+    JOB_TYPE_LIMITS: Dict[str, int] = {"export": 2, "rebuild_stats": 1, "bulk_import": 1}  # Jobs of a type running at once
+    JOB_RESULTS_DIR: str = "./job_results"  # Result files, one per job
+    JOB_HEARTBEAT_INTERVAL: float = 10.0  # Seconds between heartbeats of a running job
+    JOB_STALE_AFTER: float = 120.0  # A running job silent this long is failed at the next startup
+    
+    # Live results over Server-Sent Events (GET /surveys/{id}/live)
+    LIVE_UPDATE_INTERVAL: float = 1.0  # Seconds; at most one frame per survey per interval
+    LIVE_MAX_RESPONSES_PER_FRAME: int = 100  # Beyond this a frame carries only the count and cursor
+    LIVE_SUBSCRIBER_BUFFER: int = 16  # Unsent frames per viewer before it is told to resync
+    LIVE_KEEPALIVE_INTERVAL: float = 15.0  # Seconds between comment frames on an idle stream
+    
+    # Per-request instrumentation (Server-Timing header and /metrics)
+    METRICS_ENABLED: bool = False
+    METRICS_SAMPLE_RATE: float = 1.0  # Fraction of requests that are measured
+    
     class Config:
         env_file = ".env"
 
@@ -1,13 +1,71 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+# DATABASE_URL may name either a sync or an async driver; both engines are derived from it
+SYNC_DRIVERS = {"sqlite": "sqlite", "postgresql": "postgresql+psycopg2"}
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def _with_driver(url, drivers):
+    url = make_url(url)
+    driver = drivers.get(url.get_backend_name())
+    return url.set(drivername=driver) if driver else url
+
+def sync_database_url(url):
+    return _with_driver(url, SYNC_DRIVERS)
+
+def async_database_url(url):
+    return _with_driver(url, ASYNC_DRIVERS)
+
+def engine_options(url):
+    """Pool sizing from Settings; in-memory SQLite keeps its single-connection pool"""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+def sqlite_pragmas():
+    return [
+        # WAL lets readers run alongside the single writer instead of blocking on it
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in sqlite_pragmas():
+        cursor.execute(pragma)
+    cursor.close()
+
+def configure_engine(sync_engine):
+    """Install the SQLite connect hook on a (sync or async-backing) engine"""
+    if sync_engine.dialect.name == "sqlite" and settings.SQLITE_PERFORMANCE_MODE:
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    return sync_engine
+
+SQLALCHEMY_DATABASE_URL = sync_database_url(settings.DATABASE_URL)
+ASYNC_DATABASE_URL = async_database_url(settings.DATABASE_URL)
+
+engine = configure_engine(create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL)))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+configure_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -15,4 +73,34 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def insert_returning_ids(db, model, rows):
+    """Insert rows with a single executemany and return their primary keys in row order
+
+    Most dialects (e.g. PostgreSQL) batch the insert with ordered RETURNING.
+    SQLite cannot order RETURNING rows, so the first row is inserted alone with RETURNING;
+    that takes the database write lock for the rest of the transaction, so every
+    id above it belongs to the remaining rows of this batch.
+    """
+    if not rows:
+        return []
+    table = model.__table__
+    if db.get_bind().dialect.name != "sqlite":
+        result = db.execute(
+            insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        )
+        return list(result.scalars())
+
+    first_id = db.execute(insert(table).returning(table.c.id), rows[0]).scalar_one()
+    if len(rows) == 1:
+        return [first_id]
+    db.execute(insert(table), rows[1:])
+    later_ids = db.execute(
+        select(table.c.id).where(table.c.id > first_id).order_by(table.c.id)
+    ).scalars().all()
+    return [first_id, *later_ids]
@@ -1,16 +1,71 @@
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session
-import json
-from app.database.database import get_db, Base, engine
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.sql import ColumnElement
+from app.config import settings
+from app.database.database import get_db, get_async_db, Base, SessionLocal, async_engine, engine
 from app.models import models
+from app.routes.api import router as api_router
 from app.schemas import schemas
-from typing import List, Dict
+from app.services import analytics as analytics_service
+from app.services import changes as change_service
+from app.services import edits as edit_service
+from app.services import export as export_service
+from app.services import idempotency as idempotency_service
+from app.services import ingest as ingest_service
+from app.services import jobs as job_service
+from app.services import metrics
+from app.services.cache import etag_matches, survey_cache
+from app.services.edits import VersionConflict, parse_if_match, response_etag
+from app.services.filters import FilterError, compile_filter, matching_response_ids
+from app.services.live import live_results, live_snapshot, sse_frame
+from app.services.passwords import password_hasher
+from app.services import responses as response_service
+from app.services import search as search_service
+from app.services import surveys as survey_service
+from app.services.serialization import FastJSONResponse
+from app.services.stats import CHOICE_TYPES
+from app.services.snapshots import get_snapshots, render_response_data
+from app.services.validation import AnswerValidationError, get_survey_validator, invalidate_survey_validator
+from app.services.write_behind import WriteBehindSaturated, response_writer
+from contextlib import asynccontextmanager
+import os
+from typing import List, Dict, Optional
+
+FILTER_DESCRIPTION = 'Answer filter, e.g. "Years of experience?" > 5 AND "Preferred programming languages?" = "Python"'
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Survey API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up jobs a previous process queued but never finished
+    with SessionLocal() as db:
+        await run_in_threadpool(job_service.job_runner.recover, db)
+    yield
+    # Commit submissions still waiting in the write-behind queue
+    await response_writer.stop()
+    job_service.job_runner.shutdown()
+    password_hasher.shutdown()
+
+app = FastAPI(title="Survey API", version="1.0.0", lifespan=lifespan)
+
+# Per-request latency, SQL and serialization timings (Server-Timing header and /metrics);
+# when disabled, routes are left unwrapped and /metrics does not exist
+if settings.METRICS_ENABLED:
+    app.router.route_class = metrics.TimedRoute
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    app.add_middleware(metrics.MetricsMiddleware, sample_rate=settings.METRICS_SAMPLE_RATE)
+    
+    @app.get("/metrics", include_in_schema=False)
+    def read_metrics():
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 # User endpoints
 @app.get("/users/", response_model=List[schemas.User])
@@ -20,138 +75,494 @@ def read_users(db: Session = Depends(get_db)):
 
 # Survey endpoints
 @app.post("/surveys/", response_model=schemas.Survey)
-def create_survey(survey: schemas.SurveyCreate, db: Session = Depends(get_db)):
-    # Create the survey
-    db_survey = models.Survey(title=survey.title, description=survey.description)
-    db.add(db_survey)
-    db.commit()
-    db.refresh(db_survey)
-    
-    # Add questions
-    for question in survey.questions:
-        db_question = models.Question(
-            survey_id=db_survey.id,
-            question_text=question.question_text,
-            question_type=question.question_type,
-            options=question.options,
-            required=question.required,
-            order=question.order
+async def create_survey(survey: schemas.SurveyCreate, db: AsyncSession = Depends(get_async_db)):
+    # Create the survey with its questions and options
+    survey_id = await db.run_sync(survey_service.create_survey, survey)
+    await db.commit()
+    return await db.run_sync(survey_service.load_survey, survey_id)
+
+@app.get("/surveys/{survey_id}", response_model=schemas.Survey)
+async def get_survey(
+    survey_id: int,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Serve the pre-serialized definition when cached
+    cached = survey_cache.get(survey_id)
+    if cached is None:
+        # Read before loading, so an invalidation while we load is not overwritten with stale data
+        generation = survey_cache.generation(survey_id)
+        survey = await db.run_sync(survey_service.load_survey, survey_id)
+        if survey is None:
+            raise HTTPException(status_code=404, detail="Survey not found")
+        cached = survey_cache.set(
+            survey_id, schemas.Survey.model_validate(survey).model_dump_json().encode(), generation
         )
-        db.add(db_question)
     
-    db.commit()
-    db.refresh(db_survey)
-    return db_survey
+    if etag_matches(if_none_match, cached.etag):
+        return Response(status_code=304, headers={"ETag": cached.etag})
+    return Response(content=cached.body, media_type="application/json", headers={"ETag": cached.etag})
 
-@app.get("/surveys/{survey_id}", response_model=schemas.Survey)
-def get_survey(survey_id: int, db: Session = Depends(get_db)):
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
+@app.post("/questions/", response_model=schemas.Question)
+async def create_question(question: schemas.QuestionCreate, db: AsyncSession = Depends(get_async_db)):
+    survey = await db.get(models.Survey, question.survey_id)
     if survey is None:
         raise HTTPException(status_code=404, detail="Survey not found")
-    return survey
-
-@app.post("/questions/", response_model=schemas.Question)
-def create_question(question: schemas.QuestionCreate, db: Session = Depends(get_db)):
-    db_question = models.Question(**question.dict())
-    db.add(db_question)
-    db.commit()
-    db.refresh(db_question)
-    return db_question
+    
+    question_id = await db.run_sync(survey_service.add_question, survey, question)
+    await db.commit()
+    invalidate_survey_validator(survey.id)
+    survey_cache.invalidate(survey.id)
+    return await db.run_sync(survey_service.load_question, question_id)
 
 @app.post("/responses/", response_model=schemas.ResponseResponse)
-def create_response(response: schemas.ResponseCreate, db: Session = Depends(get_db)):
+async def create_response(
+    response: schemas.ResponseCreate,
+    http_response: Response,
+    idempotency_key: Optional[str] = Header(default=None, max_length=255),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # A retried request with the same Idempotency-Key gets the stored result back
+    if idempotency_key is not None:
+        fingerprint = idempotency_service.request_fingerprint(response)
+        stored = await lookup_idempotent_result(db, idempotency_key, fingerprint)
+        if stored is not None:
+            return stored
+        try:
+            await db.run_sync(idempotency_service.claim, idempotency_key, fingerprint)
+        except IntegrityError:
+            # A concurrent request with the same key committed first
+            await db.rollback()
+            stored = await lookup_idempotent_result(db, idempotency_key, fingerprint)
+            if stored is not None:
+                return stored
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+    
     # Verify survey exists
-    survey = db.query(models.Survey).filter(models.Survey.id == response.survey_id).first()
+    survey = await db.get(models.Survey, response.survey_id)
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
     
-    # Get all questions for the survey
-    questions = db.query(models.Question).filter(
-        models.Question.survey_id == response.survey_id
-    ).order_by(models.Question.order).all()
-    
-    # Create a map of question text to question object for validation
-    question_map = {q.question_text: q for q in questions}
-    
-    # Validate that all required questions are answered
-    for question in questions:
-        if question.required:
-            found = False
-            for answer in response.answers:
-                if answer.question_text == question.question_text:
-                    found = True
-                    break
-            if not found:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Required question not answered: {question.question_text}"
-                )
-    
-    # Format response data
-    response_data = {}
-    for answer in response.answers:
-        # Verify question exists in survey
-        if answer.question_text not in question_map:
+    # Validate answers against the survey's compiled question rules
+    validator = await db.run_sync(get_survey_validator, survey)
+    try:
+        response_data = validator.validate(response.answers)
+    except AnswerValidationError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    if settings.WRITE_BEHIND_ENABLED and idempotency_key is None:
+        # Hand the connection back while the submission waits for its group commit; a schema
+        # snapshot the validator just created must be committed before the writer refers to it
+        await db.commit()
+        await db.close()
+        try:
+            response_id = await response_writer.submit(validator, response.user_id, response_data)
+        except WriteBehindSaturated:
             raise HTTPException(
-                status_code=400,
-                detail=f"Question not found in survey: {answer.question_text}"
+                status_code=429,
+                detail="Too many submissions waiting to be written, retry later",
+                headers={"Retry-After": "1"}
             )
-        
-        question = question_map[answer.question_text]
-        
-        # Validate answer based on question type
-        if question.question_type == "multiple_choice":
-            if question.options:
-                valid_options = json.loads(question.options)
-                if isinstance(answer.answer, list):
-                    for option in answer.answer:
-                        if option not in valid_options:
-                            raise HTTPException(
-                                status_code=400,
-                                detail=f"Invalid option for question '{answer.question_text}': {option}"
-                            )
-                elif answer.answer not in valid_options:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Invalid option for question '{answer.question_text}': {answer.answer}"
-                    )
-        
-        response_data[question.question_text] = {
-            "question_id": question.id,
-            "question_type": question.question_type,
-            "answer": answer.answer,
-            "options": question.options
-        }
-    
-    # Create response in database
-    db_response = models.Response(
-        survey_id=response.survey_id,
-        user_id=response.user_id,
-        response_data=response_data
-    )
-    db.add(db_response)
-    db.commit()
-    db.refresh(db_response)
+    else:
+        # Store the response together with its normalized answer rows
+        response_id, = await db.run_sync(
+            ingest_service.insert_responses, validator, [(response.user_id, response_data)]
+        )
+    result = schemas.ResponseResponse(
+        message="Response submitted successfully",
+        response=schemas.Response(
+            id=response_id,
+            survey_id=response.survey_id,
+            user_id=response.user_id,
+            response_data=render_response_data(response_data, validator.snapshot),
+            version=1
+        )
+    )
+    if idempotency_key is not None:
+        await db.run_sync(
+            idempotency_service.complete, idempotency_key, response_id, 200, result.model_dump(mode="json")
+        )
+    await db.commit()
+    live_results.publish_validated(validator, [(response_id, response.user_id, response_data)])
     
+    http_response.headers["ETag"] = response_etag(1)
+    return result
+
+async def lookup_idempotent_result(db: AsyncSession, key: str, fingerprint: str) -> Optional[Response]:
+    try:
+        stored = await db.run_sync(idempotency_service.lookup, key, fingerprint)
+    except idempotency_service.IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except idempotency_service.IdempotencyKeyInFlight:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+    if stored is None:
+        return None
+    return JSONResponse(
+        content=stored.response_body,
+        status_code=stored.status_code,
+        headers={"ETag": response_etag(1), "Idempotent-Replayed": "true"}
+    )
+
+async def apply_response_edit(
+    db: AsyncSession,
+    response_id: int,
+    update: schemas.ResponseUpdate,
+    if_match: Optional[str],
+    partial: bool,
+    http_response: Response
+) -> schemas.ResponseResponse:
+    db_response = await db.get(models.Response, response_id)
+    if not db_response:
+        raise HTTPException(status_code=404, detail="Response not found")
+    
+    # Optimistic concurrency: the client must have edited the current version
+    expected_versions = parse_if_match(if_match)
+    if expected_versions is not None and str(db_response.version) not in expected_versions:
+        raise HTTPException(status_code=412, detail="Response has been modified since it was read")
+    
+    survey = await db.get(models.Survey, db_response.survey_id)
+    validator = await db.run_sync(get_survey_validator, survey)
+    try:
+        await db.run_sync(edit_service.update_response, validator, db_response, update.answers, partial)
+    except AnswerValidationError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(exc))
+    except VersionConflict:
+        await db.rollback()
+        raise HTTPException(status_code=412, detail="Response has been modified since it was read")
+    await db.commit()
+    await db.refresh(db_response)
+    
+    http_response.headers["ETag"] = response_etag(db_response.version)
+    rendered, = await db.run_sync(response_service.render_responses, [db_response])
     return schemas.ResponseResponse(
-        message="Response submitted successfully",
-        response=db_response
+        message="Response updated successfully",
+        response=rendered
+    )
+
+@app.put("/responses/{response_id}", response_model=schemas.ResponseResponse)
+async def replace_response(
+    response_id: int,
+    update: schemas.ResponseUpdate,
+    http_response: Response,
+    if_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Replace every answer of the response
+    return await apply_response_edit(db, response_id, update, if_match, False, http_response)
+
+@app.patch("/responses/{response_id}", response_model=schemas.ResponseResponse)
+async def patch_response(
+    response_id: int,
+    update: schemas.ResponseUpdate,
+    http_response: Response,
+    if_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Change only the answers present in the request
+    return await apply_response_edit(db, response_id, update, if_match, True, http_response)
+
+@app.delete("/responses/{response_id}", status_code=204)
+async def delete_response(
+    response_id: int,
+    if_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_response = await db.get(models.Response, response_id)
+    if not db_response:
+        raise HTTPException(status_code=404, detail="Response not found")
+    
+    expected_versions = parse_if_match(if_match)
+    if expected_versions is not None and str(db_response.version) not in expected_versions:
+        raise HTTPException(status_code=412, detail="Response has been modified since it was read")
+    
+    # Answers, counters, search document and history go with it; the change feed records the delete
+    survey = await db.get(models.Survey, db_response.survey_id)
+    validator = await db.run_sync(get_survey_validator, survey)
+    try:
+        await db.run_sync(edit_service.delete_response, validator, db_response)
+    except VersionConflict:
+        await db.rollback()
+        raise HTTPException(status_code=412, detail="Response has been modified since it was read")
+    await db.commit()
+    return Response(status_code=204)
+
+@app.get("/changes", response_model=schemas.ChangeFeed)
+async def get_changes(
+    after: int = Query(default=0, ge=0, description="Return changes with a sequence number above this cursor"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    survey_id: Optional[int] = Query(default=None, description="Only changes to this survey's responses"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Inserted, edited and deleted responses in commit order, for incremental sync
+    await db.run_sync(change_service.sequence_changes)
+    await db.commit()
+    changes, next_cursor, has_more = await db.run_sync(change_service.fetch_changes, after, limit, survey_id)
+    return schemas.ChangeFeed(changes=changes, next_cursor=next_cursor, has_more=has_more)
+
+@app.get("/surveys/{survey_id}/live", response_class=StreamingResponse)
+async def stream_live_results(survey_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Server-Sent Events: a "snapshot" event, then one "responses" event per update interval
+    # with the submissions committed since, or "resync" when the client fell too far behind
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    # Subscribe before reading the snapshot so no submission falls between the two
+    queue = live_results.subscribe(survey_id)
+    try:
+        snapshot = await db.run_sync(live_snapshot, survey_id)
+        # The stream can stay open for hours; it must not hold a connection
+        await db.close()
+    except BaseException:
+        live_results.unsubscribe(survey_id, queue)
+        raise
+    return StreamingResponse(
+        live_results.stream(survey_id, queue, sse_frame("snapshot", snapshot, id=snapshot["cursor"])),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Also runs when the client leaves before the stream started
+        background=BackgroundTask(live_results.unsubscribe, survey_id, queue)
+    )
+
+@app.get("/responses/{response_id}/versions", response_model=schemas.ResponseHistory)
+async def get_response_versions(response_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_response = await db.get(models.Response, response_id)
+    if not db_response:
+        raise HTTPException(status_code=404, detail="Response not found")
+    
+    versions = (await db.scalars(
+        select(models.ResponseVersion).where(
+            models.ResponseVersion.response_id == response_id
+        ).order_by(models.ResponseVersion.version)
+    )).all()
+    snapshots = await db.run_sync(get_snapshots, [version.schema_version_id for version in versions])
+    return schemas.ResponseHistory(
+        response_id=response_id,
+        current_version=db_response.version,
+        versions=[
+            schemas.ResponseVersion(
+                version=version.version,
+                user_id=version.user_id,
+                response_data=render_response_data(version.response_data, snapshots.get(version.schema_version_id))
+            ) for version in versions
+        ]
+    )
+
+@app.post("/surveys/{survey_id}/responses:bulk", response_model=schemas.BulkIngestResponse)
+async def bulk_create_responses(survey_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Verify survey exists
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    # Validate and insert the upload chunk by chunk, one transaction per chunk
+    validator = await db.run_sync(get_survey_validator, survey)
+    ingestor = ingest_service.BulkIngestor(
+        validator, on_commit=lambda rows: live_results.publish_validated(validator, rows)
+    )
+    results = []
+    async for chunk in ingest_service.iter_bulk_chunks(request):
+        results.extend(await db.run_sync(ingestor.ingest_chunk, chunk))
+    
+    accepted = sum(1 for result in results if result.status == "accepted")
+    return schemas.BulkIngestResponse(
+        message="Bulk upload processed",
+        accepted=accepted,
+        rejected=len(results) - accepted,
+        results=results
+    )
+
+def compile_answer_filter(expression: Optional[str], questions: List[models.Question]) -> Optional[ColumnElement]:
+    # Questions must have question_options loaded
+    if expression is None:
+        return None
+    try:
+        return compile_filter(expression, questions)
+    except FilterError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid filter: {exc}")
+
+async def load_survey_questions(db: AsyncSession, survey_id: int) -> List[models.Question]:
+    return (await db.scalars(
+        select(models.Question).options(
+            selectinload(models.Question.question_options)
+        ).where(
+            models.Question.survey_id == survey_id
+        ).order_by(models.Question.order)
+    )).all()
+
+@app.get("/surveys/{survey_id}/summary", response_model=schemas.SurveySummary)
+async def get_survey_summary(
+    survey_id: int,
+    filter: Optional[str] = Query(default=None, max_length=2000, description=FILTER_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    questions = await load_survey_questions(db, survey_id)
+    condition = compile_answer_filter(filter, questions)
+    return await db.run_sync(analytics_service.summarize_survey, survey, questions, condition)
+
+@app.get("/surveys/{survey_id}/crosstab", response_model=schemas.Crosstab)
+async def get_survey_crosstab(
+    survey_id: int,
+    row: int = Query(description="Question id whose options label the rows"),
+    column: int = Query(description="Question id whose options label the columns"),
+    filter: Optional[str] = Query(default=None, max_length=2000, description=FILTER_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    questions = await load_survey_questions(db, survey_id)
+    by_id = {question.id: question for question in questions}
+    if row not in by_id or column not in by_id:
+        raise HTTPException(status_code=404, detail="Question not found in survey")
+    if by_id[row].question_type not in CHOICE_TYPES or by_id[column].question_type not in CHOICE_TYPES:
+        raise HTTPException(status_code=400, detail="Cross-tabs need multiple_choice or checkbox questions")
+    
+    condition = compile_answer_filter(filter, questions)
+    return await db.run_sync(analytics_service.crosstab, survey, by_id[row], by_id[column], condition)
+
+@app.get("/surveys/{survey_id}/export")
+async def export_survey_responses(
+    survey_id: int,
+    format: str = Query(default="csv", pattern="^(csv|parquet|arrow)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    questions = (await db.scalars(
+        select(models.Question).where(
+            models.Question.survey_id == survey_id
+        ).order_by(models.Question.order)
+    )).all()
+    
+    try:
+        writer = export_service.ExportWriter(format, questions)
+    except export_service.ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    # Typed columns, encoded and sent one cursor chunk at a time
+    return StreamingResponse(
+        export_service.stream_export(db, survey_id, writer),
+        media_type=export_service.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="survey_{survey_id}_responses.{format}"'}
+    )
+
+@app.get("/surveys/{survey_id}/responses/search", response_model=schemas.SearchResults)
+async def search_survey_responses(
+    survey_id: int,
+    q: str = Query(min_length=1, max_length=500, description="Words that text answers must contain"),
+    after: Optional[str] = Query(default=None, description="next_cursor of the previous page"),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    # Best matches first, paged by (score, response id)
+    try:
+        results, next_cursor = await db.run_sync(search_service.search_responses, survey_id, q, after, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except search_service.SearchUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    return schemas.SearchResults(query=q, results=results, next_cursor=next_cursor)
+
+@app.get("/surveys/{survey_id}/users/{user_id}/responses", response_model=schemas.ResponseList)
+async def get_user_survey_responses(
+    survey_id: int,
+    user_id: int,
+    after: Optional[int] = Query(default=None, description="Return responses with an id greater than this cursor"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    survey = await db.get(models.Survey, survey_id)
+    if not survey:
+        raise HTTPException(status_code=404, detail="Survey not found")
+    
+    responses, next_cursor = await db.run_sync(
+        response_service.fetch_response_page, survey_id, after, limit, user_id
+    )
+    return schemas.ResponseList(
+        responses=await db.run_sync(response_service.render_responses, responses),
+        next_cursor=next_cursor
+    )
+
+@app.get("/users/{user_id}/responses", response_model=schemas.ResponseList)
+async def get_user_responses(
+    user_id: int,
+    after: Optional[int] = Query(default=None, description="Return responses with an id greater than this cursor"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    # Responses across every survey the user answered
+    responses, next_cursor = await db.run_sync(
+        response_service.fetch_response_page, None, after, limit, user_id
+    )
+    return schemas.ResponseList(
+        responses=await db.run_sync(response_service.render_responses, responses),
+        next_cursor=next_cursor
     )
 
 @app.get("/responses/{survey_id}", response_model=schemas.SurveyResponseDetail)
-def get_survey_responses(survey_id: int, db: Session = Depends(get_db)):
+async def get_survey_responses(
+    survey_id: int,
+    after: Optional[int] = Query(default=None, description="Return responses with an id greater than this cursor"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    format: str = Query(default="json", pattern="^(json|ndjson|csv)$"),
+    filter: Optional[str] = Query(default=None, max_length=2000, description=FILTER_DESCRIPTION),
+    db: AsyncSession = Depends(get_async_db)
+):
     # Get the survey
-    survey = db.query(models.Survey).filter(models.Survey.id == survey_id).first()
+    survey = await db.get(models.Survey, survey_id)
     if not survey:
         raise HTTPException(status_code=404, detail="Survey not found")
     
-    # Get all responses for the survey
-    responses = db.query(models.Response).filter(models.Response.survey_id == survey_id).all()
-    
     # Get questions in order
-    questions = db.query(models.Question).filter(
-        models.Question.survey_id == survey_id
-    ).order_by(models.Question.order).all()
+    questions = await load_survey_questions(db, survey_id)
+    condition = compile_answer_filter(filter, questions)
+    
+    # Streaming modes write rows as they are read from a server-side cursor
+    if format == "ndjson":
+        return StreamingResponse(
+            response_service.stream_ndjson(db, survey_id, after, condition),
+            media_type="application/x-ndjson"
+        )
+    if format == "csv":
+        return StreamingResponse(
+            response_service.stream_csv(db, survey_id, [q.question_text for q in questions], after, condition),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="survey_{survey_id}_responses.csv"'}
+        )
+    
+    # With a filter, the total counts matching responses only
+    total_responses = await db.scalar(
+        select(func.count()).select_from(matching_response_ids(survey_id, condition).subquery())
+    )
+    
+    # Opt-in fast path: plain dicts from row tuples, encoded once without re-validation
+    if settings.FAST_JSON_RESPONSES:
+        formatted_responses, next_cursor = await db.run_sync(
+            response_service.fetch_formatted_page, survey_id, after, limit, condition
+        )
+        return FastJSONResponse({
+            "survey_title": survey.title,
+            "total_responses": total_responses,
+            "questions": [
+                {"question_text": q.question_text, "question_type": q.question_type, "order": q.order}
+                for q in questions
+            ],
+            "responses": formatted_responses,
+            "next_cursor": next_cursor,
+        })
     
     # Format questions
     question_info = [
@@ -162,25 +573,100 @@ def get_survey_responses(survey_id: int, db: Session = Depends(get_db)):
         ) for q in questions
     ]
     
-    # Format responses
-    formatted_responses = []
-    for response in responses:
-        # Extract just the answer value from each response data entry
-        answers = {
-            question_text: data["answer"]
-            for question_text, data in response.response_data.items()
-        }
-        
-        formatted_response = schemas.FormattedResponse(
-            response_id=response.id,
-            user_id=response.user_id,
-            answers=answers
-        )
-        formatted_responses.append(formatted_response)
+    # Get one keyset page of responses, answers keyed by question text
+    rows, next_cursor = await db.run_sync(
+        response_service.fetch_formatted_page, survey_id, after, limit, condition
+    )
+    formatted_responses = [schemas.FormattedResponse(**row) for row in rows]
     
     return schemas.SurveyResponseDetail(
         survey_title=survey.title,
-        total_responses=len(responses),
+        total_responses=total_responses,
         questions=question_info,
-        responses=formatted_responses
-    )
\ No newline at end of file
+        responses=formatted_responses,
+        next_cursor=next_cursor
+    )
+
+# Background jobs
+def job_view(job: models.Job) -> schemas.Job:
+    return schemas.Job(
+        id=job.id,
+        type=job.job_type,
+        status=job.status,
+        params=job.params,
+        progress=job.progress,
+        cancel_requested=job.cancel_requested,
+        error=job.error,
+        result=job.result,
+        result_url=f"/jobs/{job.id}/result" if job.status == job_service.SUCCEEDED else None,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+@app.post("/jobs", response_model=schemas.Job, status_code=202)
+async def create_job(job: schemas.JobCreate, http_response: Response, db: AsyncSession = Depends(get_async_db)):
+    if job.survey_id is not None and not await db.get(models.Survey, job.survey_id):
+        raise HTTPException(status_code=404, detail="Survey not found")
+    if job.type == "export":
+        try:
+            export_service.check_export_format(job.format)
+        except export_service.ExportUnavailable as e:
+            raise HTTPException(status_code=501, detail=str(e))
+    
+    db_job = models.Job(
+        job_type=job.type,
+        status=job_service.QUEUED,
+        params=job.model_dump(exclude={"type", "responses"}),
+        progress=0.0,
+        cancel_requested=False
+    )
+    db.add(db_job)
+    await db.flush()
+    if job.type == "bulk_import":
+        # The rows wait on disk for the job instead of in the jobs table
+        await run_in_threadpool(job_service.spool_input, db_job.id, job.responses)
+    await db.commit()
+    
+    # Runs in the job process pool once its type has a free slot
+    job_service.job_runner.submit(db_job.id, db_job.job_type)
+    http_response.headers["Location"] = f"/jobs/{db_job.id}"
+    return job_view(db_job)
+
+@app.get("/jobs/{job_id}", response_model=schemas.Job)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_job = await db.get(models.Job, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_view(db_job)
+
+@app.post("/jobs/{job_id}/cancel", response_model=schemas.Job)
+async def cancel_job(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_job = await db.get(models.Job, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if db_job.status in job_service.FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job already {db_job.status}")
+    
+    # A job still waiting for a slot is cancelled at once; a running one stops at its next progress update
+    db_job.cancel_requested = True
+    if job_service.job_runner.cancel_pending(db_job.id, db_job.job_type):
+        db_job.status = job_service.CANCELLED
+        db_job.finished_at = models.utcnow()
+    await db.commit()
+    return job_view(db_job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_job = await db.get(models.Job, job_id)
+    if not db_job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if db_job.status != job_service.SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job is {db_job.status}")
+    # Result files live on the local disk of the host that ran the job and may have been cleaned up
+    if not await run_in_threadpool(os.path.exists, db_job.result_path):
+        raise HTTPException(status_code=410, detail="Job result is no longer available")
+    return FileResponse(db_job.result_path, filename=os.path.basename(db_job.result_path))
+
+# User accounts (sign-up, login) and misc routes
+app.include_router(api_router)
@@ -1,8 +1,12 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, JSON, Boolean, Float, Date, DateTime, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from app.database.database import Base
+from datetime import datetime, timezone
 import enum
 
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 class User(Base):
     __tablename__ = "users"
 
@@ -26,9 +30,23 @@ class Survey(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(String, nullable=True)
+    schema_version = Column(Integer, default=1, nullable=False)  # Bumped whenever the form changes
     questions = relationship("Question", back_populates="survey")
     responses = relationship("Response", back_populates="survey")
 
+class SurveySchemaVersion(Base):
+    """Immutable snapshot of a survey's questions, written whenever the form changes"""
+    __tablename__ = "survey_schema_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    version = Column(Integer, nullable=False)  # Survey.schema_version the snapshot was taken at
+    questions = Column(JSON, nullable=False)  # [{id, question_text, question_type, options, required, order}]
+    
+    __table_args__ = (
+        UniqueConstraint("survey_id", "version", name="uq_survey_schema_versions_survey_version"),
+    )
+
 class Question(Base):
     __tablename__ = "questions"
     
@@ -59,7 +77,137 @@ class Response(Base):
     id = Column(Integer, primary_key=True, index=True)
     survey_id = Column(Integer, ForeignKey("surveys.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
-    response_data = Column(JSON)  # Store response data as JSON
+    response_data = Column(JSON)  # {question_id: answer}, or legacy {question_text: {...}} when schema_version_id is NULL
+    version = Column(Integer, default=1, nullable=False)  # Incremented on every edit
+    schema_version_id = Column(Integer, ForeignKey("survey_schema_versions.id"), nullable=True)
+    created_at = Column(DateTime, default=utcnow, nullable=True)  # UTC; rows older than the column carry its migration time
+    updated_at = Column(DateTime, default=utcnow, onupdate=utcnow, nullable=True)
     
     survey = relationship("Survey", back_populates="responses")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+    answers = relationship("Answer", back_populates="response")
+    versions = relationship("ResponseVersion", back_populates="response")
+    
+    __table_args__ = (
+        # Keyset pagination of a survey's responses, overall and per user
+        Index("ix_responses_survey_id_id", "survey_id", "id"),
+        Index("ix_responses_survey_user_id", "survey_id", "user_id", "id"),
+        Index("ix_responses_user_id_id", "user_id", "id"),
+        # Ids are never reused after a delete: cursors and the change feed refer to them
+        {"sqlite_autoincrement": True},
+    )
+
+class ResponseVersion(Base):
+    """Append-only copy of a response as it was before an edit"""
+    __tablename__ = "response_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    response_id = Column(Integer, ForeignKey("responses.id"), nullable=False)
+    version = Column(Integer, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    response_data = Column(JSON)
+    schema_version_id = Column(Integer, ForeignKey("survey_schema_versions.id"), nullable=True)
+    
+    response = relationship("Response", back_populates="versions")
+    
+    __table_args__ = (
+        UniqueConstraint("response_id", "version", name="uq_response_versions_response_version"),
+    )
+
+class ResponseChange(Base):
+    """Append-only feed of response inserts, edits and deletes; seq is the commit-ordered change sequence"""
+    __tablename__ = "response_changes"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    seq = Column(Integer, nullable=True)  # NULL until the change is sequenced (see services.changes)
+    response_id = Column(Integer, nullable=False)  # No foreign key: deletes stay in the feed
+    survey_id = Column(Integer, nullable=False)
+    operation = Column(String, nullable=False)  # insert, update or delete
+    version = Column(Integer, nullable=False)  # Response version after the change (before it, for deletes)
+    changed_at = Column(DateTime, default=utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_response_changes_seq", "seq", unique=True),
+        # Polling one survey's changes after a sequence number
+        Index("ix_response_changes_survey_id_seq", "survey_id", "seq"),
+        # Changes still waiting for a sequence number
+        Index(
+            "ix_response_changes_unsequenced", "id",
+            postgresql_where=text("seq IS NULL"), sqlite_where=text("seq IS NULL"),
+        ),
+    )
+
+class Answer(Base):
+    """One answer value of a response, normalized for indexed per-question queries"""
+    __tablename__ = "answers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    response_id = Column(Integer, ForeignKey("responses.id"), nullable=False, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
+    option_id = Column(Integer, ForeignKey("question_options.id"), nullable=True)
+    value_text = Column(String, nullable=True)
+    value_number = Column(Float, nullable=True)
+    value_date = Column(Date, nullable=True)
+    
+    response = relationship("Response", back_populates="answers")
+    
+    __table_args__ = (
+        Index("ix_answers_survey_question", "survey_id", "question_id"),
+        Index("ix_answers_question_option", "question_id", "option_id"),
+        Index("ix_answers_question_number", "question_id", "value_number"),
+        # Answer filters on text and date questions
+        Index("ix_answers_question_text", "question_id", "value_text"),
+        Index("ix_answers_question_date", "question_id", "value_date"),
+    )
+
+class SurveyStat(Base):
+    """Result counter for one question value of a survey, updated with every write"""
+    __tablename__ = "survey_stats"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    survey_id = Column(Integer, ForeignKey("surveys.id"), nullable=False)
+    question_id = Column(Integer, nullable=False)  # 0 for the survey-wide response count
+    bucket = Column(String, nullable=False, default="")  # Option text or YYYY-MM, "" for question totals
+    count = Column(Integer, nullable=False, default=0)
+    value_count = Column(Integer, nullable=False, default=0)  # Numeric answers included in value_sum
+    value_sum = Column(Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        UniqueConstraint("survey_id", "question_id", "bucket", name="uq_survey_stats_key"),
+    )
+
+class IdempotencyKey(Base):
+    """Stored outcome of a request sent with an Idempotency-Key header, kept until it expires"""
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False, unique=True)
+    request_hash = Column(String, nullable=False)  # Fingerprint of the request body the key was first used with
+    response_id = Column(Integer, ForeignKey("responses.id"), nullable=True)
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class Job(Base):
+    """State of a background job run by the job process pool"""
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)  # export, rebuild_stats or bulk_import
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    params = Column(JSON, nullable=False)
+    progress = Column(Float, nullable=False, default=0.0)  # 0..1
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    error = Column(String, nullable=True)
+    result = Column(JSON, nullable=True)  # Small summary, e.g. row counts
+    result_path = Column(String, nullable=True)  # Result file on local disk once succeeded
+    created_at = Column(DateTime, default=utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # Refreshed by the process running the job
+    
+    __table_args__ = (
+        # Requeueing unfinished jobs at startup
+        Index("ix_jobs_status", "status"),
+    )
@@ -1,21 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.routing import APIRoute
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
-from app.database.database import get_db
+from app.config import settings
+from app.database.database import get_db, get_async_db
 from app.models import models
 from app.schemas import schemas
-from passlib.context import CryptContext
+from app.services import metrics
+from app.services.passwords import HasherSaturated, password_hasher
 
-router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# include_router keeps each route's own class, so timing has to be chosen here rather than on the app
+router = APIRouter(route_class=metrics.TimedRoute if settings.METRICS_ENABLED else APIRoute)
+
+async def run_password_operation(operation):
+    # bcrypt runs in a bounded process pool; shed load instead of queueing without limit
+    try:
+        return await operation
+    except HasherSaturated:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many password operations in progress, retry later",
+            headers={"Retry-After": "1"}
+        )
 
 @router.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await run_password_operation(password_hasher.hash(user.password))
     db_user = models.User(
         email=user.email,
         username=user.username,
@@ -23,10 +39,27 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         full_name=user.full_name
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
     return schemas.UserResponse(message="User created successfully", user=db_user)
 
+@router.post("/users/login", response_model=schemas.UserResponse)
+async def login(credentials: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == credentials.email))
+    if db_user is None or not db_user.password:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    valid, new_hash = await run_password_operation(
+        password_hasher.verify_and_update(credentials.password, db_user.password)
+    )
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid email or password")
+    
+    # Stored hash used an older cost, upgrade it now that we know the password
+    if new_hash is not None:
+        db_user.password = new_hash
+        await db.commit()
+    return schemas.UserResponse(message="Login successful", user=db_user)
+
 @router.get("/users/", response_model=List[schemas.User])
 def get_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
     users = db.query(models.User).offset(skip).limit(limit).all()
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr, conlist
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, EmailStr, Field, conlist
+from typing import Annotated, List, Literal, Optional, Dict, Any, Union
+from datetime import datetime
 from enum import Enum
 
 class UserBase(BaseModel):
@@ -10,6 +11,10 @@ class UserBase(BaseModel):
 class UserCreate(UserBase):
     password: str
 
+class UserLogin(BaseModel):
+    email: EmailStr
+    password: str
+
 class User(UserBase):
     id: int
     
@@ -50,7 +55,7 @@ class QuestionBase(BaseModel):
     order: int = 0
 
 class QuestionCreate(QuestionBase):
-    pass
+    survey_id: int
 
 class Question(QuestionBase):
     id: int
@@ -88,11 +93,19 @@ class ResponseCreate(BaseModel):
     user_id: int
     answers: List[QuestionAnswer]
 
+class BulkResponseItem(BaseModel):
+    user_id: int
+    answers: List[QuestionAnswer]
+
+class ResponseUpdate(BaseModel):
+    answers: List[QuestionAnswer]
+
 class Response(ResponseBase):
     id: int
     survey_id: int
     user_id: int
     response_data: Dict[str, Any]
+    version: int = 1
     
     class Config:
         from_attributes = True
@@ -109,6 +122,37 @@ class ResponseResponse(BaseModel):
     message: str
     response: Optional[Response] = None
 
+class ResponseList(BaseModel):
+    responses: List[Response]
+    next_cursor: Optional[int] = None
+
+class ResponseVersion(BaseModel):
+    version: int
+    user_id: int
+    response_data: Dict[str, Any]
+    
+    class Config:
+        from_attributes = True
+
+class ResponseHistory(BaseModel):
+    response_id: int
+    current_version: int
+    versions: List[ResponseVersion]
+
+class ResponseChange(BaseModel):
+    seq: int
+    operation: str  # insert, update or delete
+    response_id: int
+    survey_id: int
+    version: int
+    changed_at: datetime
+    response: Optional[Response] = None  # Current state of the response; None once it is deleted
+
+class ChangeFeed(BaseModel):
+    changes: List[ResponseChange]
+    next_cursor: int  # Pass as ?after= on the next poll
+    has_more: bool
+
 class QuestionInfo(BaseModel):
     question_text: str
     question_type: str
@@ -124,4 +168,100 @@ class SurveyResponseDetail(BaseModel):
     total_responses: int
     questions: List[QuestionInfo]
     responses: List[FormattedResponse]
+    next_cursor: Optional[int] = None
+
+
+class SearchHit(BaseModel):
+    response_id: int
+    user_id: int
+    score: float  # Higher is more relevant
+    answers: Dict[str, Any]
+
+class SearchResults(BaseModel):
+    query: str
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None
+
+class BulkRowResult(BaseModel):
+    index: int
+    status: str  # "accepted" or "rejected"
+    response_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkIngestResponse(BaseModel):
+    message: str
+    accepted: int
+    rejected: int
+    results: List[BulkRowResult]
+
+class OptionCount(BaseModel):
+    option: str
+    count: int
+    percentage: float
+
+class NumberStats(BaseModel):
+    count: int
+    min: Optional[float] = None
+    max: Optional[float] = None
+    mean: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+
+class DateBucket(BaseModel):
+    period: str  # YYYY-MM
+    count: int
+
+class QuestionSummary(BaseModel):
+    question_id: int
+    question_text: str
+    question_type: str
+    answered: int
+    options: Optional[List[OptionCount]] = None
+    number: Optional[NumberStats] = None
+    dates: Optional[List[DateBucket]] = None
 
+class SurveySummary(BaseModel):
+    survey_id: int
+    survey_title: str
+    total_responses: int
+    questions: List[QuestionSummary]
+
+class Crosstab(BaseModel):
+    survey_id: int
+    row_question: str
+    column_question: str
+    rows: List[str]
+    columns: List[str]
+    counts: List[List[int]]  # counts[i][j]: responses that chose rows[i] and columns[j]
+    responses: int  # Responses that answered both questions
+
+class ExportJobCreate(BaseModel):
+    type: Literal["export"]
+    survey_id: int
+    format: str = Field(default="csv", pattern="^(csv|parquet|arrow)$")
+
+class RebuildStatsJobCreate(BaseModel):
+    type: Literal["rebuild_stats"]
+    survey_id: Optional[int] = None  # None rebuilds every survey
+
+class BulkImportJobCreate(BaseModel):
+    type: Literal["bulk_import"]
+    survey_id: int
+    responses: List[Any]  # Same rows as POST /surveys/{id}/responses:bulk, validated by the job
+
+JobCreate = Annotated[
+    Union[ExportJobCreate, RebuildStatsJobCreate, BulkImportJobCreate], Field(discriminator="type")
+]
+
+class Job(BaseModel):
+    id: int
+    type: str
+    status: str  # queued, running, succeeded, failed or cancelled
+    params: Dict[str, Any]
+    progress: float
+    cancel_requested: bool
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    result_url: Optional[str] = None  # Download link once the job succeeded
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
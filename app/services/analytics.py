@@ -0,0 +1,253 @@
+import math
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.sql import ColumnElement
+
+from app.models import models
+from app.schemas import schemas
+from app.services.filters import matching_response_ids
+from app.services.stats import CHOICE_TYPES, QUESTION_BUCKET, SURVEY_TOTAL, number_bucket
+
+# Percentiles reported for number questions (nearest-rank)
+PERCENTILES = (25, 50, 75, 90, 95, 99)
+
+class Counter(NamedTuple):
+    """Aggregate with the shape of a SurveyStat row, read from survey_stats or computed for filtered summaries"""
+    count: int
+    value_count: int = 0
+    value_sum: float = 0.0
+
+def summarize_survey(
+    db: Session,
+    survey: models.Survey,
+    questions: List[models.Question],
+    condition: Optional[ColumnElement] = None,
+) -> schemas.SurveySummary:
+    """Build per-question statistics from the survey_stats counters
+
+    Counts, percentages, means, histograms and percentiles cost
+    O(questions + buckets) regardless of how many responses exist; number
+    questions add one MIN/MAX lookup at the ends of the (question_id,
+    value_number) index. With a compiled answer filter the counters cannot be
+    used, so the same numbers are aggregated in SQL over the matching
+    responses only.
+    """
+    matching = None
+    if condition is None:
+        counters: Dict[int, Dict[str, Counter]] = defaultdict(dict)
+        stats = models.SurveyStat
+        # Plain rows rather than ORM objects: number questions can have thousands of buckets
+        for question_id, bucket, count, value_count, value_sum in db.execute(
+            select(stats.question_id, stats.bucket, stats.count, stats.value_count, stats.value_sum)
+            .where(stats.survey_id == survey.id)
+        ):
+            counters[question_id][bucket] = Counter(count, value_count, value_sum)
+    else:
+        matching = matching_response_ids(survey.id, condition)
+        counters = _filtered_counters(db, survey.id, questions, matching)
+
+    total = counters[SURVEY_TOTAL].get(QUESTION_BUCKET)
+    summaries = []
+    for question in questions:
+        buckets = counters.get(question.id, {})
+        question_total = buckets.get(QUESTION_BUCKET)
+        answered = question_total.count if question_total else 0
+        summary = schemas.QuestionSummary(
+            question_id=question.id,
+            question_text=question.question_text,
+            question_type=question.question_type,
+            answered=answered,
+        )
+        if question.question_type in CHOICE_TYPES:
+            summary.options = _option_summary(question, buckets, answered)
+        elif question.question_type == "number":
+            summary.number = _number_stats(db, question.id, buckets, matching)
+        elif question.question_type == "date":
+            summary.dates = [
+                schemas.DateBucket(period=bucket, count=stat.count)
+                for bucket, stat in sorted(buckets.items())
+                if bucket != QUESTION_BUCKET and stat.count
+            ]
+        summaries.append(summary)
+
+    return schemas.SurveySummary(
+        survey_id=survey.id,
+        survey_title=survey.title,
+        total_responses=total.count if total else 0,
+        questions=summaries,
+    )
+
+def _filtered_counters(
+    db: Session, survey_id: int, questions: List[models.Question], matching
+) -> Dict[int, Dict[str, Counter]]:
+    """survey_stats-shaped counters aggregated over the responses in `matching`"""
+    counters: Dict[int, Dict[str, Counter]] = defaultdict(dict)
+    total = db.scalar(select(func.count()).select_from(matching.subquery()))
+    counters[SURVEY_TOTAL][QUESTION_BUCKET] = Counter(total)
+
+    answers = models.Answer
+    in_matching = answers.response_id.in_(matching)
+    for question_id, answered, value_count, value_sum in db.query(
+        answers.question_id,
+        func.count(func.distinct(answers.response_id)),
+        func.count(answers.value_number),
+        func.coalesce(func.sum(answers.value_number), 0.0),
+    ).filter(answers.survey_id == survey_id, in_matching).group_by(answers.question_id):
+        counters[question_id][QUESTION_BUCKET] = Counter(answered, value_count, value_sum)
+
+    # Same buckets as stat_bucket: option text for choices, YYYY-MM for dates, rounded values for numbers
+    choice_ids = [question.id for question in questions if question.question_type in CHOICE_TYPES]
+    if choice_ids:
+        for question_id, value, count in db.query(
+            answers.question_id, answers.value_text, func.count()
+        ).filter(
+            answers.question_id.in_(choice_ids), answers.value_text.isnot(None), in_matching
+        ).group_by(answers.question_id, answers.value_text):
+            counters[question_id][value] = Counter(count)
+
+    date_ids = [question.id for question in questions if question.question_type == "date"]
+    if date_ids:
+        for question_id, value, count in db.query(
+            answers.question_id, answers.value_date, func.count()
+        ).filter(
+            answers.question_id.in_(date_ids), answers.value_date.isnot(None), in_matching
+        ).group_by(answers.question_id, answers.value_date):
+            bucket = value.strftime("%Y-%m")
+            previous = counters[question_id].get(bucket)
+            counters[question_id][bucket] = Counter(count + (previous.count if previous else 0))
+
+    number_ids = [question.id for question in questions if question.question_type == "number"]
+    if number_ids:
+        for question_id, value, count in db.query(
+            answers.question_id, answers.value_number, func.count()
+        ).filter(
+            answers.question_id.in_(number_ids), answers.value_number.isnot(None), in_matching
+        ).group_by(answers.question_id, answers.value_number):
+            bucket = number_bucket(value)
+            if bucket is None:
+                continue
+            previous = counters[question_id].get(bucket)
+            counters[question_id][bucket] = Counter(count + (previous.count if previous else 0))
+    return counters
+
+def _ordered_values(question: models.Question, values: Iterable[str]) -> List[str]:
+    # Defined options come first, in form order, and are reported even with no answers
+    options = [option.option_text for option in question.question_options]
+    options.extend(value for value in values if value not in options)
+    return options
+
+def _option_summary(
+    question: models.Question, buckets: Dict[str, Counter], answered: int
+) -> List[schemas.OptionCount]:
+    counts = {
+        bucket: stat.count for bucket, stat in buckets.items()
+        if bucket != QUESTION_BUCKET and stat.count
+    }
+    options = _ordered_values(question, counts)
+    return [
+        schemas.OptionCount(
+            option=option,
+            count=counts.get(option, 0),
+            percentage=round(counts.get(option, 0) * 100 / answered, 2) if answered else 0.0,
+        )
+        for option in options
+    ]
+
+def _number_stats(
+    db: Session, question_id: int, buckets: Dict[str, Counter], matching=None
+) -> schemas.NumberStats:
+    question_total = buckets.get(QUESTION_BUCKET)
+    count = question_total.value_count if question_total else 0
+    if not count:
+        return schemas.NumberStats(count=0)
+
+    value = models.Answer.value_number
+    if matching is None:
+        # One seek at each end of the (question_id, value_number) index; MIN and MAX in
+        # a single statement would make SQLite scan every answer of the question instead
+        values = db.query(value).filter(models.Answer.question_id == question_id, value.isnot(None))
+        minimum = values.order_by(value).limit(1).scalar()
+        maximum = values.order_by(value.desc()).limit(1).scalar()
+    else:
+        minimum, maximum = db.query(func.min(value), func.max(value)).filter(
+            models.Answer.question_id == question_id, models.Answer.response_id.in_(matching)
+        ).one()
+    return schemas.NumberStats(
+        count=count,
+        min=minimum,
+        max=maximum,
+        mean=question_total.value_sum / count,
+        percentiles=_percentiles(buckets, minimum, maximum),
+    )
+
+def _percentiles(buckets: Dict[str, Counter], minimum: float, maximum: float) -> Dict[str, float]:
+    """Nearest-rank percentiles over the number buckets (see stats.number_bucket)
+
+    A percentile is the value of the bucket holding its rank, clamped to the
+    exact minimum and maximum, so it is exact when answers have at most
+    NUMBER_BUCKET_DIGITS significant digits and within 0.5% otherwise.
+    """
+    values = sorted(
+        (float(bucket), stat.count) for bucket, stat in buckets.items()
+        if bucket != QUESTION_BUCKET and stat.count
+    )
+    total = sum(count for _, count in values)
+    percentiles = {}
+    if not total:
+        return percentiles
+    for percentile in PERCENTILES:
+        rank = max(math.ceil(percentile / 100 * total), 1)
+        seen = 0
+        for value, count in values:
+            seen += count
+            if seen >= rank:
+                break
+        percentiles[f"p{percentile}"] = min(max(value, minimum), maximum)
+    return percentiles
+
+def crosstab(
+    db: Session,
+    survey: models.Survey,
+    row_question: models.Question,
+    column_question: models.Question,
+    condition: Optional[ColumnElement] = None,
+) -> schemas.Crosstab:
+    """Count responses by the pair of options they chose for two choice questions
+
+    A self-join of answers on response_id, grouped by both values; checkbox
+    answers count once for every selected option.
+    """
+    row_answer = aliased(models.Answer)
+    column_answer = aliased(models.Answer)
+    filters = [
+        row_answer.question_id == row_question.id,
+        row_answer.value_text.isnot(None),
+        column_answer.value_text.isnot(None),
+    ]
+    if condition is not None:
+        filters.append(row_answer.response_id.in_(matching_response_ids(survey.id, condition)))
+    join = and_(column_answer.response_id == row_answer.response_id, column_answer.question_id == column_question.id)
+
+    counts = {
+        (row_value, column_value): count for row_value, column_value, count in db.query(
+            row_answer.value_text, column_answer.value_text, func.count(func.distinct(row_answer.response_id))
+        ).join(column_answer, join).filter(*filters).group_by(row_answer.value_text, column_answer.value_text)
+    }
+    responses = db.query(func.count(func.distinct(row_answer.response_id))).join(column_answer, join).filter(
+        *filters
+    ).scalar()
+
+    rows = _ordered_values(row_question, (row_value for row_value, _ in counts))
+    columns = _ordered_values(column_question, (column_value for _, column_value in counts))
+    return schemas.Crosstab(
+        survey_id=survey.id,
+        row_question=row_question.question_text,
+        column_question=column_question.question_text,
+        rows=rows,
+        columns=columns,
+        counts=[[counts.get((row, column), 0) for column in columns] for row in rows],
+        responses=responses,
+    )
@@ -0,0 +1,67 @@
+import json
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from app.models import models
+
+def parse_options(options: Optional[str]) -> List[str]:
+    """Decode a question's JSON option list, ignoring malformed values"""
+    if not options:
+        return []
+    try:
+        parsed = json.loads(options)
+    except ValueError:
+        return []
+    return [str(option) for option in parsed] if isinstance(parsed, list) else []
+
+def build_option_rows(options: Optional[str]) -> List[models.QuestionOption]:
+    return [models.QuestionOption(option_text=option) for option in parse_options(options)]
+
+def coerce_value(question_type: str, value: Any) -> Dict[str, Any]:
+    """Split one answer value into the typed value columns of the answers table"""
+    if value is None:
+        return {"value_text": None, "value_number": None, "value_date": None}
+
+    value_text = value if isinstance(value, str) else json.dumps(value)
+    value_number = None
+    value_date = None
+
+    if question_type == "number" and not isinstance(value, bool):
+        try:
+            value_number = float(value)
+        except (TypeError, ValueError):
+            pass
+    elif question_type == "date":
+        try:
+            value_date = date.fromisoformat(str(value)[:10])
+        except ValueError:
+            pass
+
+    return {"value_text": value_text, "value_number": value_number, "value_date": value_date}
+
+def build_answer_rows(
+    survey_id: int,
+    response_id: int,
+    response_data: Dict[str, Any],
+    option_ids: Dict[int, Dict[str, int]],
+    question_types: Dict[int, str],
+) -> List[Dict[str, Any]]:
+    """Flatten a validated {question_id: answer} blob into rows for the answers table
+
+    List answers (checkbox / multi-select) produce one row per selected value.
+    """
+    rows = []
+    for key, answer in response_data.items():
+        question_id = int(key)
+        question_options = option_ids.get(question_id, {})
+        values = answer if isinstance(answer, list) else [answer]
+        for value in values:
+            row = coerce_value(question_types[question_id], value)
+            row.update(
+                response_id=response_id,
+                survey_id=survey_id,
+                question_id=question_id,
+                option_id=question_options.get(value) if isinstance(value, str) else None,
+            )
+            rows.append(row)
+    return rows
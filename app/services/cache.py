@@ -0,0 +1,180 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from app.config import settings
+
+class CacheBackend:
+    """Interface for a cache shared between worker processes (e.g. Redis, memcached)"""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+class InMemoryBackend(CacheBackend):
+    """Process-local stand-in for a shared backend, used in tests and single-worker setups"""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._items: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._items[key]
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._items[key] = (value, self._clock() + ttl)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed time-to-live"""
+
+    def __init__(self, maxsize: int, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._items: "OrderedDict[object, Tuple[object, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at <= self._clock():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._items[key] = (value, self._clock() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+def make_etag(body: bytes) -> str:
+    """Strong validator derived from the exact response bytes"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def _opaque_tag(etag: str) -> str:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    return etag[2:] if etag.startswith("W/") else etag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or _opaque_tag(etag) in {_opaque_tag(candidate) for candidate in candidates}
+
+class _LocalEntry(NamedTuple):
+    cached: CachedBody
+    generation: Optional[bytes]
+
+class SurveyDefinitionCache:
+    """Pre-serialized survey JSON, cached per process and optionally in a shared backend
+
+    With a shared backend every survey has a generation token there that
+    invalidate() replaces. Local copies and backend bodies carry the
+    generation they were built under and count as misses once it changed,
+    so an invalidation in one worker reaches all of them on their next get()
+    for the price of reading one short key.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, backend: Optional[CacheBackend] = None):
+        self.local = TTLCache(maxsize, ttl)
+        self.backend = backend
+
+    @staticmethod
+    def _key(survey_id: int) -> str:
+        return f"survey:{survey_id}"
+
+    @staticmethod
+    def _generation_key(survey_id: int) -> str:
+        return f"survey:{survey_id}:generation"
+
+    def generation(self, survey_id: int) -> Optional[bytes]:
+        """Current generation; read it before loading the survey and pass it to set()"""
+        if self.backend is None:
+            return None
+        generation = self.backend.get(self._generation_key(survey_id))
+        if generation is None:
+            generation = secrets.token_hex(8).encode()
+            self.backend.set(self._generation_key(survey_id), generation, self.local.ttl)
+        return generation
+
+    def get(self, survey_id: int) -> Optional[CachedBody]:
+        entry = self.local.get(survey_id)
+        if self.backend is None:
+            return entry.cached if entry is not None else None
+
+        generation = self.backend.get(self._generation_key(survey_id))
+        if generation is None:
+            return None
+        if entry is not None and entry.generation == generation:
+            return entry.cached
+
+        stored = self.backend.get(self._key(survey_id))
+        if stored is None:
+            return None
+        stored_generation, _, body = stored.partition(b":")
+        if stored_generation != generation:
+            return None
+        cached = CachedBody(body, make_etag(body))
+        self.local.set(survey_id, _LocalEntry(cached, generation))
+        return cached
+
+    def set(self, survey_id: int, body: bytes, generation: Optional[bytes] = None) -> CachedBody:
+        """Cache a body built after reading `generation`; a stale generation is never served"""
+        cached = CachedBody(body, make_etag(body))
+        self.local.set(survey_id, _LocalEntry(cached, generation))
+        if self.backend is not None and generation is not None:
+            self.backend.set(self._key(survey_id), generation + b":" + body, self.local.ttl)
+        return cached
+
+    def invalidate(self, survey_id: int) -> None:
+        self.local.delete(survey_id)
+        if self.backend is not None:
+            self.backend.set(self._generation_key(survey_id), secrets.token_hex(8).encode(), self.local.ttl)
+            self.backend.delete(self._key(survey_id))
+
+survey_cache = SurveyDefinitionCache(settings.SURVEY_CACHE_SIZE, settings.SURVEY_CACHE_TTL)
+
+def set_shared_backend(backend: Optional[CacheBackend]) -> None:
+    """Plug a shared backend into the survey cache (None to go back to process-local only)"""
+    survey_cache.backend = backend
+    survey_cache.local.clear()
@@ -0,0 +1,93 @@
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.schemas import schemas
+from app.services.responses import render_responses
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+# Arbitrary application-wide key for the PostgreSQL advisory lock below
+CHANGE_SEQUENCE_LOCK = 7468320
+
+# Numbers committed changes that are still unsequenced, in insertion order, after the highest seq
+SEQUENCE_SQL = """
+    UPDATE response_changes AS changes SET seq = pending.base + pending.position
+    FROM (
+        SELECT id,
+            ROW_NUMBER() OVER (ORDER BY id) AS position,
+            (SELECT COALESCE(MAX(seq), 0) FROM response_changes) AS base
+        FROM response_changes
+        WHERE seq IS NULL
+    ) AS pending
+    WHERE changes.id = pending.id
+"""
+
+def record_changes(db: Session, survey_id: int, operation: str, changes: Iterable[Tuple[int, int]]) -> None:
+    """Append (response_id, version) changes to the feed inside the caller's transaction
+
+    Readers page by seq, so seq must follow commit order or a reader could
+    see seq 11 while seq 10 is still uncommitted and skip it forever. SQLite
+    has a single writer and this transaction already holds its write lock, so
+    seq is numbered on insert. On PostgreSQL writers leave seq empty and take
+    no lock; sequence_changes numbers the changes once they have committed.
+    """
+    rows = [
+        {"response_id": response_id, "survey_id": survey_id, "operation": operation, "version": version}
+        for response_id, version in changes
+    ]
+    if not rows:
+        return
+    if db.get_bind().dialect.name != "postgresql":
+        last = db.scalar(select(func.max(models.ResponseChange.seq))) or 0
+        for position, row in enumerate(rows, start=1):
+            row["seq"] = last + position
+    db.execute(insert(models.ResponseChange.__table__), rows)
+
+def sequence_changes(db: Session) -> None:
+    """Give committed, unsequenced changes the next sequence numbers; the caller commits right after
+
+    Only needed on PostgreSQL. The advisory lock serializes the short
+    numbering transactions of concurrent readers, not the writers.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_SEQUENCE_LOCK})
+    db.execute(text(SEQUENCE_SQL))
+
+def fetch_changes(
+    db: Session, after: int, limit: int, survey_id: Optional[int] = None
+) -> Tuple[List[schemas.ResponseChange], int, bool]:
+    """Return changes with a sequence number above `after`, the cursor to poll with next, and whether more are waiting
+
+    Served by the seq (or the (survey_id, seq)) index, so a poll reads only
+    the changes it returns; changes not sequenced yet are left for a later poll. Each change carries the response as it is now,
+    so replaying a page is idempotent for an upserting consumer.
+    """
+    query = select(models.ResponseChange).where(models.ResponseChange.seq > after)
+    if survey_id is not None:
+        query = query.where(models.ResponseChange.survey_id == survey_id)
+    rows = db.execute(query.order_by(models.ResponseChange.seq).limit(limit + 1)).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    current = db.execute(
+        select(models.Response).where(models.Response.id.in_({row.response_id for row in rows}))
+    ).scalars().all()
+    rendered = {response.id: response for response in render_responses(db, current)}
+    return [
+        schemas.ResponseChange(
+            seq=row.seq,
+            operation=row.operation,
+            response_id=row.response_id,
+            survey_id=row.survey_id,
+            version=row.version,
+            changed_at=row.changed_at,
+            response=rendered.get(row.response_id),
+        )
+        for row in rows
+    ], rows[-1].seq if rows else after, has_more
@@ -0,0 +1,149 @@
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.schemas import schemas
+from app.services.answers import build_answer_rows
+from app.services.changes import DELETE, UPDATE, record_changes
+from app.services.search import index_documents, remove_documents, search_documents
+from app.services.snapshots import SchemaSnapshot, get_snapshots, render_response_data
+from app.services.stats import apply_response_stats
+from app.services.validation import SurveyValidator
+
+class VersionConflict(Exception):
+    """Raised when a response changed since the version the client edited"""
+
+def response_etag(version: int) -> str:
+    return f'"{version}"'
+
+def parse_if_match(if_match: Optional[str]) -> Optional[List[str]]:
+    """Return the versions listed in an If-Match header, or None when any version matches"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    return [
+        tag.strip().removeprefix("W/").strip('"')
+        for tag in if_match.split(",")
+    ]
+
+def merge_answers(
+    db_response: models.Response, snapshot: Optional[SchemaSnapshot], changes: List[schemas.QuestionAnswer]
+) -> List[schemas.QuestionAnswer]:
+    """Apply a partial answer diff on top of the stored answers"""
+    merged = {
+        question_text: schemas.QuestionAnswer(
+            question_text=question_text,
+            question_type=data["question_type"],
+            answer=data["answer"],
+        )
+        for question_text, data in render_response_data(db_response.response_data, snapshot).items()
+    }
+    for change in changes:
+        merged[change.question_text] = change
+    return list(merged.values())
+
+def update_response(
+    db: Session,
+    validator: SurveyValidator,
+    db_response: models.Response,
+    answers: List[schemas.QuestionAnswer],
+    partial: bool,
+) -> int:
+    """Validate and apply an edit in place; returns the new version
+
+    The previous state is appended to response_versions, the normalized answers
+    and survey_stats counters are swapped for the new ones, and the UPDATE only
+    applies if the row is still at the version that was read. The edited
+    response moves to the validator's schema snapshot. The caller owns the
+    transaction.
+    """
+    if partial:
+        snapshot = get_snapshots(db, [db_response.schema_version_id]).get(db_response.schema_version_id)
+        answers = merge_answers(db_response, snapshot, answers)
+    response_data = validator.validate(answers)
+    current_version = db_response.version
+
+    try:
+        db.execute(insert(models.ResponseVersion.__table__).values(
+            response_id=db_response.id,
+            version=current_version,
+            user_id=db_response.user_id,
+            response_data=db_response.response_data,
+            schema_version_id=db_response.schema_version_id,
+        ))
+    except IntegrityError:
+        # A concurrent edit already archived this version
+        raise VersionConflict()
+    result = db.execute(
+        update(models.Response.__table__)
+        .where(
+            models.Response.__table__.c.id == db_response.id,
+            models.Response.__table__.c.version == current_version,
+        )
+        .values(
+            response_data=response_data,
+            version=current_version + 1,
+            schema_version_id=validator.schema_version_id,
+        )
+    )
+    if result.rowcount != 1:
+        raise VersionConflict()
+
+    # Swap the normalized answers and their counter contribution
+    _remove_answers(db, validator, db_response.id, 0)
+
+    new_rows = build_answer_rows(
+        validator.survey_id, db_response.id, response_data, validator.option_ids, validator.question_types
+    )
+    if new_rows:
+        db.execute(insert(models.Answer.__table__), new_rows)
+    apply_response_stats(db, validator.survey_id, validator.question_types, new_rows, 0)
+    remove_documents(db, [db_response.id])
+    index_documents(db, validator.survey_id, search_documents(new_rows, validator.question_types))
+    record_changes(db, validator.survey_id, UPDATE, [(db_response.id, current_version + 1)])
+
+    return current_version + 1
+
+def delete_response(db: Session, validator: SurveyValidator, db_response: models.Response) -> None:
+    """Delete a response with its answers, history, counters and search document
+
+    Applies only if the row is still at the version that was read. Stored
+    Idempotency-Key results keep replaying the original creation, so a
+    retried submission does not bring the response back. The caller owns the
+    transaction.
+    """
+    # Rows referencing the response go first; a conflict below rolls all of it back
+    _remove_answers(db, validator, db_response.id, 1)
+    remove_documents(db, [db_response.id])
+    db.execute(delete(models.ResponseVersion).where(models.ResponseVersion.response_id == db_response.id))
+    db.execute(
+        update(models.IdempotencyKey)
+        .where(models.IdempotencyKey.response_id == db_response.id)
+        .values(response_id=None)
+    )
+    result = db.execute(
+        delete(models.Response.__table__).where(
+            models.Response.__table__.c.id == db_response.id,
+            models.Response.__table__.c.version == db_response.version,
+        )
+    )
+    if result.rowcount != 1:
+        raise VersionConflict()
+    record_changes(db, validator.survey_id, DELETE, [(db_response.id, db_response.version)])
+
+def _remove_answers(db: Session, validator: SurveyValidator, response_id: int, response_count: int) -> None:
+    """Delete a response's answer rows and subtract them (and response_count responses) from the counters"""
+    old_rows = [
+        {
+            "response_id": answer.response_id,
+            "question_id": answer.question_id,
+            "value_text": answer.value_text,
+            "value_number": answer.value_number,
+            "value_date": answer.value_date,
+        }
+        for answer in db.query(models.Answer).filter(models.Answer.response_id == response_id)
+    ]
+    apply_response_stats(db, validator.survey_id, validator.question_types, old_rows, response_count, sign=-1)
+    db.execute(delete(models.Answer).where(models.Answer.response_id == response_id))
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import io
+import json
+from datetime import date
+from typing import Any, AsyncIterator, Callable, Iterable, List, Optional, Sequence
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models import models
+from app.services.responses import STREAM_CHUNK_SIZE, iter_response_chunks
+from app.services.snapshots import extract_answers, survey_snapshots
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+EXPORT_FORMATS = ("csv", "parquet", "arrow")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+LIST_TYPES = ("checkbox", "multiple_choice")
+
+class ExportUnavailable(RuntimeError):
+    """Raised when the requested format needs pyarrow and it is not installed"""
+
+def _to_float(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _to_date(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+def _to_list(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [str(item) for item in value] if isinstance(value, list) else [str(value)]
+
+def _to_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    return value if isinstance(value, str) else json.dumps(value)
+
+def column_converter(question_type: str) -> Callable[[Any], Any]:
+    """Map a QuestionType to the function that types one answer for its column"""
+    if question_type == "number":
+        return _to_float
+    if question_type == "date":
+        return _to_date
+    if question_type in LIST_TYPES:
+        return _to_list
+    return _to_text
+
+def _arrow_type(question_type: str):
+    if question_type == "number":
+        return pa.float64()
+    if question_type == "date":
+        return pa.date32()
+    if question_type in LIST_TYPES:
+        return pa.list_(pa.string())
+    return pa.string()
+
+class _Sink(io.RawIOBase):
+    """Write-only buffer that is drained after every batch so output never accumulates"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer.extend(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+def check_export_format(format: str) -> None:
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {format}")
+    if format != "csv" and pa is None:
+        raise ExportUnavailable(f"Exporting {format} requires the pyarrow package")
+
+class ExportWriter:
+    """Encodes chunks of (response_id, user_id, answers by question text) rows into one export format"""
+
+    def __init__(self, format: str, questions: Sequence[models.Question]):
+        check_export_format(format)
+        self.format = format
+        self.question_texts = [q.question_text for q in questions]
+        self.converters = [column_converter(q.question_type) for q in questions]
+        self._sink = _Sink()
+        self._writer = None
+
+        if format == "csv":
+            self._text = io.TextIOWrapper(self._sink, encoding="utf-8", newline="", write_through=True)
+            self._writer = csv.writer(self._text)
+        else:
+            self.schema = pa.schema(
+                [("response_id", pa.int64()), ("user_id", pa.int64())]
+                + [(q.question_text, _arrow_type(q.question_type)) for q in questions]
+            )
+
+    def begin(self) -> bytes:
+        if self.format == "csv":
+            self._writer.writerow(["response_id", "user_id", *self.question_texts])
+        elif self.format == "parquet":
+            self._writer = pq.ParquetWriter(self._sink, self.schema)
+        else:
+            self._writer = pa.ipc.new_stream(self._sink, self.schema)
+        return self._sink.drain()
+
+    def write_rows(self, rows: Iterable[Sequence[Any]]) -> bytes:
+        columns: List[List[Any]] = [[] for _ in range(len(self.converters) + 2)]
+        for response_id, user_id, answers in rows:
+            columns[0].append(response_id)
+            columns[1].append(user_id)
+            for index, (text, convert) in enumerate(zip(self.question_texts, self.converters), start=2):
+                columns[index].append(convert(answers.get(text)))
+
+        if self.format == "csv":
+            for row in zip(*columns):
+                self._writer.writerow([_csv_cell(value) for value in row])
+        else:
+            # Each chunk becomes one Parquet row group / one Arrow IPC record batch
+            self._writer.write_batch(pa.record_batch(columns, schema=self.schema))
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        if self.format != "csv":
+            self._writer.close()
+        return self._sink.drain()
+
+def _csv_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return json.dumps(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+async def stream_export(
+    db: AsyncSession, survey_id: int, writer: ExportWriter
+) -> AsyncIterator[bytes]:
+    """Encode a survey's responses chunk by chunk as they are read from the cursor"""
+    yield writer.begin()
+    async for chunk in iter_response_chunks(db, survey_id):
+        # Encoding is CPU-bound, keep it off the event loop
+        data = await run_in_threadpool(writer.write_rows, chunk)
+        if data:
+            yield data
+    yield writer.finish()
+
+def export_to_file(
+    db: Session,
+    survey_id: int,
+    format: str,
+    output: io.BufferedIOBase,
+    on_chunk: Optional[Callable[[int], None]] = None,
+) -> int:
+    """Write a survey's responses to a binary file object; returns the number of rows
+
+    on_chunk is called with the number of rows written so far after every chunk.
+    """
+    questions = db.query(models.Question).filter(
+        models.Question.survey_id == survey_id
+    ).order_by(models.Question.order).all()
+    writer = ExportWriter(format, questions)
+
+    snapshots = survey_snapshots(db, survey_id)
+    statement = (
+        select(
+            models.Response.id,
+            models.Response.user_id,
+            models.Response.schema_version_id,
+            models.Response.response_data,
+        )
+        .where(models.Response.survey_id == survey_id)
+        .order_by(models.Response.id)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    rows = 0
+    output.write(writer.begin())
+    for chunk in db.execute(statement).partitions():
+        output.write(writer.write_rows(
+            (response_id, user_id, extract_answers(response_data, snapshots.get(schema_version_id)))
+            for response_id, user_id, schema_version_id, response_data in chunk
+        ))
+        rows += len(chunk)
+        if on_chunk is not None:
+            on_chunk(rows)
+    output.write(writer.finish())
+    return rows
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Export a survey's responses to a typed columnar file")
+    parser.add_argument("survey_id", type=int)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--output", help="Output path (defaults to survey_<id>.<format>)")
+    args = parser.parse_args(argv)
+
+    from app.database.database import SessionLocal
+
+    path = args.output or f"survey_{args.survey_id}.{args.format}"
+    db = SessionLocal()
+    try:
+        survey = db.query(models.Survey).filter(models.Survey.id == args.survey_id).first()
+        if survey is None:
+            parser.error(f"Survey {args.survey_id} not found")
+        with open(path, "wb") as output:
+            rows = export_to_file(db, args.survey_id, args.format, output)
+    finally:
+        db.close()
+    print(f"Exported {rows} responses to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import re
+from datetime import date
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import and_, not_, or_, select
+from sqlalchemy.sql import ColumnElement
+
+from app.models import models
+from app.services.stats import CHOICE_TYPES
+
+# Conditions allowed in one expression, so a filter cannot turn into an unbounded query
+MAX_CONDITIONS = 20
+
+COMPARISONS = ("=", "!=", "<", "<=", ">", ">=")
+
+# Operators each question type accepts; anything not listed is a text question
+TYPE_OPERATORS = {
+    "number": COMPARISONS + ("in",),
+    "date": COMPARISONS + ("in",),
+    "choice": ("=", "!=", "in", "contains"),
+    "text": ("=", "!=", "in", "contains"),
+}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<symbol>>=|<=|!=|=|>|<|\(|\)|,)
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )""", re.VERBOSE)
+
+KEYWORDS = ("and", "or", "not", "in", "contains")
+
+class FilterError(ValueError):
+    """Raised when a filter expression is malformed or does not fit the survey's questions"""
+
+class Token(NamedTuple):
+    kind: str  # string, number, symbol, keyword, question
+    value: Any  # numbers keep the text they were written as
+    position: int
+
+class Condition(NamedTuple):
+    question: models.Question
+    operator: str
+    values: List[Any]
+
+def tokenize(expression: str) -> List[Token]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        match = TOKEN_PATTERN.match(expression, position)
+        if match is None:
+            raise FilterError(f"Unexpected character at position {position}: {expression[position]!r}")
+        start = match.start(match.lastgroup)
+        text = match.group(match.lastgroup)
+        if match.lastgroup == "string":
+            tokens.append(Token("string", re.sub(r"\\(.)", r"\1", text[1:-1]), start))
+        elif match.lastgroup == "number":
+            tokens.append(Token("number", text, start))
+        elif match.lastgroup == "symbol":
+            tokens.append(Token("symbol", text, start))
+        elif text.lower() in KEYWORDS:
+            tokens.append(Token("keyword", text.lower(), start))
+        elif re.fullmatch(r"q\d+", text):
+            tokens.append(Token("question", int(text[1:]), start))
+        else:
+            raise FilterError(f"Unknown word at position {start}: {text}")
+        position = match.end()
+    return tokens
+
+class _Parser:
+    """Recursive descent over the grammar
+
+        expression := term ("or" term)*
+        term       := factor ("and" factor)*
+        factor     := "not" factor | "(" expression ")" | condition
+        condition  := question operator value | question "in" "(" value ("," value)* ")"
+        question   := "question text" | q<id>
+    """
+
+    def __init__(self, tokens: List[Token], questions: Dict[Any, models.Question]):
+        self.tokens = tokens
+        self.questions = questions
+        self.index = 0
+        self.conditions = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def take(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise FilterError("Filter ends unexpectedly")
+        self.index += 1
+        return token
+
+    def accept(self, kind: str, value: Any) -> bool:
+        token = self.peek()
+        if token is not None and token.kind == kind and token.value == value:
+            self.index += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: Any) -> None:
+        if not self.accept(kind, value):
+            token = self.peek()
+            where = f"at position {token.position}" if token else "at the end"
+            raise FilterError(f"Expected {value!r} {where}")
+
+    def parse(self) -> ColumnElement:
+        clause = self.expression()
+        token = self.peek()
+        if token is not None:
+            raise FilterError(f"Unexpected {token.value!r} at position {token.position}")
+        return clause
+
+    def expression(self) -> ColumnElement:
+        clauses = [self.term()]
+        while self.accept("keyword", "or"):
+            clauses.append(self.term())
+        return clauses[0] if len(clauses) == 1 else or_(*clauses)
+
+    def term(self) -> ColumnElement:
+        clauses = [self.factor()]
+        while self.accept("keyword", "and"):
+            clauses.append(self.factor())
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
+    def factor(self) -> ColumnElement:
+        if self.accept("keyword", "not"):
+            return not_(self.factor())
+        if self.accept("symbol", "("):
+            clause = self.expression()
+            self.expect("symbol", ")")
+            return clause
+        return compile_condition(self.condition())
+
+    def condition(self) -> Condition:
+        self.conditions += 1
+        if self.conditions > MAX_CONDITIONS:
+            raise FilterError(f"Filters may combine at most {MAX_CONDITIONS} conditions")
+
+        token = self.take()
+        if token.kind not in ("string", "question"):
+            raise FilterError(f"Expected a question at position {token.position}")
+        question = self.questions.get(token.value)
+        if question is None:
+            raise FilterError(f"Question not found in survey: {token.value}")
+
+        token = self.take()
+        if token.kind == "symbol" and token.value in COMPARISONS:
+            operator, values = token.value, [self.value()]
+        elif token.kind == "keyword" and token.value == "contains":
+            operator, values = "contains", [self.value()]
+        elif token.kind == "keyword" and token.value == "in":
+            self.expect("symbol", "(")
+            operator, values = "in", [self.value()]
+            while self.accept("symbol", ","):
+                values.append(self.value())
+            self.expect("symbol", ")")
+        else:
+            raise FilterError(f"Expected an operator at position {token.position}")
+        return Condition(question, operator, [coerce_filter_value(question, operator, v) for v in values])
+
+    def value(self) -> Token:
+        token = self.take()
+        if token.kind not in ("string", "number"):
+            raise FilterError(f"Expected a value at position {token.position}")
+        return token
+
+def question_kind(question_type: str) -> str:
+    if question_type in ("number", "date"):
+        return question_type
+    return "choice" if question_type in CHOICE_TYPES else "text"
+
+def coerce_filter_value(question: models.Question, operator: str, token: Token) -> Any:
+    """Check a literal against the question's type and turn it into what the answers table stores"""
+    kind = question_kind(question.question_type)
+    if operator not in TYPE_OPERATORS[kind]:
+        raise FilterError(
+            f"Operator {operator!r} does not apply to {question.question_type} question: {question.question_text}"
+        )
+
+    if kind == "number":
+        if token.kind != "number":
+            raise FilterError(f"Expected a number for question: {question.question_text}")
+        return float(token.value)
+    if kind == "date":
+        try:
+            return date.fromisoformat(str(token.value))
+        except ValueError:
+            raise FilterError(f"Expected a YYYY-MM-DD date for question: {question.question_text}")
+    # Bare numbers compare as the text they were written as
+    text = token.value
+    if kind == "choice" and question.question_options:
+        option_ids = {option.option_text: option.id for option in question.question_options}
+        if text not in option_ids:
+            raise FilterError(f"{text!r} is not an option of question: {question.question_text}")
+        return option_ids[text]
+    return text
+
+def _answer_column(question: models.Question):
+    kind = question_kind(question.question_type)
+    if kind == "number":
+        return models.Answer.value_number
+    if kind == "date":
+        return models.Answer.value_date
+    if kind == "choice" and question.question_options:
+        return models.Answer.option_id
+    return models.Answer.value_text
+
+def compile_condition(condition: Condition) -> ColumnElement:
+    """One condition as `responses.id IN (matching answers)`
+
+    The subquery is served by the (question_id, value_*) / (question_id, option_id)
+    indexes, so only answers that match are read. "!=" is the negation of "=":
+    it also matches responses that left the question unanswered.
+    """
+    question, operator, values = condition
+    column = _answer_column(question)
+    if operator == "!=":
+        return not_(compile_condition(Condition(question, "=", values)))
+    if operator == "in":
+        predicate = column.in_(values)
+    elif operator == "contains" and column is models.Answer.value_text:
+        pattern = values[0].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        predicate = column.like(f"%{pattern}%", escape="\\")
+    elif operator == "contains":
+        # A choice answer "contains" an option when that option is one of its selected values
+        predicate = column == values[0]
+    else:
+        predicate = {
+            "=": column.__eq__,
+            "<": column.__lt__,
+            "<=": column.__le__,
+            ">": column.__gt__,
+            ">=": column.__ge__,
+        }[operator](values[0])
+    return models.Response.id.in_(
+        select(models.Answer.response_id).where(models.Answer.question_id == question.id, predicate)
+    )
+
+def compile_filter(expression: str, questions: Iterable[models.Question]) -> ColumnElement:
+    """Parse a filter expression into a WHERE clause on responses
+
+    Questions are referenced by quoted text or as q<id>, for example
+    `"Years of experience?" > 5 AND q12 contains "Python"`. Questions need
+    their question_options loaded.
+    """
+    lookup: Dict[Any, models.Question] = {}
+    for question in questions:
+        lookup[question.question_text] = question
+        lookup[question.id] = question
+    tokens = tokenize(expression)
+    if not tokens:
+        raise FilterError("Filter is empty")
+    return _Parser(tokens, lookup).parse()
+
+def matching_response_ids(survey_id: int, condition: Optional[ColumnElement]):
+    """Subquery of the survey's response ids that satisfy a compiled filter"""
+    query = select(models.Response.id).where(models.Response.survey_id == survey_id)
+    if condition is not None:
+        query = query.where(condition)
+    return query
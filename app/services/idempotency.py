@@ -0,0 +1,88 @@
+import argparse
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import models
+
+class IdempotencyKeyReused(Exception):
+    """Raised when a key is sent again with a different request body"""
+
+class IdempotencyKeyInFlight(Exception):
+    """Raised when another request holding the same key has not finished"""
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def request_fingerprint(payload: BaseModel) -> str:
+    body = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+def lookup(db: Session, key: str, fingerprint: str) -> Optional[models.IdempotencyKey]:
+    """Return the completed, unexpired result stored for a key, if any"""
+    record = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.expires_at > _utcnow(),
+    ).first()
+    if record is None:
+        return None
+    if record.request_hash != fingerprint:
+        raise IdempotencyKeyReused()
+    if record.response_body is None:
+        raise IdempotencyKeyInFlight()
+    return record
+
+def claim(db: Session, key: str, fingerprint: str) -> None:
+    """Reserve a key inside the caller's transaction
+
+    The unique index on key makes a concurrent request with the same key block
+    until this transaction ends, then fail with IntegrityError, so only one of
+    them inserts. An expired reservation for the key is replaced.
+    """
+    now = _utcnow()
+    db.execute(delete(models.IdempotencyKey).where(
+        models.IdempotencyKey.key == key,
+        models.IdempotencyKey.expires_at <= now,
+    ))
+    db.execute(insert(models.IdempotencyKey).values(
+        key=key,
+        request_hash=fingerprint,
+        expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+    ))
+
+def complete(db: Session, key: str, response_id: int, status_code: int, body: Dict[str, Any]) -> None:
+    """Store the result to replay for the key; commits with the work it describes"""
+    db.execute(
+        update(models.IdempotencyKey)
+        .where(models.IdempotencyKey.key == key)
+        .values(response_id=response_id, status_code=status_code, response_body=body)
+    )
+
+def purge_expired(db: Session) -> int:
+    result = db.execute(delete(models.IdempotencyKey).where(models.IdempotencyKey.expires_at <= _utcnow()))
+    return result.rowcount
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain stored Idempotency-Key results")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("purge", help="Delete expired keys")
+    parser.parse_args(argv)
+
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = purge_expired(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Purged {count} expired idempotency keys")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.database.database import insert_returning_ids
+from app.models import models
+from app.schemas import schemas
+from app.services.answers import build_answer_rows
+from app.services.changes import INSERT, record_changes
+from app.services.search import index_documents, search_documents
+from app.services.stats import apply_response_stats
+from app.services.validation import AnswerValidationError, SurveyValidator
+
+# Rows validated and inserted per transaction during bulk ingestion
+BULK_CHUNK_SIZE = 500
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+def insert_responses(
+    db: Session, validator: SurveyValidator, rows: List[Tuple[int, Dict[str, Any]]]
+) -> List[int]:
+    """Insert validated (user_id, response_data) rows and everything derived from them
+
+    Answers, counters, search documents and change feed entries are written
+    with one executemany per table. Returns the new response ids in order.
+    The caller owns the transaction.
+    """
+    if not rows:
+        return []
+    response_ids = insert_returning_ids(db, models.Response, [
+        {
+            "survey_id": validator.survey_id,
+            "user_id": user_id,
+            "response_data": response_data,
+            "schema_version_id": validator.schema_version_id,
+        }
+        for user_id, response_data in rows
+    ])
+
+    answer_rows = []
+    for response_id, (_, response_data) in zip(response_ids, rows):
+        answer_rows.extend(build_answer_rows(
+            validator.survey_id, response_id, response_data, validator.option_ids, validator.question_types
+        ))
+    if answer_rows:
+        db.execute(insert(models.Answer.__table__), answer_rows)
+
+    apply_response_stats(
+        db, validator.survey_id, validator.question_types, answer_rows, len(response_ids)
+    )
+    index_documents(db, validator.survey_id, search_documents(answer_rows, validator.question_types))
+    record_changes(db, validator.survey_id, INSERT, ((response_id, 1) for response_id in response_ids))
+    return response_ids
+
+class BulkIngestor:
+    """Validates and stores chunks of submissions for one survey"""
+
+    def __init__(
+        self,
+        validator: SurveyValidator,
+        on_commit: Optional[Callable[[List[Tuple[int, int, Dict[str, Any]]]], None]] = None
+    ):
+        # The survey's rules are compiled once for the whole upload
+        self.validator = validator
+        # Called with the (response_id, user_id, response_data) rows of each committed chunk
+        self.on_commit = on_commit
+
+    def ingest_chunk(self, db: Session, chunk: List[Tuple[int, Any]]) -> List[schemas.BulkRowResult]:
+        results = {}
+        accepted = []
+
+        for index, payload in chunk:
+            if isinstance(payload, schemas.BulkRowResult):
+                # Row was already rejected while parsing the upload
+                results[index] = payload
+                continue
+            try:
+                item = schemas.BulkResponseItem.model_validate(payload)
+                response_data = self.validator.validate(item.answers)
+            except ValidationError as exc:
+                results[index] = _rejected(index, _validation_message(exc))
+                continue
+            except AnswerValidationError as exc:
+                results[index] = _rejected(index, str(exc))
+                continue
+            accepted.append((index, item.user_id, response_data))
+
+        # One transaction per chunk
+        try:
+            response_ids = insert_responses(
+                db, self.validator, [(user_id, data) for _, user_id, data in accepted]
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if self.on_commit is not None and response_ids:
+            self.on_commit([
+                (response_id, user_id, data) for (_, user_id, data), response_id in zip(accepted, response_ids)
+            ])
+
+        for (index, _, _), response_id in zip(accepted, response_ids):
+            results[index] = schemas.BulkRowResult(index=index, status="accepted", response_id=response_id)
+        return [results[index] for index, _ in chunk]
+
+async def iter_bulk_chunks(request: Request, chunk_size: int = BULK_CHUNK_SIZE) -> AsyncIterator[List[Tuple[int, Any]]]:
+    """Yield (index, payload) chunks from a JSON array body or an NDJSON stream"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type in NDJSON_MEDIA_TYPES:
+        rows = _iter_ndjson(request)
+    else:
+        rows = _iter_json_array(request)
+
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+async def _iter_json_array(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Request body must be a JSON array of responses")
+    for index, row in enumerate(payload):
+        yield index, row
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    index = 0
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, _parse_ndjson_line(index, line)
+                index += 1
+    if buffer.strip():
+        yield index, _parse_ndjson_line(index, buffer)
+
+def _parse_ndjson_line(index: int, line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return _rejected(index, "Invalid JSON")
+
+def _rejected(index: int, error: str) -> schemas.BulkRowResult:
+    return schemas.BulkRowResult(index=index, status="rejected", error=error)
+
+def _validation_message(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
@@ -0,0 +1,297 @@
+import json
+import multiprocessing
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from functools import partial
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import models
+from app.models.models import utcnow
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+RESULT_EXTENSIONS = {"export": None, "rebuild_stats": "json", "bulk_import": "ndjson"}
+
+class JobCancelled(Exception):
+    """Raised inside a job once cancellation has been requested"""
+
+def result_path(job_id: int, job_type: str, params: Dict[str, Any]) -> str:
+    extension = RESULT_EXTENSIONS[job_type] or params["format"]
+    return os.path.join(settings.JOB_RESULTS_DIR, f"job_{job_id}.{extension}")
+
+def input_path(job_id: int) -> str:
+    """Spooled request payload of a bulk_import job"""
+    return os.path.join(settings.JOB_RESULTS_DIR, f"job_{job_id}.input.ndjson")
+
+def spool_input(job_id: int, rows: Iterable[Any]) -> None:
+    os.makedirs(settings.JOB_RESULTS_DIR, exist_ok=True)
+    with open(input_path(job_id), "w") as output:
+        for row in rows:
+            output.write(json.dumps(row) + "\n")
+
+class JobContext:
+    """Handle a running job uses to report progress and notice cancellation"""
+
+    def __init__(self, session_factory, job_id: int):
+        self.session_factory = session_factory
+        self.job_id = job_id
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled when cancellation was requested; reads only, so it never waits for the write lock"""
+        with self.session_factory() as db:
+            if db.scalar(select(models.Job.cancel_requested).where(models.Job.id == self.job_id)):
+                raise JobCancelled()
+
+    def progress(self, done: int, total: int) -> None:
+        """Record progress in its own short transaction; raises JobCancelled when the job was cancelled"""
+        with self.session_factory() as db:
+            cancel_requested = db.execute(
+                update(models.Job)
+                .where(models.Job.id == self.job_id)
+                .values(progress=min(done / total, 1.0) if total else 0.0)
+                .returning(models.Job.cancel_requested)
+            ).scalar_one()
+            db.commit()
+        if cancel_requested:
+            raise JobCancelled()
+
+def _export(db: Session, context: JobContext, params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    from app.services.export import export_to_file
+
+    total = db.query(func.count(models.Response.id)).filter(
+        models.Response.survey_id == params["survey_id"]
+    ).scalar()
+    with open(path, "wb") as output:
+        rows = export_to_file(
+            db, params["survey_id"], params["format"], output, on_chunk=lambda done: context.progress(done, total)
+        )
+    return {"rows": rows}
+
+def _rebuild_stats(db: Session, context: JobContext, params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    from app.services.stats import rebuild_survey_stats
+
+    # The rebuild is one write transaction; progress goes through another session and
+    # would wait on it (SQLite allows one writer), so cancellation is only checked before it
+    context.check_cancelled()
+    counters = rebuild_survey_stats(db, params.get("survey_id"))
+    db.commit()
+    summary = {"counters": counters}
+    with open(path, "w") as output:
+        json.dump(summary, output)
+    return summary
+
+def _bulk_import(db: Session, context: JobContext, params: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """Ingest the spooled rows chunk by chunk; chunks committed before a cancellation are kept"""
+    from app.services.ingest import BULK_CHUNK_SIZE, BulkIngestor
+    from app.services.validation import get_survey_validator
+
+    source = input_path(context.job_id)
+    with open(source) as rows:
+        total = sum(1 for _ in rows)
+    ingestor = BulkIngestor(get_survey_validator(db, db.get(models.Survey, params["survey_id"])))
+    accepted = rejected = done = 0
+    try:
+        with open(source) as rows, open(path, "w") as output:
+            chunk = []
+            for index, line in enumerate(rows):
+                chunk.append((index, json.loads(line)))
+                if len(chunk) == BULK_CHUNK_SIZE or index == total - 1:
+                    for result in ingestor.ingest_chunk(db, chunk):
+                        output.write(result.model_dump_json() + "\n")
+                        if result.status == "accepted":
+                            accepted += 1
+                        else:
+                            rejected += 1
+                    done += len(chunk)
+                    chunk = []
+                    context.progress(done, total)
+    finally:
+        _remove(source)
+    return {"accepted": accepted, "rejected": rejected}
+
+JOB_FUNCTIONS: Dict[str, Callable[[Session, JobContext, Dict[str, Any], str], Dict[str, Any]]] = {
+    "export": _export,
+    "rebuild_stats": _rebuild_stats,
+    "bulk_import": _bulk_import,
+}
+
+def _finish(session_factory, job_id: int, status: str, **values) -> None:
+    with session_factory() as db:
+        db.execute(
+            update(models.Job).where(models.Job.id == job_id).values(status=status, finished_at=utcnow(), **values)
+        )
+        db.commit()
+
+def _remove(path: str) -> None:
+    if os.path.exists(path):
+        os.unlink(path)
+
+class _Heartbeat:
+    """Refreshes jobs.heartbeat_at from a side thread while a job runs, so recovery can tell live jobs from dead ones"""
+
+    def __init__(self, session_factory, job_id: int):
+        self.session_factory = session_factory
+        self.job_id = job_id
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            try:
+                with self.session_factory() as db:
+                    db.execute(
+                        update(models.Job)
+                        .where(models.Job.id == self.job_id, models.Job.status == RUNNING)
+                        .values(heartbeat_at=utcnow())
+                    )
+                    db.commit()
+            except Exception:
+                # The job itself may hold the write lock; the next beat tries again
+                pass
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Move a queued job to running; False when another worker claimed it first or it was cancelled"""
+    now = utcnow()
+    claimed = db.execute(
+        update(models.Job)
+        .where(models.Job.id == job_id, models.Job.status == QUEUED, models.Job.cancel_requested.is_(False))
+        .values(status=RUNNING, started_at=now, heartbeat_at=now)
+    ).rowcount
+    if not claimed:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.id == job_id, models.Job.status == QUEUED, models.Job.cancel_requested.is_(True))
+            .values(status=CANCELLED, finished_at=now)
+        )
+    db.commit()
+    return bool(claimed)
+
+def run_job(job_id: int) -> str:
+    """Entry point in a pool process: run one queued job and record its outcome; returns the final status"""
+    from app.database.database import SessionLocal
+
+    with SessionLocal() as db:
+        if not _claim(db, job_id):
+            status = db.scalar(select(models.Job.status).where(models.Job.id == job_id))
+            return status or FAILED
+        job = db.get(models.Job, job_id)
+        job_type, params = job.job_type, dict(job.params)
+
+    os.makedirs(settings.JOB_RESULTS_DIR, exist_ok=True)
+    path = result_path(job_id, job_type, params)
+    # Written under a temporary name so a result file is only ever complete
+    partial_path = path + ".part"
+    try:
+        with SessionLocal() as db, _Heartbeat(SessionLocal, job_id):
+            summary = JOB_FUNCTIONS[job_type](db, JobContext(SessionLocal, job_id), params, partial_path)
+    except JobCancelled:
+        _remove(partial_path)
+        _finish(SessionLocal, job_id, CANCELLED)
+        return CANCELLED
+    except Exception as exc:
+        _remove(partial_path)
+        _finish(SessionLocal, job_id, FAILED, error=f"{type(exc).__name__}: {exc}")
+        return FAILED
+    os.replace(partial_path, path)
+    _finish(SessionLocal, job_id, SUCCEEDED, progress=1.0, result=summary, result_path=path)
+    return SUCCEEDED
+
+class JobRunner:
+    """Dispatches queued jobs to a process pool, at most type_limits[type] of each type at once
+
+    Jobs over their type's limit wait here, in submission order, until a job
+    of the same type finishes. State lives in the jobs table; this only
+    decides when to start them.
+    """
+
+    def __init__(self, max_workers: int, type_limits: Dict[str, int]):
+        self.max_workers = max_workers
+        self.type_limits = type_limits
+        self._pending: Dict[str, Deque[int]] = defaultdict(deque)
+        self._running: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, job_id: int, job_type: str) -> None:
+        with self._lock:
+            self._pending[job_type].append(job_id)
+        self._dispatch(job_type)
+
+    def cancel_pending(self, job_id: int, job_type: str) -> bool:
+        """Drop a job that has not been handed to the pool yet; False if it already was"""
+        with self._lock:
+            try:
+                self._pending[job_type].remove(job_id)
+            except ValueError:
+                return False
+            return True
+
+    def _dispatch(self, job_type: str) -> None:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            while self._pending[job_type] and self._running[job_type] < self.type_limits.get(job_type, 1):
+                job_id = self._pending[job_type].popleft()
+                self._running[job_type] += 1
+                self._executor.submit(run_job, job_id).add_done_callback(partial(self._done, job_type))
+
+    def _done(self, job_type: str, _future) -> None:
+        with self._lock:
+            self._running[job_type] -= 1
+        self._dispatch(job_type)
+
+    def recover(self, db: Session) -> int:
+        """Requeue queued jobs and fail running ones whose heartbeat stopped
+
+        Safe to run in every API process at startup: jobs still beating belong
+        to a live worker, and a job requeued by several processes is claimed
+        by exactly one of them (see _claim).
+        """
+        stale_before = utcnow() - timedelta(seconds=settings.JOB_STALE_AFTER)
+        db.execute(
+            update(models.Job)
+            .where(
+                models.Job.status == RUNNING,
+                or_(models.Job.heartbeat_at.is_(None), models.Job.heartbeat_at < stale_before),
+            )
+            .values(status=FAILED, error="Worker stopped responding", finished_at=utcnow())
+        )
+        queued = db.query(models.Job.id, models.Job.job_type).filter(
+            models.Job.status == QUEUED
+        ).order_by(models.Job.id).all()
+        db.commit()
+        for job_id, job_type in queued:
+            self.submit(job_id, job_type)
+        return len(queued)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+job_runner = JobRunner(settings.JOB_WORKERS, settings.JOB_TYPE_LIMITS)
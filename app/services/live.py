@@ -0,0 +1,143 @@
+import asyncio
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import models
+from app.services.serialization import dumps
+from app.services.snapshots import extract_answers
+from app.services.stats import QUESTION_BUCKET, SURVEY_TOTAL
+from app.services.validation import SurveyValidator
+
+KEEPALIVE_FRAME = b": keepalive\n\n"
+
+def sse_frame(event: str, data: Dict[str, Any], id: Optional[int] = None) -> bytes:
+    head = f"event: {event}\n" + (f"id: {id}\n" if id is not None else "")
+    return head.encode() + b"data: " + dumps(data) + b"\n\n"
+
+class LiveBroadcaster:
+    """Fans new responses out to the live viewers of a survey
+
+    Responses published for a survey are held until interval seconds after
+    the first of them, then sent as one frame that is encoded once and shared
+    by every subscriber. Surveys nobody watches cost one dict lookup per
+    publish. A subscriber whose buffer of unsent frames is full gets a single
+    "resync" frame in place of them and should reload from its cursor.
+    Everything runs on the event loop thread.
+    """
+
+    def __init__(self, interval: float, max_responses_per_frame: int, subscriber_buffer: int):
+        self.interval = interval
+        self.max_responses_per_frame = max_responses_per_frame
+        self.subscriber_buffer = subscriber_buffer
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = defaultdict(set)
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}
+        self._pending_counts: Dict[int, int] = defaultdict(int)
+        self._cursors: Dict[int, int] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+
+    def subscribe(self, survey_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(self.subscriber_buffer)
+        self._subscribers[survey_id].add(queue)
+        return queue
+
+    def unsubscribe(self, survey_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(survey_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[survey_id]
+            timer = self._timers.pop(survey_id, None)
+            if timer is not None:
+                timer.cancel()
+            self._discard_pending(survey_id)
+
+    def subscriber_count(self, survey_id: int) -> int:
+        return len(self._subscribers.get(survey_id, ()))
+
+    def publish(self, survey_id: int, responses: List[Dict[str, Any]]) -> None:
+        """Queue committed responses ({response_id, user_id, answers}) for the survey's next frame"""
+        if not responses or survey_id not in self._subscribers:
+            return
+        pending = self._pending.setdefault(survey_id, [])
+        # Past the cap only the count and cursor grow; viewers page the rest from the cursor
+        pending.extend(responses[:max(self.max_responses_per_frame - len(pending), 0)])
+        self._pending_counts[survey_id] += len(responses)
+        self._cursors[survey_id] = max(self._cursors.get(survey_id, 0), *(r["response_id"] for r in responses))
+        if survey_id not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[survey_id] = loop.call_later(self.interval, self._flush, survey_id)
+
+    def publish_validated(self, validator: SurveyValidator, rows: Iterable[Tuple[int, int, Dict[str, Any]]]) -> None:
+        """publish for freshly committed (response_id, user_id, response_data) rows"""
+        if validator.survey_id not in self._subscribers:
+            return
+        self.publish(validator.survey_id, [
+            {
+                "response_id": response_id,
+                "user_id": user_id,
+                "answers": extract_answers(response_data, validator.snapshot),
+            }
+            for response_id, user_id, response_data in rows
+        ])
+
+    def _discard_pending(self, survey_id: int):
+        responses = self._pending.pop(survey_id, [])
+        count = self._pending_counts.pop(survey_id, 0)
+        cursor = self._cursors.pop(survey_id, None)
+        return responses, count, cursor
+
+    def _flush(self, survey_id: int) -> None:
+        self._timers.pop(survey_id, None)
+        responses, count, cursor = self._discard_pending(survey_id)
+        if not count:
+            return
+        frame = sse_frame("responses", {
+            "survey_id": survey_id,
+            "count": count,
+            "cursor": cursor,
+            "truncated": count > len(responses),
+            "responses": responses,
+        }, id=cursor)
+        resync = None
+        for queue in self._subscribers.get(survey_id, ()):
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                # Too slow to keep up: replace its backlog with one instruction to reload
+                while not queue.empty():
+                    queue.get_nowait()
+                resync = resync or sse_frame("resync", {"survey_id": survey_id, "cursor": cursor}, id=cursor)
+                queue.put_nowait(resync)
+
+    async def stream(self, survey_id: int, queue: asyncio.Queue, first_frame: bytes) -> AsyncIterator[bytes]:
+        """Frames for one subscriber, with keepalive comments while idle; unsubscribes when the client leaves"""
+        try:
+            yield first_frame
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), settings.LIVE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE_FRAME
+        finally:
+            self.unsubscribe(survey_id, queue)
+
+def live_snapshot(db: Session, survey_id: int) -> Dict[str, Any]:
+    """Opening frame data: the response count from the survey counters and the newest response id"""
+    total = db.scalar(
+        select(models.SurveyStat.count).where(
+            models.SurveyStat.survey_id == survey_id,
+            models.SurveyStat.question_id == SURVEY_TOTAL,
+            models.SurveyStat.bucket == QUESTION_BUCKET,
+        )
+    )
+    cursor = db.scalar(select(func.max(models.Response.id)).where(models.Response.survey_id == survey_id))
+    return {"survey_id": survey_id, "total_responses": total or 0, "cursor": cursor or 0}
+
+live_results = LiveBroadcaster(
+    settings.LIVE_UPDATE_INTERVAL, settings.LIVE_MAX_RESPONSES_PER_FRAME, settings.LIVE_SUBSCRIBER_BUFFER
+)
@@ -0,0 +1,209 @@
+import bisect
+import contextvars
+import inspect
+import random
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+class RequestTimings:
+    """Counters for the request being measured, shared by every task and thread it spawns"""
+
+    __slots__ = ("sql_count", "sql_time", "endpoint_done", "serialize_time")
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.endpoint_done: Optional[float] = None
+        self.serialize_time = 0.0
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+class Histogram:
+    """Cumulative Prometheus histogram keyed by a tuple of label values"""
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_values: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            # Per-bucket counts, then +Inf, sum and count
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 3)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_number(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {_format_number(values[-2])}")
+            lines.append(f"{self.name}_count{{{labels}}} {int(values[-1])}")
+        return lines
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class MetricsRegistry:
+    """Per-route histograms rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        labels = ("method", "route", "status")
+        self.latency = Histogram(
+            "http_request_duration_seconds", "Total time spent handling the request", LATENCY_BUCKETS, labels)
+        self.db_time = Histogram(
+            "http_request_db_seconds", "Cumulative time spent executing SQL", LATENCY_BUCKETS, labels)
+        self.sql_count = Histogram(
+            "http_request_sql_statements", "SQL statements executed", QUERY_COUNT_BUCKETS, labels)
+        self.serialize_time = Histogram(
+            "http_request_serialization_seconds", "Time spent serializing the response model",
+            LATENCY_BUCKETS, labels)
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Response body size", SIZE_BUCKETS, labels)
+
+    def observe(self, labels: Tuple[str, str, str], timings: RequestTimings, total: float, size: int) -> None:
+        self.latency.observe(labels, total)
+        self.db_time.observe(labels, timings.sql_time)
+        self.sql_count.observe(labels, timings.sql_count)
+        self.serialize_time.observe(labels, timings.serialize_time)
+        self.response_size.observe(labels, size)
+
+    def render(self) -> str:
+        lines = []
+        for histogram in (self.latency, self.db_time, self.sql_count, self.serialize_time, self.response_size):
+            lines.extend(histogram.render())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements and DB time for the measured request (pass async_engine.sync_engine for async)"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's own context, so a statement that fails takes its start time with it
+    if _current.get() is not None and context is not None:
+        context._metrics_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None:
+        return
+    timings = _current.get()
+    if timings is not None:
+        timings.sql_count += 1
+        timings.sql_time += time.perf_counter() - started
+
+class TimedRoute(APIRoute):
+    """Route that marks when the endpoint returns, so the rest of the handler counts as serialization"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_endpoint_done(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            timings = _current.get()
+            if timings is not None and timings.endpoint_done is not None:
+                timings.serialize_time += time.perf_counter() - timings.endpoint_done
+            return response
+
+        return timed_handler
+
+def _mark_endpoint_done(endpoint: Callable) -> Callable:
+    # wraps() keeps the signature FastAPI inspects for dependencies and parameters
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            _set_endpoint_done()
+            return result
+    else:
+        @wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            result = endpoint(*args, **kwargs)
+            _set_endpoint_done()
+            return result
+    return wrapper
+
+def _set_endpoint_done() -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.endpoint_done = time.perf_counter()
+
+class MetricsMiddleware:
+    """ASGI middleware that measures a sample of requests, adds Server-Timing and feeds the registry"""
+
+    def __init__(self, app, registry: MetricsRegistry = registry, sample_rate: float = 1.0):
+        self.app = app
+        self.registry = registry
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (self.sample_rate < 1.0 and random.random() >= self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_with_timing(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, time.perf_counter() - started).encode()))
+                message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "unmatched"), str(status))
+            self.registry.observe(labels, timings, time.perf_counter() - started, size)
+
+def server_timing(timings: RequestTimings, elapsed: float) -> str:
+    """Server-Timing header value; durations are in milliseconds"""
+    return ", ".join([
+        f'db;dur={timings.sql_time * 1000:.3f};desc="{timings.sql_count} queries"',
+        f"serialize;dur={timings.serialize_time * 1000:.3f}",
+        f"total;dur={elapsed * 1000:.3f}",
+    ])
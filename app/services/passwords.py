@@ -0,0 +1,84 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.config import settings
+
+class HasherSaturated(Exception):
+    """Raised when more password operations are queued than the pool accepts"""
+
+@lru_cache()
+def password_context(rounds: int) -> CryptContext:
+    # min_rounds makes hashes with a lower cost report as needing an update
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+    )
+
+def _hash(password: str, rounds: int) -> str:
+    return password_context(rounds).hash(password)
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return password_context(rounds).verify_and_update(password, hashed)
+
+class PasswordHasher:
+    """Runs bcrypt in a bounded process pool so it never holds the event loop or a request thread
+
+    At most max_workers operations run at once and queue_limit more may wait;
+    anything beyond that is rejected with HasherSaturated instead of queueing.
+    """
+
+    def __init__(self, rounds: int, max_workers: int, queue_limit: int):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_limit
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _submit(self, fn, *args) -> asyncio.Future:
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise HasherSaturated()
+            self._pending += 1
+            if self._executor is None:
+                # spawn: forking a process that already runs threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+        try:
+            submitted = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        # Freed when the worker is done with it, not when a cancelled caller stops waiting
+        submitted.add_done_callback(self._release)
+        return asyncio.wrap_future(submitted)
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Check a password; the second item is a replacement hash when the stored cost is outdated"""
+        return await self._submit(_verify_and_update, password, hashed, self.rounds)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+password_hasher = PasswordHasher(
+    settings.BCRYPT_ROUNDS, settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT
+)
@@ -0,0 +1,164 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import ColumnElement
+
+from app.models import models
+from app.schemas import schemas
+from app.services.snapshots import SchemaSnapshot, extract_answers, get_snapshots, render_response_data, survey_snapshots
+
+# Number of rows fetched per round trip when streaming responses
+STREAM_CHUNK_SIZE = 1000
+
+def _page_filters(survey_id: Optional[int], after: Optional[int], user_id: Optional[int]) -> list:
+    filters = []
+    if survey_id is not None:
+        filters.append(models.Response.survey_id == survey_id)
+    if user_id is not None:
+        filters.append(models.Response.user_id == user_id)
+    if after is not None:
+        filters.append(models.Response.id > after)
+    return filters
+
+def fetch_response_page(
+    db: Session,
+    survey_id: Optional[int],
+    after: Optional[int],
+    limit: int,
+    user_id: Optional[int] = None,
+) -> Tuple[List[models.Response], Optional[int]]:
+    """Return one keyset page of responses ordered by id and the cursor for the next page
+
+    Filtering by survey, user, or both is served by the (survey_id, id),
+    (survey_id, user_id, id) and (user_id, id) indexes on responses.
+    """
+    query = db.query(models.Response).filter(*_page_filters(survey_id, after, user_id))
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.order_by(models.Response.id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def fetch_formatted_page(
+    db: Session, survey_id: int, after: Optional[int], limit: int, condition: Optional[ColumnElement] = None
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """Same page as fetch_response_page, built as plain dicts straight from the row tuples
+
+    condition is a compiled answer filter (see app.services.filters).
+    """
+    filters = _page_filters(survey_id, after, None)
+    if condition is not None:
+        filters.append(condition)
+    rows = db.execute(
+        select(
+            models.Response.id,
+            models.Response.user_id,
+            models.Response.schema_version_id,
+            models.Response.response_data,
+        )
+        .where(*filters)
+        .order_by(models.Response.id)
+        .limit(limit + 1)
+    ).all()
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    rows = rows[:limit]
+    snapshots = get_snapshots(db, (row.schema_version_id for row in rows))
+    return [
+        {
+            "response_id": response_id,
+            "user_id": user_id,
+            "answers": extract_answers(response_data, snapshots.get(schema_version_id)),
+        }
+        for response_id, user_id, schema_version_id, response_data in rows
+    ], next_cursor
+
+def render_responses(db: Session, responses: List[models.Response]) -> List[schemas.Response]:
+    """API view of stored responses, with answers keyed by question text again"""
+    snapshots = get_snapshots(db, (response.schema_version_id for response in responses))
+    return [
+        schemas.Response(
+            id=response.id,
+            survey_id=response.survey_id,
+            user_id=response.user_id,
+            version=response.version,
+            response_data=render_response_data(response.response_data, snapshots.get(response.schema_version_id)),
+        )
+        for response in responses
+    ]
+
+async def iter_response_chunks(
+    db: AsyncSession, survey_id: int, after: Optional[int] = None, condition: Optional[ColumnElement] = None
+) -> AsyncIterator[list]:
+    """Yield (id, user_id, answers by question text) rows in chunks from a server-side cursor"""
+    # A survey has a handful of schema versions; load them all before streaming
+    snapshots: Dict[int, SchemaSnapshot] = await db.run_sync(survey_snapshots, survey_id)
+    statement = (
+        select(
+            models.Response.id,
+            models.Response.user_id,
+            models.Response.schema_version_id,
+            models.Response.response_data,
+        )
+        .where(models.Response.survey_id == survey_id)
+        .order_by(models.Response.id)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    if after is not None:
+        statement = statement.where(models.Response.id > after)
+    if condition is not None:
+        statement = statement.where(condition)
+
+    result = await db.stream(statement)
+    async for chunk in result.partitions():
+        yield [
+            (response_id, user_id, extract_answers(response_data, snapshots.get(schema_version_id)))
+            for response_id, user_id, schema_version_id, response_data in chunk
+        ]
+
+async def stream_ndjson(
+    db: AsyncSession, survey_id: int, after: Optional[int] = None, condition: Optional[ColumnElement] = None
+) -> AsyncIterator[str]:
+    async for chunk in iter_response_chunks(db, survey_id, after, condition):
+        yield "".join(
+            json.dumps({
+                "response_id": response_id,
+                "user_id": user_id,
+                "answers": answers,
+            }) + "\n"
+            for response_id, user_id, answers in chunk
+        )
+
+async def stream_csv(
+    db: AsyncSession,
+    survey_id: int,
+    question_texts: List[str],
+    after: Optional[int] = None,
+    condition: Optional[ColumnElement] = None,
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(["response_id", "user_id", *question_texts])
+    yield buffer.getvalue()
+
+    async for chunk in iter_response_chunks(db, survey_id, after, condition):
+        buffer.seek(0)
+        buffer.truncate()
+        for response_id, user_id, answers in chunk:
+            writer.writerow([
+                response_id,
+                user_id,
+                *(_csv_value(answers.get(text)) for text in question_texts),
+            ])
+        yield buffer.getvalue()
+
+def _csv_value(answer: Any) -> Any:
+    # Lists (checkbox / multi-select answers) are kept as JSON so the cell round-trips
+    if isinstance(answer, (list, dict)):
+        return json.dumps(answer)
+    return "" if answer is None else answer
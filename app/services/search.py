@@ -0,0 +1,224 @@
+import argparse
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, select, text
+from sqlalchemy.orm import Session
+
+from app.database.database import Base
+from app.models import models
+from app.schemas import schemas
+from app.services.snapshots import extract_answers, get_snapshots
+
+# Question types whose answers are indexed for full-text search
+TEXT_TYPES = ("short_text", "long_text", "text")
+
+# One document per response holding all of its text answers
+SEARCH_DDL = {
+    "sqlite": [
+        # rowid is the response id; survey_id is stored but not tokenized
+        "CREATE VIRTUAL TABLE IF NOT EXISTS response_search "
+        "USING fts5(content, survey_id UNINDEXED, tokenize = 'porter unicode61')",
+    ],
+    "postgresql": [
+        "CREATE TABLE IF NOT EXISTS response_search ("
+        "response_id INTEGER PRIMARY KEY REFERENCES responses (id), "
+        "survey_id INTEGER NOT NULL, "
+        "content TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_response_search_document "
+        "ON response_search USING GIN (to_tsvector('english', content))",
+        "CREATE INDEX IF NOT EXISTS ix_response_search_survey_id ON response_search (survey_id)",
+    ],
+}
+
+# Hits ordered by ascending score (better first), then response id, resuming after a cursor
+SEARCH_SQL = {
+    "sqlite": """
+        SELECT response_id, score FROM (
+            SELECT rowid AS response_id, bm25(response_search) AS score
+            FROM response_search
+            WHERE response_search MATCH :query AND survey_id = :survey_id
+        )
+        WHERE :after_score IS NULL OR score > :after_score
+            OR (score = :after_score AND response_id > :after_id)
+        ORDER BY score, response_id
+        LIMIT :limit
+    """,
+    "postgresql": """
+        SELECT response_id, score FROM (
+            SELECT response_id,
+                -ts_rank(to_tsvector('english', content), websearch_to_tsquery('english', :query)) AS score
+            FROM response_search
+            WHERE survey_id = :survey_id
+                AND to_tsvector('english', content) @@ websearch_to_tsquery('english', :query)
+        ) AS hits
+        WHERE CAST(:after_score AS DOUBLE PRECISION) IS NULL OR score > :after_score
+            OR (score = :after_score AND response_id > :after_id)
+        ORDER BY score, response_id
+        LIMIT :limit
+    """,
+}
+
+class SearchUnavailable(RuntimeError):
+    """Raised when the database has no full-text index implementation here"""
+
+def _dialect(db: Session) -> str:
+    return db.get_bind().dialect.name
+
+def _key_column(dialect: str) -> str:
+    return "rowid" if dialect == "sqlite" else "response_id"
+
+def create_search_index(connection) -> None:
+    for statement in SEARCH_DDL.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+def drop_search_index(connection) -> None:
+    if connection.dialect.name in SEARCH_DDL:
+        connection.execute(text("DROP TABLE IF EXISTS response_search"))
+
+# The index is not an ORM table, so create and drop it alongside the metadata
+event.listen(Base.metadata, "after_create", lambda target, connection, **kw: create_search_index(connection))
+event.listen(Base.metadata, "before_drop", lambda target, connection, **kw: drop_search_index(connection))
+
+def search_documents(answer_rows: Iterable[Dict[str, Any]], question_types: Dict[int, str]) -> Dict[int, str]:
+    """Group text answers by response into the documents to index"""
+    documents = defaultdict(list)
+    for row in answer_rows:
+        if question_types.get(row["question_id"]) in TEXT_TYPES and row["value_text"]:
+            documents[row["response_id"]].append(row["value_text"])
+    return {response_id: "\n".join(values) for response_id, values in documents.items()}
+
+def index_documents(db: Session, survey_id: int, documents: Dict[int, str]) -> None:
+    """Add response documents to the index inside the caller's transaction"""
+    dialect = _dialect(db)
+    if dialect not in SEARCH_DDL or not documents:
+        return
+    db.execute(
+        text(f"INSERT INTO response_search ({_key_column(dialect)}, survey_id, content) "
+             "VALUES (:response_id, :survey_id, :content)"),
+        [
+            {"response_id": response_id, "survey_id": survey_id, "content": content}
+            for response_id, content in documents.items()
+        ],
+    )
+
+def remove_documents(db: Session, response_ids: List[int]) -> None:
+    dialect = _dialect(db)
+    if dialect not in SEARCH_DDL or not response_ids:
+        return
+    db.execute(
+        text(f"DELETE FROM response_search WHERE {_key_column(dialect)} = :response_id"),
+        [{"response_id": response_id} for response_id in response_ids],
+    )
+
+def _fts5_query(query: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 query syntax
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+def encode_cursor(score: float, response_id: int) -> str:
+    return f"{score!r}:{response_id}"
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Parse a cursor from encode_cursor; raises ValueError when it is malformed"""
+    score, response_id = cursor.rsplit(":", 1)
+    return float(score), int(response_id)
+
+def search_responses(
+    db: Session, survey_id: int, query: str, after: Optional[str], limit: int
+) -> Tuple[List[schemas.SearchHit], Optional[str]]:
+    """Rank a survey's responses against a text query; returns one keyset page and the next cursor"""
+    dialect = _dialect(db)
+    if dialect not in SEARCH_SQL:
+        raise SearchUnavailable(f"Full-text search is not supported on {dialect}")
+    match = _fts5_query(query) if dialect == "sqlite" else query
+    if not match.strip():
+        return [], None
+    after_score, after_id = decode_cursor(after) if after else (None, None)
+
+    rows = db.execute(text(SEARCH_SQL[dialect]), {
+        "query": match,
+        "survey_id": survey_id,
+        "after_score": after_score,
+        "after_id": after_id,
+        "limit": limit + 1,
+    }).all()
+    next_cursor = encode_cursor(rows[limit - 1].score, rows[limit - 1].response_id) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    responses = {
+        response.id: response for response in db.execute(
+            select(models.Response).where(models.Response.id.in_([row.response_id for row in rows]))
+        ).scalars()
+    }
+    snapshots = get_snapshots(db, (response.schema_version_id for response in responses.values()))
+    hits = []
+    for row in rows:
+        response = responses.get(row.response_id)
+        if response is None:
+            continue
+        hits.append(schemas.SearchHit(
+            response_id=response.id,
+            user_id=response.user_id,
+            score=-row.score,
+            answers=extract_answers(response.response_data, snapshots.get(response.schema_version_id)),
+        ))
+    return hits, next_cursor
+
+def rebuild_search_index(db: Session, survey_id: Optional[int] = None) -> int:
+    """Re-index text answers from the answers table; returns the number of documents
+
+    The caller owns the transaction.
+    """
+    dialect = _dialect(db)
+    if dialect not in SEARCH_DDL:
+        return 0
+    if survey_id is None:
+        db.execute(text("DELETE FROM response_search"))
+    else:
+        db.execute(text("DELETE FROM response_search WHERE survey_id = :survey_id"), {"survey_id": survey_id})
+
+    query = db.query(
+        models.Answer.survey_id, models.Answer.response_id, models.Answer.question_id, models.Answer.value_text
+    ).join(models.Question, models.Question.id == models.Answer.question_id).filter(
+        models.Question.question_type.in_(TEXT_TYPES)
+    ).order_by(models.Answer.survey_id, models.Answer.response_id, models.Answer.id)
+    if survey_id is not None:
+        query = query.filter(models.Answer.survey_id == survey_id)
+
+    # Rows arrive grouped by survey, so each survey's documents are written before the next is read
+    count = 0
+    current_survey = None
+    documents: Dict[int, List[str]] = defaultdict(list)
+    for row in query.yield_per(10000):
+        if row.survey_id != current_survey:
+            count += _write_documents(db, current_survey, documents)
+            current_survey, documents = row.survey_id, defaultdict(list)
+        if row.value_text:
+            documents[row.response_id].append(row.value_text)
+    return count + _write_documents(db, current_survey, documents)
+
+def _write_documents(db: Session, survey_id: Optional[int], documents: Dict[int, List[str]]) -> int:
+    if survey_id is None:
+        return 0
+    index_documents(db, survey_id, {response_id: "\n".join(values) for response_id, values in documents.items()})
+    return len(documents)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the full-text index over text answers")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="Re-index text answers from the answers table")
+    rebuild.add_argument("--survey-id", type=int, default=None, help="Only rebuild this survey")
+    args = parser.parse_args(argv)
+
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = rebuild_search_index(db, args.survey_id)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Indexed {count} responses")
+
+if __name__ == "__main__":
+    main()
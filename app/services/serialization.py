@@ -0,0 +1,21 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Encode plain dicts/lists to compact JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for content that is already plain data; skips response_model validation"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,126 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import models
+
+class SchemaSnapshot:
+    """One immutable version of a survey's questions, used to render compact response_data"""
+
+    def __init__(self, id: int, survey_id: int, version: int, questions: List[Dict[str, Any]]):
+        self.id = id
+        self.survey_id = survey_id
+        self.version = version
+        self.questions = questions
+        # response_data keys are question ids as JSON object keys, i.e. strings
+        self.texts = {str(q["id"]): q["question_text"] for q in questions}
+        self.types = {str(q["id"]): q["question_type"] for q in questions}
+
+_cache: "OrderedDict[int, SchemaSnapshot]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _remember(snapshot: SchemaSnapshot) -> SchemaSnapshot:
+    with _cache_lock:
+        _cache[snapshot.id] = snapshot
+        _cache.move_to_end(snapshot.id)
+        while len(_cache) > settings.SCHEMA_SNAPSHOT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return snapshot
+
+def _from_row(row) -> SchemaSnapshot:
+    return SchemaSnapshot(row.id, row.survey_id, row.version, row.questions)
+
+def create_snapshot(
+    db: Session, survey_id: int, version: int, questions: Optional[List[models.Question]] = None
+) -> int:
+    """Record the survey's current questions as schema version `version`; the caller commits
+
+    questions, when already loaded, must be in (order, id) order.
+    """
+    if questions is None:
+        questions = db.query(models.Question).filter(
+            models.Question.survey_id == survey_id
+        ).order_by(models.Question.order, models.Question.id).all()
+    return db.execute(
+        insert(models.SurveySchemaVersion).values(
+            survey_id=survey_id,
+            version=version,
+            questions=[
+                {
+                    "id": question.id,
+                    "question_text": question.question_text,
+                    "question_type": question.question_type,
+                    "options": question.options,
+                    "required": question.required,
+                    "order": question.order,
+                } for question in questions
+            ],
+        ).returning(models.SurveySchemaVersion.id)
+    ).scalar_one()
+
+def find_snapshot(db: Session, survey_id: int, version: int) -> Optional[SchemaSnapshot]:
+    row = db.execute(
+        select(models.SurveySchemaVersion).where(
+            models.SurveySchemaVersion.survey_id == survey_id,
+            models.SurveySchemaVersion.version == version,
+        )
+    ).scalar_one_or_none()
+    return _remember(_from_row(row)) if row is not None else None
+
+def get_snapshots(db: Session, snapshot_ids: Iterable[Optional[int]]) -> Dict[int, SchemaSnapshot]:
+    """Return snapshots by id, loading the ones not cached yet in one query"""
+    found = {}
+    missing = []
+    with _cache_lock:
+        for snapshot_id in set(snapshot_ids):
+            if snapshot_id is None:
+                continue
+            snapshot = _cache.get(snapshot_id)
+            if snapshot is None:
+                missing.append(snapshot_id)
+            else:
+                found[snapshot_id] = snapshot
+    if missing:
+        for row in db.execute(
+            select(models.SurveySchemaVersion).where(models.SurveySchemaVersion.id.in_(missing))
+        ).scalars():
+            found[row.id] = _remember(_from_row(row))
+    return found
+
+def survey_snapshots(db: Session, survey_id: int) -> Dict[int, SchemaSnapshot]:
+    """Every schema version of a survey, for readers that scan all of its responses"""
+    ids = db.execute(
+        select(models.SurveySchemaVersion.id).where(models.SurveySchemaVersion.survey_id == survey_id)
+    ).scalars().all()
+    return get_snapshots(db, ids)
+
+def extract_answers(response_data: Dict[str, Any], snapshot: Optional[SchemaSnapshot]) -> Dict[str, Any]:
+    """Reduce stored response_data to a question text -> answer map"""
+    if snapshot is None:
+        # Legacy rows are keyed by question text and carry their own metadata
+        return {question_text: data["answer"] for question_text, data in response_data.items()}
+    return {snapshot.texts.get(question_id, question_id): answer for question_id, answer in response_data.items()}
+
+def render_response_data(
+    response_data: Dict[str, Any], snapshot: Optional[SchemaSnapshot]
+) -> Dict[str, Dict[str, Any]]:
+    """API view of stored response_data: question text -> {question_id, question_type, answer}"""
+    if snapshot is None:
+        return {
+            question_text: {
+                "question_id": data.get("question_id"),
+                "question_type": data.get("question_type"),
+                "answer": data["answer"],
+            } for question_text, data in response_data.items()
+        }
+    return {
+        snapshot.texts.get(question_id, question_id): {
+            "question_id": int(question_id),
+            "question_type": snapshot.types.get(question_id),
+            "answer": answer,
+        } for question_id, answer in response_data.items()
+    }
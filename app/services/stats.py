@@ -0,0 +1,221 @@
+import argparse
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import models
+
+CHOICE_TYPES = ("multiple_choice", "checkbox")
+
+# question_id used for the survey-wide response counter
+SURVEY_TOTAL = 0
+
+# bucket used for question-level counters (answered responses, numeric sums)
+QUESTION_BUCKET = ""
+
+# Significant digits kept by number buckets: at most 900 buckets per power of ten, and
+# percentiles within 0.5% of the true value (exact for values like ages or ratings)
+NUMBER_BUCKET_DIGITS = 3
+
+StatKey = Tuple[int, int, str]
+
+def number_bucket(value: float) -> Optional[str]:
+    """Counter bucket of a numeric answer: the value rounded to NUMBER_BUCKET_DIGITS significant digits"""
+    if not math.isfinite(value):
+        return None
+    # + 0.0 folds -0.0 into the same bucket as 0.0
+    return f"{float(f'{value:.{NUMBER_BUCKET_DIGITS}g}') + 0.0:.{NUMBER_BUCKET_DIGITS}g}"
+
+def stat_bucket(question_type: Optional[str], row: Dict[str, Any]) -> Optional[str]:
+    """Return the per-value counter bucket an answer row contributes to, if any"""
+    if question_type in CHOICE_TYPES:
+        return row["value_text"]
+    if question_type == "date" and row["value_date"] is not None:
+        return row["value_date"].strftime("%Y-%m")
+    if question_type == "number" and row["value_number"] is not None:
+        return number_bucket(row["value_number"])
+    return None
+
+def apply_response_stats(
+    db: Session,
+    survey_id: int,
+    question_types: Dict[int, str],
+    answer_rows: Iterable[Dict[str, Any]],
+    response_count: int,
+    sign: int = 1,
+) -> None:
+    """Add (sign=1) or subtract (sign=-1) the contribution of answer rows to survey_stats
+
+    Runs inside the caller's transaction so counters commit together with the
+    responses they describe. Editing a response subtracts its old answer rows
+    with response_count=0 and adds the new ones the same way.
+    """
+    deltas: Dict[StatKey, List[float]] = defaultdict(lambda: [0, 0, 0.0])
+    answered = set()
+
+    for row in answer_rows:
+        question_id = row["question_id"]
+        question_key = (survey_id, question_id, QUESTION_BUCKET)
+        if (row["response_id"], question_id) not in answered:
+            answered.add((row["response_id"], question_id))
+            deltas[question_key][0] += sign
+        if row["value_number"] is not None:
+            deltas[question_key][1] += sign
+            deltas[question_key][2] += sign * row["value_number"]
+
+        bucket = stat_bucket(question_types.get(question_id), row)
+        if bucket is not None:
+            deltas[(survey_id, question_id, bucket)][0] += sign
+
+    if response_count:
+        deltas[(survey_id, SURVEY_TOTAL, QUESTION_BUCKET)][0] += sign * response_count
+
+    _upsert_deltas(db, deltas)
+
+def _upsert_deltas(db: Session, deltas: Dict[StatKey, List[float]]) -> None:
+    if not deltas:
+        return
+    # Sorted keys keep concurrent writers locking rows in the same order
+    rows = [
+        {
+            "survey_id": survey_id,
+            "question_id": question_id,
+            "bucket": bucket,
+            "count": count,
+            "value_count": value_count,
+            "value_sum": value_sum,
+        }
+        for (survey_id, question_id, bucket), (count, value_count, value_sum) in sorted(deltas.items())
+    ]
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        statement = dialect_insert(models.SurveyStat)
+        statement = statement.on_conflict_do_update(
+            index_elements=["survey_id", "question_id", "bucket"],
+            set_={
+                "count": models.SurveyStat.count + statement.excluded.count,
+                "value_count": models.SurveyStat.value_count + statement.excluded.value_count,
+                "value_sum": models.SurveyStat.value_sum + statement.excluded.value_sum,
+            },
+        )
+        db.execute(statement, rows)
+        return
+
+    # Portable fallback for dialects without ON CONFLICT
+    for row in rows:
+        stat = db.query(models.SurveyStat).filter(
+            models.SurveyStat.survey_id == row["survey_id"],
+            models.SurveyStat.question_id == row["question_id"],
+            models.SurveyStat.bucket == row["bucket"],
+        ).with_for_update().first()
+        if stat is None:
+            db.add(models.SurveyStat(**row))
+        else:
+            stat.count += row["count"]
+            stat.value_count += row["value_count"]
+            stat.value_sum += row["value_sum"]
+    db.flush()
+
+def rebuild_survey_stats(db: Session, survey_id: Optional[int] = None) -> int:
+    """Recompute survey_stats from responses and answers; returns the number of counter rows
+
+    Pass a survey id to rebuild one survey, or None to rebuild every survey.
+    The caller owns the transaction.
+    """
+    def scoped(query, column):
+        return query.filter(column == survey_id) if survey_id is not None else query
+
+    clear = delete(models.SurveyStat)
+    if survey_id is not None:
+        clear = clear.where(models.SurveyStat.survey_id == survey_id)
+    db.execute(clear)
+
+    rows: Dict[StatKey, List[float]] = defaultdict(lambda: [0, 0, 0.0])
+
+    totals = scoped(
+        db.query(models.Response.survey_id, func.count(models.Response.id)),
+        models.Response.survey_id,
+    ).group_by(models.Response.survey_id)
+    for stat_survey_id, count in totals:
+        rows[(stat_survey_id, SURVEY_TOTAL, QUESTION_BUCKET)][0] = count
+
+    per_question = scoped(
+        db.query(
+            models.Answer.survey_id,
+            models.Answer.question_id,
+            func.count(func.distinct(models.Answer.response_id)),
+            func.count(models.Answer.value_number),
+            func.coalesce(func.sum(models.Answer.value_number), 0.0),
+        ),
+        models.Answer.survey_id,
+    ).group_by(models.Answer.survey_id, models.Answer.question_id)
+    for stat_survey_id, question_id, answered, value_count, value_sum in per_question:
+        rows[(stat_survey_id, question_id, QUESTION_BUCKET)] = [answered, value_count, value_sum]
+
+    per_value = scoped(
+        db.query(
+            models.Answer.survey_id,
+            models.Answer.question_id,
+            models.Question.question_type,
+            models.Answer.value_text,
+            models.Answer.value_number,
+            models.Answer.value_date,
+            func.count(models.Answer.id),
+        ).join(models.Question, models.Question.id == models.Answer.question_id),
+        models.Answer.survey_id,
+    ).filter(
+        models.Question.question_type.in_(CHOICE_TYPES + ("date", "number"))
+    ).group_by(
+        models.Answer.survey_id,
+        models.Answer.question_id,
+        models.Question.question_type,
+        models.Answer.value_text,
+        models.Answer.value_number,
+        models.Answer.value_date,
+    )
+    for stat_survey_id, question_id, question_type, value_text, value_number, value_date, count in per_value:
+        bucket = stat_bucket(
+            question_type, {"value_text": value_text, "value_number": value_number, "value_date": value_date}
+        )
+        if bucket is not None:
+            rows[(stat_survey_id, question_id, bucket)][0] += count
+
+    if rows:
+        db.execute(insert(models.SurveyStat), [
+            {
+                "survey_id": stat_survey_id,
+                "question_id": question_id,
+                "bucket": bucket,
+                "count": count,
+                "value_count": value_count,
+                "value_sum": value_sum,
+            }
+            for (stat_survey_id, question_id, bucket), (count, value_count, value_sum) in rows.items()
+        ])
+    return len(rows)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Maintain the survey_stats result counters")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    rebuild = subcommands.add_parser("rebuild", help="Recompute counters from stored answers")
+    rebuild.add_argument("--survey-id", type=int, default=None, help="Only rebuild this survey")
+    args = parser.parse_args(argv)
+
+    from app.database.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        count = rebuild_survey_stats(db, args.survey_id)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Rebuilt {count} survey_stats rows")
+
+if __name__ == "__main__":
+    main()
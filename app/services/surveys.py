@@ -0,0 +1,72 @@
+from typing import Optional
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session, selectinload
+
+from app.database.database import insert_returning_ids
+from app.models import models
+from app.schemas import schemas
+from app.services.answers import build_option_rows, parse_options
+from app.services.snapshots import create_snapshot
+
+def survey_definition_options():
+    """Loader options that fetch a survey's questions and their options in two extra queries"""
+    return (
+        selectinload(models.Survey.questions)
+        .selectinload(models.Question.question_options),
+    )
+
+def load_survey(db: Session, survey_id: int) -> Optional[models.Survey]:
+    """Load a survey with everything schemas.Survey serializes, without lazy loads"""
+    return db.query(models.Survey).options(
+        *survey_definition_options()
+    ).filter(models.Survey.id == survey_id).first()
+
+def load_question(db: Session, question_id: int) -> Optional[models.Question]:
+    return db.query(models.Question).options(
+        selectinload(models.Question.question_options)
+    ).filter(models.Question.id == question_id).first()
+
+def create_survey(db: Session, survey: schemas.SurveyCreate) -> int:
+    """Insert a survey with its questions and options; the caller commits"""
+    db_survey = models.Survey(title=survey.title, description=survey.description)
+    db.add(db_survey)
+    db.flush()
+
+    # Add questions and their options with one batched insert each
+    question_ids = insert_returning_ids(db, models.Question, [
+        {
+            "survey_id": db_survey.id,
+            "question_text": question.question_text,
+            "question_type": question.question_type,
+            "options": question.options,
+            "required": question.required,
+            "order": question.order
+        } for question in survey.questions
+    ])
+    option_rows = [
+        {"question_id": question_id, "option_text": option_text, "is_correct": 0}
+        for question_id, question in zip(question_ids, survey.questions)
+        for option_text in parse_options(question.options)
+    ]
+    if option_rows:
+        db.execute(insert(models.QuestionOption.__table__), option_rows)
+    create_snapshot(db, db_survey.id, db_survey.schema_version)
+    return db_survey.id
+
+def add_question(db: Session, survey: models.Survey, question: schemas.QuestionCreate) -> int:
+    """Add a question to a survey and bump its schema version; the caller commits"""
+    # Adding a question changes the form, so compiled validators must be rebuilt. The bump is
+    # one statement, so concurrent additions get distinct versions (and queue on the row lock)
+    version = db.execute(
+        update(models.Survey)
+        .where(models.Survey.id == survey.id)
+        .values(schema_version=func.coalesce(models.Survey.schema_version, 0) + 1)
+        .returning(models.Survey.schema_version)
+    ).scalar_one()
+
+    db_question = models.Question(**question.model_dump(), question_options=build_option_rows(question.options))
+    db.add(db_question)
+    db.flush()
+    create_snapshot(db, survey.id, version)
+    return db_question.id
@@ -0,0 +1,146 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+
+from app.config import settings
+from app.models import models
+from app.services.snapshots import SchemaSnapshot, create_snapshot, find_snapshot
+
+class AnswerValidationError(ValueError):
+    """Raised when a submission does not match the survey's questions"""
+
+class CompiledQuestion(NamedTuple):
+    id: int
+    question_text: str
+    question_type: str
+    options: Optional[str]
+    valid_options: Optional[FrozenSet[Any]]
+
+class SurveyValidator:
+    """Validation rules for one version of a survey, compiled once from its questions"""
+
+    def __init__(
+        self,
+        survey_id: int,
+        schema_version: int,
+        questions: Iterable[models.Question],
+        snapshot: Optional[SchemaSnapshot] = None,
+    ):
+        self.survey_id = survey_id
+        self.schema_version = schema_version
+        # Responses validated here are stored against this snapshot of the form
+        self.snapshot = snapshot
+        self.schema_version_id = snapshot.id if snapshot is not None else None
+        self.questions: Dict[str, CompiledQuestion] = {}
+        self.required: List[CompiledQuestion] = []
+        # question id -> option text -> QuestionOption id
+        self.option_ids: Dict[int, Dict[str, int]] = {}
+        self.question_types: Dict[int, str] = {}
+
+        for question in questions:
+            valid_options = None
+            if question.question_type == "multiple_choice" and question.options:
+                valid_options = frozenset(json.loads(question.options))
+            self.questions[question.question_text] = CompiledQuestion(
+                id=question.id,
+                question_text=question.question_text,
+                question_type=question.question_type,
+                options=question.options,
+                valid_options=valid_options,
+            )
+            self.question_types[question.id] = question.question_type
+            if question.required:
+                self.required.append(self.questions[question.question_text])
+            if question.question_options:
+                self.option_ids[question.id] = {
+                    option.option_text: option.id for option in question.question_options
+                }
+
+    def validate(self, answers: Iterable[Any]) -> Dict[str, Any]:
+        """Check a submission in one pass and return the response_data to store
+
+        Only question id -> answer is stored; texts, types and options live in
+        the schema snapshot the response references.
+        """
+        response_data = {}
+        answer_error = None
+
+        for answer in answers:
+            question = self.questions.get(answer.question_text)
+            if question is None:
+                answer_error = answer_error or f"Question not found in survey: {answer.question_text}"
+                continue
+
+            if question.valid_options is not None and answer_error is None:
+                selected = answer.answer if isinstance(answer.answer, list) else [answer.answer]
+                for option in selected:
+                    if not _is_valid_option(option, question.valid_options):
+                        answer_error = f"Invalid option for question '{answer.question_text}': {option}"
+                        break
+
+            response_data[str(question.id)] = answer.answer
+
+        # Missing required answers are reported before invalid ones
+        for question in self.required:
+            if str(question.id) not in response_data:
+                raise AnswerValidationError(f"Required question not answered: {question.question_text}")
+        if answer_error:
+            raise AnswerValidationError(answer_error)
+
+        return response_data
+
+def _is_valid_option(option: Any, valid_options: FrozenSet[Any]) -> bool:
+    try:
+        return option in valid_options
+    except TypeError:
+        # Unhashable answers (e.g. nested objects) can never match an option
+        return False
+
+_cache: "OrderedDict[Tuple[int, int], SurveyValidator]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def get_survey_validator(db: Session, survey: models.Survey) -> SurveyValidator:
+    """Return the compiled validator for the survey's current schema version"""
+    key = (survey.id, survey.schema_version)
+    with _cache_lock:
+        validator = _cache.get(key)
+        if validator is not None:
+            _cache.move_to_end(key)
+            return validator
+
+    questions = db.query(models.Question).options(
+        selectinload(models.Question.question_options)
+    ).filter(
+        models.Question.survey_id == survey.id
+    ).order_by(models.Question.order, models.Question.id).all()
+    snapshot = find_snapshot(db, survey.id, survey.schema_version)
+    if snapshot is None:
+        # Survey predates schema snapshots; the new one commits with the caller's
+        # transaction, so the validator is not cached until it can be read back.
+        # The savepoint holds only the insert, so a concurrent first request that
+        # wins the unique constraint leaves this transaction usable to read its row
+        try:
+            with db.begin_nested():
+                create_snapshot(db, survey.id, survey.schema_version, questions)
+        except IntegrityError:
+            pass
+        return SurveyValidator(
+            survey.id, survey.schema_version, questions, find_snapshot(db, survey.id, survey.schema_version)
+        )
+    validator = SurveyValidator(survey.id, survey.schema_version, questions, snapshot)
+
+    with _cache_lock:
+        _cache[key] = validator
+        while len(_cache) > settings.VALIDATOR_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return validator
+
+def invalidate_survey_validator(survey_id: int) -> None:
+    """Drop every cached validator of a survey after its form changed"""
+    with _cache_lock:
+        for key in [key for key in _cache if key[0] == survey_id]:
+            del _cache[key]
@@ -0,0 +1,154 @@
+import asyncio
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.database import AsyncSessionLocal
+from app.services.ingest import insert_responses
+from app.services.validation import SurveyValidator
+
+OVERFLOW_POLICIES = ("wait", "reject")
+
+class WriteBehindSaturated(Exception):
+    """Raised when the queue is full and the submission cannot wait for room"""
+
+class Submission(NamedTuple):
+    validator: SurveyValidator
+    user_id: int
+    response_data: Dict[str, Any]
+    future: asyncio.Future
+
+# Queued by stop() so the writer flushes what is ahead of it and exits
+_STOP = object()
+
+def _insert_batch(db: Session, batch: List[Submission]) -> List[int]:
+    """Insert a batch with one insert_responses call per survey schema version; ids in batch order"""
+    groups: Dict[Any, List[int]] = {}
+    for position, submission in enumerate(batch):
+        key = (submission.validator.survey_id, submission.validator.schema_version_id)
+        groups.setdefault(key, []).append(position)
+
+    response_ids = [0] * len(batch)
+    for positions in groups.values():
+        validator = batch[positions[0]].validator
+        ids = insert_responses(db, validator, [(batch[p].user_id, batch[p].response_data) for p in positions])
+        for position, response_id in zip(positions, ids):
+            response_ids[position] = response_id
+    return response_ids
+
+class WriteBehindQueue:
+    """Group commit for response submissions
+
+    Callers queue validated responses; a single writer task inserts whatever is
+    waiting as one transaction once batch_size submissions are queued or the
+    oldest has waited flush_interval_ms. Each caller resumes with its response
+    id only after that commit. When max_queue submissions are already waiting,
+    overflow "wait" blocks the caller for up to enqueue_timeout seconds and
+    "reject" fails at once; either way the caller gets WriteBehindSaturated.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        batch_size: int,
+        flush_interval_ms: float,
+        max_queue: int,
+        overflow: str = "wait",
+        enqueue_timeout: float = 1.0,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.enqueue_timeout = enqueue_timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # First use, or the app now runs on a new event loop
+            self._loop = loop
+            self._queue = asyncio.Queue(self.max_queue)
+            self._task = loop.create_task(self._run())
+        return loop
+
+    async def submit(self, validator: SurveyValidator, user_id: int, response_data: Dict[str, Any]) -> int:
+        """Queue one validated response and return its id once the batch holding it has committed"""
+        loop = self._ensure_started()
+        submission = Submission(validator, user_id, response_data, loop.create_future())
+        try:
+            if self.overflow == "reject":
+                self._queue.put_nowait(submission)
+            else:
+                await asyncio.wait_for(self._queue.put(submission), self.enqueue_timeout)
+        except (asyncio.QueueFull, asyncio.TimeoutError):
+            raise WriteBehindSaturated()
+        return await submission.future
+
+    async def stop(self) -> None:
+        """Flush everything already queued, then stop the writer"""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._loop = self._queue = self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                try:
+                    if remaining > 0:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    else:
+                        # Past the deadline, still take whatever is already waiting
+                        item = self._queue.get_nowait()
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Submission]) -> None:
+        try:
+            async with self.session_factory() as db:
+                response_ids = await db.run_sync(_insert_batch, batch)
+                await db.commit()
+        except Exception as exc:
+            if len(batch) > 1:
+                # Retry one by one so a failing submission does not fail the rest of its batch
+                for submission in batch:
+                    await self._flush([submission])
+                return
+            if not batch[0].future.done():
+                batch[0].future.set_exception(exc)
+            return
+        for submission, response_id in zip(batch, response_ids):
+            if not submission.future.done():
+                submission.future.set_result(response_id)
+
+response_writer = WriteBehindQueue(
+    AsyncSessionLocal,
+    settings.WRITE_BEHIND_BATCH_SIZE,
+    settings.WRITE_BEHIND_FLUSH_MS,
+    settings.WRITE_BEHIND_QUEUE_SIZE,
+    settings.WRITE_BEHIND_OVERFLOW,
+    settings.WRITE_BEHIND_ENQUEUE_TIMEOUT,
+)
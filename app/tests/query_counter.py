@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+class QueryCounter:
+    """Collects the SQL statements executed on an engine"""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+@contextmanager
+def count_queries(engine: Engine):
+    """Count every statement sent to the database inside the block"""
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def assert_constant_query_count(
+    engine: Engine,
+    setup: Callable[[int], object],
+    call: Callable[[object], object],
+    sizes: Iterable[int] = (2, 10, 50),
+) -> int:
+    """Fail when the number of statements issued by call() grows with the fixture size
+
+    setup(size) builds a fixture of the given size (e.g. a survey with that many
+    questions) outside the counted block; call(fixture) exercises the endpoint.
+    Returns the statement count shared by every size.
+    """
+    counts = {}
+    statements = {}
+    for size in sizes:
+        fixture = setup(size)
+        with count_queries(engine) as counter:
+            call(fixture)
+        counts[size] = counter.count
+        statements[size] = counter.statements
+
+    if len(set(counts.values())) > 1:
+        largest = max(counts)
+        raise AssertionError(
+            f"Query count grows with fixture size: {counts}\n"
+            + "\n".join(statements[largest])
+        )
+    return next(iter(counts.values()))
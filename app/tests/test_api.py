@@ -1,8 +1,13 @@
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, func
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from app.main import app
-from app.database.database import Base, get_db
+from app.database.database import Base, get_db, get_async_db
+from app.models import models
+from app.services.cache import InMemoryBackend, set_shared_backend, survey_cache
+from app.tests.query_counter import assert_constant_query_count, count_queries
 import pytest
 import json
 
@@ -11,6 +16,14 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient may run each request on a fresh event loop, so async connections are not pooled
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Recreate the schema so the test database always matches the current models
+Base.metadata.drop_all(bind=engine)
+Base.metadata.create_all(bind=engine)
+
 def override_get_db():
     try:
         db = TestingSessionLocal()
@@ -18,7 +31,12 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 client = TestClient(app)
 
 def create_test_survey():
@@ -216,4 +234,1276 @@ def test_submit_response_nonexistent_survey():
         }
     )
     assert response.status_code == 404
-    assert "Survey not found" in response.json()["detail"]
\ No newline at end of file
+    assert "Survey not found" in response.json()["detail"]
+
+def submit_test_response(survey_id, name="John Doe", user_id=1):
+    """Helper function to submit a valid response to the test survey"""
+    return client.post(
+        "/responses/",
+        json={
+            "survey_id": survey_id,
+            "user_id": user_id,
+            "answers": [
+                {
+                    "question_text": "What is your name?",
+                    "question_type": "short_text",
+                    "answer": name
+                },
+                {
+                    "question_text": "Years of experience?",
+                    "question_type": "number",
+                    "answer": "5"
+                },
+                {
+                    "question_text": "Preferred programming languages?",
+                    "question_type": "multiple_choice",
+                    "answer": ["Python", "Java"]
+                }
+            ]
+        }
+    )
+
+def test_get_survey_responses_keyset_pagination():
+    survey = create_test_survey()
+    for name in ["Alice", "Bob", "Carol"]:
+        submit_test_response(survey["id"], name=name)
+    
+    first_page = client.get(f"/responses/{survey['id']}", params={"limit": 2}).json()
+    assert first_page["total_responses"] == 3
+    assert [r["answers"]["What is your name?"] for r in first_page["responses"]] == ["Alice", "Bob"]
+    assert first_page["next_cursor"] == first_page["responses"][-1]["response_id"]
+    
+    second_page = client.get(
+        f"/responses/{survey['id']}",
+        params={"limit": 2, "after": first_page["next_cursor"]}
+    ).json()
+    assert [r["answers"]["What is your name?"] for r in second_page["responses"]] == ["Carol"]
+    assert second_page["next_cursor"] is None
+
+def test_stream_survey_responses_ndjson():
+    survey = create_test_survey()
+    for name in ["Alice", "Bob"]:
+        submit_test_response(survey["id"], name=name)
+    
+    response = client.get(f"/responses/{survey['id']}", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["answers"]["What is your name?"] for row in rows] == ["Alice", "Bob"]
+
+def test_stream_survey_responses_csv():
+    survey = create_test_survey()
+    submit_test_response(survey["id"], name="Alice")
+    
+    response = client.get(f"/responses/{survey['id']}", params={"format": "csv"})
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "response_id,user_id,What is your name?,Years of experience?,Preferred programming languages?"
+    assert "Alice" in lines[1]
+    assert len(lines) == 2
+
+def test_create_question_invalidates_compiled_validator():
+    survey = create_test_survey()
+    assert submit_test_response(survey["id"]).status_code == 200
+    
+    question = client.post(
+        "/questions/",
+        json={
+            "survey_id": survey["id"],
+            "question_text": "Favourite editor?",
+            "question_type": "multiple_choice",
+            "options": '["vim", "emacs"]',
+            "required": True,
+            "order": 4
+        }
+    )
+    assert question.status_code == 200
+    assert question.json()["survey_id"] == survey["id"]
+    
+    # The cached validator for the previous form version must not be reused
+    response = submit_test_response(survey["id"])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Required question not answered: Favourite editor?"
+
+def test_question_added_from_a_stale_survey_gets_the_next_schema_version():
+    from app.schemas import schemas
+    from app.services.surveys import add_question
+    
+    survey = create_test_survey()
+    new_question = schemas.QuestionCreate(survey_id=survey["id"], question_text="Stale?", question_type="short_text")
+    with TestingSessionLocal() as first, TestingSessionLocal() as second:
+        # Both requests loaded the survey before either added its question
+        stale = first.get(models.Survey, survey["id"])
+        stale_version = stale.schema_version
+        add_question(second, second.get(models.Survey, survey["id"]), new_question)
+        second.commit()
+        
+        add_question(first, stale, new_question)
+        first.commit()
+        assert stale.schema_version == stale_version + 2
+        versions = first.query(models.SurveySchemaVersion.version).filter(
+            models.SurveySchemaVersion.survey_id == survey["id"]
+        ).order_by(models.SurveySchemaVersion.version).all()
+        assert [version for version, in versions][-2:] == [stale_version + 1, stale_version + 2]
+
+def test_create_question_nonexistent_survey():
+    response = client.post(
+        "/questions/",
+        json={
+            "survey_id": 99999,
+            "question_text": "Orphan question?",
+            "question_type": "short_text"
+        }
+    )
+    assert response.status_code == 404
+
+def test_submit_response_unknown_question():
+    survey = create_test_survey()
+    response = client.post(
+        "/responses/",
+        json={
+            "survey_id": survey["id"],
+            "user_id": 1,
+            "answers": [
+                {"question_text": "What is your name?", "question_type": "short_text", "answer": "John"},
+                {"question_text": "Years of experience?", "question_type": "number", "answer": "5"},
+                {"question_text": "Preferred programming languages?", "question_type": "multiple_choice", "answer": "Python"},
+                {"question_text": "Not on the form?", "question_type": "short_text", "answer": "x"}
+            ]
+        }
+    )
+    assert response.status_code == 400
+    assert "Question not found in survey" in response.json()["detail"]
+
+def bulk_row(name, languages=("Python",)):
+    return {
+        "user_id": 1,
+        "answers": [
+            {"question_text": "What is your name?", "question_type": "short_text", "answer": name},
+            {"question_text": "Years of experience?", "question_type": "number", "answer": "3"},
+            {"question_text": "Preferred programming languages?", "question_type": "multiple_choice", "answer": list(languages)}
+        ]
+    }
+
+def test_bulk_create_responses_json_array():
+    survey = create_test_survey()
+    response = client.post(
+        f"/surveys/{survey['id']}/responses:bulk",
+        json=[bulk_row("Alice"), bulk_row("Bob", ["Cobol"]), {"answers": []}, bulk_row("Carol")]
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["accepted"] == 2
+    assert data["rejected"] == 2
+    assert [r["status"] for r in data["results"]] == ["accepted", "rejected", "rejected", "accepted"]
+    assert "Invalid option" in data["results"][1]["error"]
+    assert data["results"][2]["error"].startswith("user_id")
+    
+    stored = client.get(f"/responses/{survey['id']}").json()
+    assert [r["response_id"] for r in stored["responses"]] == [
+        data["results"][0]["response_id"], data["results"][3]["response_id"]
+    ]
+
+def test_bulk_create_responses_ndjson():
+    survey = create_test_survey()
+    body = "\n".join([json.dumps(bulk_row("Alice")), "not json", json.dumps(bulk_row("Bob"))]) + "\n"
+    response = client.post(
+        f"/surveys/{survey['id']}/responses:bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["status"] for r in data["results"]] == ["accepted", "rejected", "accepted"]
+    assert data["results"][1]["error"] == "Invalid JSON"
+    assert client.get(f"/responses/{survey['id']}").json()["total_responses"] == 2
+
+def test_bulk_create_responses_nonexistent_survey():
+    response = client.post("/surveys/99999/responses:bulk", json=[bulk_row("Alice")])
+    assert response.status_code == 404
+
+def test_submit_response_writes_normalized_answers():
+    survey = create_test_survey()
+    response_id = submit_test_response(survey["id"], name="Alice").json()["response"]["id"]
+    
+    db = TestingSessionLocal()
+    try:
+        answers = db.query(models.Answer).filter(
+            models.Answer.response_id == response_id
+        ).order_by(models.Answer.id).all()
+        options = {
+            option.option_text: option.id
+            for option in db.query(models.QuestionOption).join(models.Question).filter(
+                models.Question.survey_id == survey["id"]
+            )
+        }
+    finally:
+        db.close()
+    
+    assert [a.value_text for a in answers] == ["Alice", "5", "Python", "Java"]
+    assert answers[1].value_number == 5.0
+    assert [a.option_id for a in answers[2:]] == [options["Python"], options["Java"]]
+    assert all(a.survey_id == survey["id"] for a in answers)
+
+def create_stats_survey():
+    """Helper function to create a survey covering every aggregated question type"""
+    return client.post(
+        "/surveys/",
+        json={
+            "title": "Stats Survey",
+            "questions": [
+                {"question_text": "Age?", "question_type": "number", "order": 1},
+                {"question_text": "Language?", "question_type": "multiple_choice",
+                 "options": '["Python", "Java", "Go"]', "order": 2},
+                {"question_text": "Start date?", "question_type": "date", "order": 3},
+                {"question_text": "Comments?", "question_type": "long_text", "order": 4}
+            ]
+        }
+    ).json()
+
+def submit_stats_response(survey_id, age, language, start_date):
+    return client.post(
+        "/responses/",
+        json={
+            "survey_id": survey_id,
+            "user_id": 1,
+            "answers": [
+                {"question_text": "Age?", "question_type": "number", "answer": age},
+                {"question_text": "Language?", "question_type": "multiple_choice", "answer": language},
+                {"question_text": "Start date?", "question_type": "date", "answer": start_date}
+            ]
+        }
+    )
+
+def test_get_survey_summary():
+    survey = create_stats_survey()
+    submit_stats_response(survey["id"], 20, "Python", "2024-01-05")
+    submit_stats_response(survey["id"], "30", "Python", "2024-01-20")
+    submit_stats_response(survey["id"], 40, "Java", "2024-02-01")
+    submit_stats_response(survey["id"], 50, ["Python", "Go"], "2024-03-15")
+    
+    response = client.get(f"/surveys/{survey['id']}/summary")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_responses"] == 4
+    age, language, start_date, comments = data["questions"]
+    
+    assert age["number"]["count"] == 4
+    assert (age["number"]["min"], age["number"]["max"], age["number"]["mean"]) == (20, 50, 35)
+    assert age["number"]["percentiles"]["p50"] == 30
+    assert age["number"]["percentiles"]["p90"] == 50
+    
+    assert language["answered"] == 4
+    assert language["options"] == [
+        {"option": "Python", "count": 3, "percentage": 75.0},
+        {"option": "Java", "count": 1, "percentage": 25.0},
+        {"option": "Go", "count": 1, "percentage": 25.0}
+    ]
+    
+    assert start_date["dates"] == [
+        {"period": "2024-01", "count": 2},
+        {"period": "2024-02", "count": 1},
+        {"period": "2024-03", "count": 1}
+    ]
+    assert comments["answered"] == 0
+
+def test_summary_percentiles_come_from_maintained_number_buckets():
+    survey = create_stats_survey()
+    ids = [
+        submit_stats_response(survey["id"], age, "Python", "2024-01-05").json()["response"]["id"]
+        for age in (10, 20, 30, 40, 1234.56)
+    ]
+    
+    with count_queries(async_engine.sync_engine) as counter:
+        age = client.get(f"/surveys/{survey['id']}/summary").json()["questions"][0]["number"]
+    # Only the MIN and MAX seeks touch the answers; no query per percentile
+    assert sum("ORDER BY answers.value_number" in statement for statement in counter.statements) == 2
+    assert (age["min"], age["max"]) == (10, 1234.56)
+    # 1234.56 is kept to three significant digits
+    assert age["percentiles"] == {"p25": 20, "p50": 30, "p75": 40, "p90": 1230, "p95": 1230, "p99": 1230}
+    
+    assert client.delete(f"/responses/{ids[-1]}").status_code == 204
+    age = client.get(f"/surveys/{survey['id']}/summary").json()["questions"][0]["number"]
+    assert (age["percentiles"]["p50"], age["percentiles"]["p99"]) == (20, 40)
+    filtered = client.get(f"/surveys/{survey['id']}/summary", params={"filter": '"Age?" >= 20'}).json()
+    assert filtered["questions"][0]["number"]["percentiles"]["p50"] == 30
+
+def test_get_summary_nonexistent_survey():
+    response = client.get("/surveys/99999/summary")
+    assert response.status_code == 404
+
+def test_rebuild_survey_stats_matches_incremental_counters():
+    from app.services.stats import rebuild_survey_stats
+    
+    survey = create_stats_survey()
+    submit_stats_response(survey["id"], 20, "Python", "2024-01-05")
+    submit_stats_response(survey["id"], 40, ["Java", "Go"], "2024-02-01")
+    client.post(
+        f"/surveys/{survey['id']}/responses:bulk",
+        json=[{"user_id": 2, "answers": [
+            {"question_text": "Age?", "question_type": "number", "answer": 60},
+            {"question_text": "Language?", "question_type": "multiple_choice", "answer": "Python"}
+        ]}]
+    )
+    incremental = client.get(f"/surveys/{survey['id']}/summary").json()
+    assert incremental["total_responses"] == 3
+    assert incremental["questions"][0]["number"]["mean"] == 40
+    assert incremental["questions"][1]["options"][0] == {"option": "Python", "count": 2, "percentage": 66.67}
+    
+    db = TestingSessionLocal()
+    try:
+        rebuild_survey_stats(db, survey["id"])
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(f"/surveys/{survey['id']}/summary").json() == incremental
+
+def create_survey_with_questions(question_count):
+    return client.post(
+        "/surveys/",
+        json={
+            "title": f"Survey with {question_count} questions",
+            "questions": [
+                {
+                    "question_text": f"Question {index}?",
+                    "question_type": "multiple_choice",
+                    "options": '["Yes", "No", "Maybe"]',
+                    "order": index
+                } for index in range(question_count)
+            ]
+        }
+    ).json()
+
+def test_get_survey_query_count_is_constant():
+    def fetch(survey):
+        response = client.get(f"/surveys/{survey['id']}")
+        assert response.status_code == 200
+        assert all(len(q["question_options"]) == 3 for q in response.json()["questions"])
+    
+    assert_constant_query_count(async_engine.sync_engine, create_survey_with_questions, fetch)
+
+def test_create_survey_query_count_is_constant():
+    assert_constant_query_count(async_engine.sync_engine, lambda size: size, create_survey_with_questions)
+
+def test_get_survey_etag_and_not_modified():
+    survey = create_test_survey()
+    first = client.get(f"/surveys/{survey['id']}")
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    
+    # Cached reads skip the database entirely
+    with count_queries(async_engine.sync_engine) as counter:
+        cached = client.get(f"/surveys/{survey['id']}")
+    assert counter.count == 0
+    assert cached.content == first.content
+    
+    not_modified = client.get(f"/surveys/{survey['id']}", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    assert not_modified.content == b""
+
+def test_create_question_invalidates_cached_survey():
+    survey = create_test_survey()
+    etag = client.get(f"/surveys/{survey['id']}").headers["etag"]
+    client.post(
+        "/questions/",
+        json={"survey_id": survey["id"], "question_text": "Anything else?", "question_type": "long_text", "order": 4}
+    )
+    
+    response = client.get(f"/surveys/{survey['id']}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["questions"]) == 4
+
+def test_get_survey_uses_shared_cache_backend():
+    backend = InMemoryBackend()
+    set_shared_backend(backend)
+    try:
+        survey = create_test_survey()
+        body = client.get(f"/surveys/{survey['id']}").content
+        assert backend.get(f"survey:{survey['id']}").endswith(b":" + body)
+        
+        # Another worker process starts with an empty local cache
+        survey_cache.local.clear()
+        with count_queries(async_engine.sync_engine) as counter:
+            response = client.get(f"/surveys/{survey['id']}")
+        assert counter.count == 0
+        assert response.content == body
+    finally:
+        set_shared_backend(None)
+
+def test_invalidation_reaches_every_worker_sharing_a_backend():
+    from app.services.cache import SurveyDefinitionCache
+    
+    backend = InMemoryBackend()
+    worker, other_worker = SurveyDefinitionCache(8, 300, backend), SurveyDefinitionCache(8, 300, backend)
+    generation = worker.generation(1)
+    worker.set(1, b"v1", generation)
+    assert other_worker.get(1).body == b"v1"
+    
+    # create_question ran in the first worker; the second must not keep serving its local copy
+    worker.invalidate(1)
+    assert other_worker.get(1) is None
+    assert worker.get(1) is None
+    
+    # A body built from data read before the invalidation is never served
+    other_worker.set(1, b"stale", generation)
+    assert worker.get(1) is None and other_worker.get(1) is None
+    
+    other_worker.set(1, b"v2", other_worker.generation(1))
+    assert worker.get(1).body == b"v2"
+
+def test_get_survey_honours_weak_if_none_match():
+    survey = create_test_survey()
+    etag = client.get(f"/surveys/{survey['id']}").headers["etag"]
+    for validator in (f"W/{etag}", f'"other", W/{etag}'):
+        assert client.get(f"/surveys/{survey['id']}", headers={"If-None-Match": validator}).status_code == 304
+    assert client.get(f"/surveys/{survey['id']}", headers={"If-None-Match": 'W/"other"'}).status_code == 200
+
+def test_patch_response_updates_in_place_and_keeps_history():
+    survey = create_stats_survey()
+    created = submit_stats_response(survey["id"], 20, "Python", "2024-01-05")
+    assert created.headers["etag"] == '"1"'
+    response_id = created.json()["response"]["id"]
+    
+    patched = client.patch(
+        f"/responses/{response_id}",
+        json={"answers": [{"question_text": "Language?", "question_type": "multiple_choice", "answer": "Go"}]},
+        headers={"If-Match": '"1"'}
+    )
+    assert patched.status_code == 200
+    assert patched.headers["etag"] == '"2"'
+    data = patched.json()["response"]
+    assert data["version"] == 2
+    assert data["response_data"]["Language?"]["answer"] == "Go"
+    assert data["response_data"]["Age?"]["answer"] == 20
+    
+    # Still a single row, and counters moved from the old answer to the new one
+    assert client.get(f"/responses/{survey['id']}").json()["total_responses"] == 1
+    options = client.get(f"/surveys/{survey['id']}/summary").json()["questions"][1]["options"]
+    assert {o["option"]: o["count"] for o in options} == {"Python": 0, "Java": 0, "Go": 1}
+    
+    history = client.get(f"/responses/{response_id}/versions").json()
+    assert history["current_version"] == 2
+    assert [v["version"] for v in history["versions"]] == [1]
+    assert history["versions"][0]["response_data"]["Language?"]["answer"] == "Python"
+
+def test_edit_response_with_stale_version_is_rejected():
+    survey = create_stats_survey()
+    response_id = submit_stats_response(survey["id"], 20, "Python", "2024-01-05").json()["response"]["id"]
+    change = {"answers": [{"question_text": "Age?", "question_type": "number", "answer": 21}]}
+    
+    assert client.patch(f"/responses/{response_id}", json=change, headers={"If-Match": '"1"'}).status_code == 200
+    stale = client.patch(f"/responses/{response_id}", json=change, headers={"If-Match": '"1"'})
+    assert stale.status_code == 412
+
+def test_put_response_replaces_all_answers():
+    survey = create_test_survey()
+    response_id = submit_test_response(survey["id"]).json()["response"]["id"]
+    
+    missing_required = client.put(
+        f"/responses/{response_id}",
+        json={"answers": [{"question_text": "What is your name?", "question_type": "short_text", "answer": "Jane"}]}
+    )
+    assert missing_required.status_code == 400
+    assert "Required question not answered" in missing_required.json()["detail"]
+    
+    replaced = client.put(f"/responses/{response_id}", json={"answers": bulk_row("Jane")["answers"]})
+    assert replaced.status_code == 200
+    assert replaced.json()["response"]["response_data"]["What is your name?"]["answer"] == "Jane"
+
+def test_edit_nonexistent_response():
+    response = client.patch("/responses/99999", json={"answers": []})
+    assert response.status_code == 404
+
+def test_list_user_responses_for_survey():
+    survey = create_test_survey()
+    other_survey = create_test_survey()
+    mine = [submit_test_response(survey["id"], name=f"Mine {i}", user_id=42).json()["response"]["id"] for i in range(3)]
+    submit_test_response(survey["id"], user_id=7)
+    elsewhere = submit_test_response(other_survey["id"], user_id=42).json()["response"]["id"]
+    
+    first = client.get(f"/surveys/{survey['id']}/users/42/responses", params={"limit": 2}).json()
+    assert [r["id"] for r in first["responses"]] == mine[:2]
+    second = client.get(
+        f"/surveys/{survey['id']}/users/42/responses", params={"limit": 2, "after": first["next_cursor"]}
+    ).json()
+    assert [r["id"] for r in second["responses"]] == mine[2:]
+    assert second["next_cursor"] is None
+    
+    everywhere = client.get("/users/42/responses").json()
+    assert [r["id"] for r in everywhere["responses"]][-4:] == mine + [elsewhere]
+
+def test_list_user_responses_nonexistent_survey():
+    response = client.get("/surveys/99999/users/1/responses")
+    assert response.status_code == 404
+
+def test_export_parquet_has_typed_columns():
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    import datetime
+    import io
+    
+    survey = create_stats_survey()
+    submit_stats_response(survey["id"], 20, "Python", "2024-01-05")
+    submit_stats_response(survey["id"], "30", ["Python", "Go"], "2024-02-01")
+    
+    response = client.get(f"/surveys/{survey['id']}/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.schema.field("Age?").type == pa.float64()
+    assert table.schema.field("Start date?").type == pa.date32()
+    assert table.schema.field("Language?").type == pa.list_(pa.string())
+    assert table.column("Age?").to_pylist() == [20.0, 30.0]
+    assert table.column("Language?").to_pylist() == [["Python"], ["Python", "Go"]]
+    assert table.column("Start date?").to_pylist() == [datetime.date(2024, 1, 5), datetime.date(2024, 2, 1)]
+    assert table.column("Comments?").to_pylist() == [None, None]
+    
+    arrow = client.get(f"/surveys/{survey['id']}/export", params={"format": "arrow"})
+    assert pa.ipc.open_stream(arrow.content).read_all().num_rows == 2
+
+def test_export_csv_and_nonexistent_survey():
+    survey = create_stats_survey()
+    submit_stats_response(survey["id"], 20, ["Python", "Go"], "2024-01-05")
+    
+    response = client.get(f"/surveys/{survey['id']}/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    lines = response.text.splitlines()
+    assert lines[0] == "response_id,user_id,Age?,Language?,Start date?,Comments?"
+    assert lines[1].endswith(',1,20.0,"[""Python"", ""Go""]",2024-01-05,')
+    
+    assert client.get("/surveys/99999/export").status_code == 404
+
+def test_metrics_middleware_reports_server_timing_and_histograms():
+    from app.services import metrics
+    
+    registry = metrics.MetricsRegistry()
+    metrics.instrument_engine(async_engine.sync_engine)
+    measured = TestClient(metrics.MetricsMiddleware(app, registry))
+    survey = create_test_survey()
+    survey_cache.invalidate(survey["id"])
+    
+    response = measured.get(f"/surveys/{survey['id']}")
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert "db;dur=" in timing and "serialize;dur=" in timing and "total;dur=" in timing
+    assert 'desc="0 queries"' not in timing
+    
+    output = registry.render()
+    labels = 'method="GET",route="/surveys/{survey_id}",status="200"'
+    assert f"http_request_duration_seconds_count{{{labels}}} 1" in output
+    assert f"http_request_sql_statements_count{{{labels}}} 1" in output
+    assert f"http_response_size_bytes_sum{{{labels}}} {len(response.content)}" in output
+    
+    # Unsampled requests pass through untouched
+    unsampled = TestClient(metrics.MetricsMiddleware(app, registry, sample_rate=0.0))
+    assert "server-timing" not in unsampled.get(f"/surveys/{survey['id']}").headers
+    
+    # METRICS_ENABLED is off by default: routes are not wrapped and /metrics is not served
+    assert not any(isinstance(route, metrics.TimedRoute) for route in app.routes)
+    assert client.get("/metrics").status_code == 404
+
+def test_failed_statement_does_not_leak_its_start_time_into_the_next():
+    import time
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from app.services import metrics
+    
+    metrics.instrument_engine(engine)
+    timings = metrics.RequestTimings()
+    token = metrics._current.set(timings)
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            assert not conn.info.get("query_started")
+            time.sleep(0.2)
+            conn.execute(text("SELECT 1"))
+    finally:
+        metrics._current.reset(token)
+    assert timings.sql_count == 1
+    assert timings.sql_time < 0.2
+
+def test_metrics_time_routes_included_from_the_api_router(monkeypatch):
+    import importlib
+    from app.config import settings
+    from app.routes import api
+    from app.services import metrics
+    
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    try:
+        timed = importlib.reload(api)
+        assert all(isinstance(route, metrics.TimedRoute) for route in timed.router.routes)
+    finally:
+        monkeypatch.undo()
+        importlib.reload(api)
+    assert not any(isinstance(route, metrics.TimedRoute) for route in api.router.routes)
+
+@pytest.fixture
+def fast_password_hasher():
+    from app.services.passwords import password_hasher
+    
+    rounds = password_hasher.rounds
+    password_hasher.rounds = 4
+    yield password_hasher
+    password_hasher.rounds = rounds
+
+def test_sign_up_login_and_rehash_on_login(fast_password_hasher):
+    user = {"email": "signup@example.com", "username": "signup", "full_name": "Sign Up", "password": "s3cret"}
+    response = client.post("/users/", json=user)
+    assert response.status_code == 200
+    assert client.post("/users/", json=user).status_code == 400
+    
+    wrong = client.post("/users/login", json={"email": user["email"], "password": "nope"})
+    assert wrong.status_code == 401
+    
+    # Raising the cost upgrades the stored hash on the next successful login
+    fast_password_hasher.rounds = 5
+    login = client.post("/users/login", json={"email": user["email"], "password": "s3cret"})
+    assert login.status_code == 200
+    assert login.json()["user"]["id"] == response.json()["user"]["id"]
+    with TestingSessionLocal() as db:
+        stored = db.query(models.User).filter(models.User.email == user["email"]).one().password
+    assert stored.startswith("$2b$05$")
+
+def test_app_shutdown_stops_the_password_pool(fast_password_hasher):
+    user = {"email": "lifespan@example.com", "username": "lifespan", "full_name": "Life Span", "password": "s3cret"}
+    with TestClient(app) as lifespan_client:
+        assert lifespan_client.post("/users/", json=user).status_code == 200
+        assert fast_password_hasher._executor is not None
+    assert fast_password_hasher._executor is None
+
+def test_password_hasher_rejects_work_beyond_queue_limit():
+    import asyncio
+    from app.services.passwords import HasherSaturated, PasswordHasher
+    
+    hasher = PasswordHasher(rounds=4, max_workers=1, queue_limit=0)
+    
+    async def saturate():
+        running = asyncio.ensure_future(hasher.hash("first"))
+        await asyncio.sleep(0)
+        with pytest.raises(HasherSaturated):
+            await hasher.hash("second")
+        return await running
+    
+    try:
+        assert asyncio.run(saturate()).startswith("$2b$04$")
+    finally:
+        hasher.shutdown()
+
+def test_password_hasher_holds_a_cancelled_callers_slot_until_the_worker_finishes():
+    import asyncio
+    import time
+    from app.services.passwords import HasherSaturated, PasswordHasher
+    
+    hasher = PasswordHasher(rounds=12, max_workers=1, queue_limit=0)
+    
+    async def cancel_while_hashing():
+        abandoned = asyncio.ensure_future(hasher.hash("abandoned"))
+        await asyncio.sleep(0.1)
+        abandoned.cancel()
+        await asyncio.sleep(0)
+        # The worker is still hashing, so the pool has no room yet
+        with pytest.raises(HasherSaturated):
+            await hasher.hash("second")
+        deadline = time.monotonic() + 30
+        while hasher._pending and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        hasher.rounds = 4
+        return await hasher.hash("second")
+    
+    try:
+        assert asyncio.run(cancel_while_hashing()).startswith("$2b$04$")
+    finally:
+        hasher.shutdown()
+
+def test_fast_json_responses_match_validated_output(monkeypatch):
+    from app.config import settings
+    
+    survey = create_test_survey()
+    for i in range(3):
+        submit_test_response(survey["id"], name=f"Fast {i}")
+    standard = client.get(f"/responses/{survey['id']}", params={"limit": 2})
+    
+    monkeypatch.setattr(settings, "FAST_JSON_RESPONSES", True)
+    fast = client.get(f"/responses/{survey['id']}", params={"limit": 2})
+    assert fast.status_code == 200
+    assert fast.json() == standard.json()
+    assert fast.json()["next_cursor"] is not None
+
+def idempotent_submission(survey_id, name="Retry"):
+    return {
+        "survey_id": survey_id,
+        "user_id": 1,
+        "answers": [
+            {"question_text": "What is your name?", "question_type": "short_text", "answer": name},
+            {"question_text": "Years of experience?", "question_type": "number", "answer": "5"},
+            {"question_text": "Preferred programming languages?", "question_type": "multiple_choice",
+             "answer": ["Python"]}
+        ]
+    }
+
+def count_survey_responses(survey_id):
+    with TestingSessionLocal() as db:
+        return db.query(models.Response).filter(models.Response.survey_id == survey_id).count()
+
+def test_idempotency_key_replays_stored_result():
+    survey = create_test_survey()
+    headers = {"Idempotency-Key": f"retry-{survey['id']}"}
+    first = client.post("/responses/", json=idempotent_submission(survey["id"]), headers=headers)
+    assert first.status_code == 200
+    
+    replay = client.post("/responses/", json=idempotent_submission(survey["id"]), headers=headers)
+    assert replay.status_code == 200
+    assert replay.json() == first.json()
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert count_survey_responses(survey["id"]) == 1
+    
+    reused = client.post("/responses/", json=idempotent_submission(survey["id"], name="Other"), headers=headers)
+    assert reused.status_code == 422
+
+def test_concurrent_duplicates_collapse_to_one_insert():
+    import asyncio
+    import httpx
+    
+    survey = create_test_survey()
+    headers = {"Idempotency-Key": f"concurrent-{survey['id']}"}
+    
+    async def submit_concurrently():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(
+                async_client.post("/responses/", json=idempotent_submission(survey["id"]), headers=headers)
+                for _ in range(5)
+            ))
+    
+    responses = asyncio.run(submit_concurrently())
+    assert [r.status_code for r in responses] == [200] * 5
+    assert len({r.json()["response"]["id"] for r in responses}) == 1
+    assert count_survey_responses(survey["id"]) == 1
+
+def test_responses_store_answers_by_question_id_against_a_schema_snapshot():
+    survey = create_test_survey()
+    response_id = submit_test_response(survey["id"], name="Compact").json()["response"]["id"]
+    question_ids = {q["question_text"]: q["id"] for q in survey["questions"]}
+    
+    with TestingSessionLocal() as db:
+        stored = db.get(models.Response, response_id)
+        snapshot = db.get(models.SurveySchemaVersion, stored.schema_version_id)
+        assert stored.response_data[str(question_ids["What is your name?"])] == "Compact"
+        assert snapshot.version == 1
+        assert [q["question_text"] for q in snapshot.questions] == list(question_ids)
+    
+    # Adding a question snapshots the new form; older responses keep rendering with theirs
+    client.post("/questions/", json={
+        "survey_id": survey["id"], "question_text": "Location?", "question_type": "short_text", "order": 4
+    })
+    newer = submit_test_response(survey["id"], name="Newer").json()["response"]
+    with TestingSessionLocal() as db:
+        assert db.get(models.Response, newer["id"]).schema_version_id != stored.schema_version_id
+    
+    rows = client.get(f"/responses/{survey['id']}").json()["responses"]
+    assert [r["answers"]["What is your name?"] for r in rows] == ["Compact", "Newer"]
+
+def test_legacy_text_keyed_responses_are_still_readable():
+    survey = create_test_survey()
+    with TestingSessionLocal() as db:
+        legacy = models.Response(survey_id=survey["id"], user_id=77, response_data={
+            "What is your name?": {"question_id": survey["questions"][0]["id"], "question_type": "short_text",
+                                   "answer": "Legacy", "options": None}
+        })
+        db.add(legacy)
+        db.commit()
+        legacy_id = legacy.id
+    
+    assert client.get(f"/responses/{survey['id']}").json()["responses"][0]["answers"] == {"What is your name?": "Legacy"}
+    assert json.loads(client.get(f"/responses/{survey['id']}", params={"format": "ndjson"}).text)["answers"] == {
+        "What is your name?": "Legacy"
+    }
+    listed = client.get("/users/77/responses").json()["responses"]
+    assert listed[0]["id"] == legacy_id
+    assert listed[0]["response_data"]["What is your name?"]["answer"] == "Legacy"
+
+def test_search_ranks_text_answers_and_pages_with_a_cursor():
+    survey = create_test_survey()
+    other_survey = create_test_survey()
+    best = submit_test_response(survey["id"], name="refund refund please").json()["response"]["id"]
+    stemmed = submit_test_response(survey["id"], name="Asked about refunds twice").json()["response"]["id"]
+    submit_test_response(survey["id"], name="Happy customer")
+    submit_test_response(other_survey["id"], name="refund elsewhere")
+    
+    first = client.get(f"/surveys/{survey['id']}/responses/search", params={"q": "refund", "limit": 1}).json()
+    assert [hit["response_id"] for hit in first["results"]] == [best]
+    assert first["results"][0]["answers"]["What is your name?"] == "refund refund please"
+    second = client.get(
+        f"/surveys/{survey['id']}/responses/search",
+        params={"q": "refund", "limit": 1, "after": first["next_cursor"]}
+    ).json()
+    assert [hit["response_id"] for hit in second["results"]] == [stemmed]
+    assert second["next_cursor"] is None
+    
+    # Edits re-index the response
+    client.patch(f"/responses/{stemmed}", json={"answers": [
+        {"question_text": "What is your name?", "question_type": "short_text", "answer": "All sorted"}
+    ]})
+    hits = client.get(f"/surveys/{survey['id']}/responses/search", params={"q": "refund"}).json()["results"]
+    assert [hit["response_id"] for hit in hits] == [best]
+    
+    bad_cursor = client.get(f"/surveys/{survey['id']}/responses/search", params={"q": "refund", "after": "nope"})
+    assert bad_cursor.status_code == 400
+
+def test_write_behind_submissions_share_one_group_commit(monkeypatch):
+    import asyncio
+    import httpx
+    from app.config import settings
+    from app.services.write_behind import response_writer
+    
+    survey = create_test_survey()
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(response_writer, "session_factory", TestingAsyncSessionLocal)
+    monkeypatch.setattr(response_writer, "flush_interval", 1.0)
+    monkeypatch.setattr(response_writer, "batch_size", 5)
+    
+    commits = []
+    original_flush = response_writer._flush
+    async def record_flush(batch):
+        commits.append(len(batch))
+        await original_flush(batch)
+    monkeypatch.setattr(response_writer, "_flush", record_flush)
+    
+    async def submit_concurrently():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            responses = await asyncio.gather(*(
+                async_client.post("/responses/", json=idempotent_submission(survey["id"], name=f"Queued {i}"))
+                for i in range(5)
+            ))
+        await response_writer.stop()
+        return responses
+    
+    responses = asyncio.run(submit_concurrently())
+    assert [r.status_code for r in responses] == [200] * 5
+    assert commits == [5]
+    assert [r.json()["response"]["response_data"]["What is your name?"]["answer"] for r in responses] == [
+        f"Queued {i}" for i in range(5)
+    ]
+    assert len({r.json()["response"]["id"] for r in responses}) == 5
+    assert count_survey_responses(survey["id"]) == 5
+
+def test_write_behind_commits_a_snapshot_created_for_the_first_submission(monkeypatch):
+    import asyncio
+    import httpx
+    from app.config import settings
+    from app.services.validation import invalidate_survey_validator
+    from app.services.write_behind import response_writer
+    
+    survey = create_test_survey()
+    with TestingSessionLocal() as db:
+        # A survey from before schema snapshots existed
+        db.query(models.SurveySchemaVersion).filter(models.SurveySchemaVersion.survey_id == survey["id"]).delete()
+        db.commit()
+    invalidate_survey_validator(survey["id"])
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(response_writer, "session_factory", TestingAsyncSessionLocal)
+    monkeypatch.setattr(response_writer, "flush_interval", 0.2)
+    
+    async def submit_concurrently():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            responses = await asyncio.gather(*(
+                async_client.post("/responses/", json=idempotent_submission(survey["id"], name=f"First {i}"))
+                for i in range(3)
+            ))
+        await response_writer.stop()
+        return responses
+    
+    responses = asyncio.run(submit_concurrently())
+    assert [r.status_code for r in responses] == [200] * 3
+    with TestingSessionLocal() as db:
+        snapshots = db.query(models.SurveySchemaVersion).filter(
+            models.SurveySchemaVersion.survey_id == survey["id"]
+        ).all()
+        assert len(snapshots) == 1
+        stored = db.query(models.Response.schema_version_id).filter(models.Response.survey_id == survey["id"]).all()
+        assert [row.schema_version_id for row in stored] == [snapshots[0].id] * 3
+
+def test_validator_reads_back_a_snapshot_a_concurrent_request_created(monkeypatch):
+    from app.services import validation
+    
+    survey = create_test_survey()
+    validation.invalidate_survey_validator(survey["id"])
+    # This request looked before the other one committed the snapshot
+    real_find_snapshot = validation.find_snapshot
+    lookups = []
+    def find_snapshot_late(db, survey_id, version):
+        lookups.append(version)
+        return None if len(lookups) == 1 else real_find_snapshot(db, survey_id, version)
+    monkeypatch.setattr(validation, "find_snapshot", find_snapshot_late)
+    
+    with TestingSessionLocal() as db:
+        db_survey = db.get(models.Survey, survey["id"])
+        validator = validation.get_survey_validator(db, db_survey)
+        assert validator.snapshot is not None
+        db.commit()
+        assert db.query(models.SurveySchemaVersion).filter(
+            models.SurveySchemaVersion.survey_id == survey["id"]
+        ).count() == 1
+
+def test_write_behind_rejects_when_the_queue_is_full():
+    import asyncio
+    from app.services.validation import get_survey_validator
+    from app.services.write_behind import WriteBehindQueue, WriteBehindSaturated
+    
+    survey = create_test_survey()
+    with TestingSessionLocal() as db:
+        validator = get_survey_validator(db, db.get(models.Survey, survey["id"]))
+    writer = WriteBehindQueue(TestingAsyncSessionLocal, 10, 50, max_queue=1, overflow="reject")
+    
+    async def overfill():
+        first = asyncio.ensure_future(writer.submit(validator, 1, {}))
+        await asyncio.sleep(0)  # The writer takes the first submission and waits for more
+        second = asyncio.ensure_future(writer.submit(validator, 1, {}))
+        await asyncio.sleep(0)
+        with pytest.raises(WriteBehindSaturated):
+            await writer.submit(validator, 1, {})
+        ids = await asyncio.gather(first, second)
+        await writer.stop()
+        return ids
+    
+    assert len(set(asyncio.run(overfill()))) == 2
+    assert count_survey_responses(survey["id"]) == 2
+
+def test_filter_responses_and_summary_by_answers():
+    survey = create_stats_survey()
+    submit_stats_response(survey["id"], 20, "Python", "2024-01-05")
+    older_python = submit_stats_response(survey["id"], 40, "Python", "2024-02-10").json()["response"]["id"]
+    submit_stats_response(survey["id"], 50, "Go", "2024-02-11")
+    expression = '"Age?" > 25 AND "Language?" = "Python"'
+    
+    page = client.get(f"/responses/{survey['id']}", params={"filter": expression}).json()
+    assert page["total_responses"] == 1
+    assert [row["response_id"] for row in page["responses"]] == [older_python]
+    ndjson = client.get(f"/responses/{survey['id']}", params={"filter": expression, "format": "ndjson"})
+    assert [json.loads(line)["response_id"] for line in ndjson.text.splitlines()] == [older_python]
+    
+    either = client.get(f"/responses/{survey['id']}", params={
+        "filter": '"Start date?" >= "2024-02-01" and not (q%d in ("Go", "Java"))' % survey["questions"][1]["id"]
+    }).json()
+    assert [row["response_id"] for row in either["responses"]] == [older_python]
+    
+    # The filtered summary aggregates only matching responses instead of the counters
+    summary = client.get(f"/surveys/{survey['id']}/summary", params={"filter": '"Age?" >= 40'}).json()
+    assert summary["total_responses"] == 2
+    by_text = {q["question_text"]: q for q in summary["questions"]}
+    assert by_text["Age?"]["number"]["mean"] == 45
+    assert by_text["Age?"]["number"]["min"] == 40
+    assert {o["option"]: o["count"] for o in by_text["Language?"]["options"]} == {"Python": 1, "Java": 0, "Go": 1}
+    assert by_text["Start date?"]["dates"] == [{"period": "2024-02", "count": 2}]
+    
+    for invalid in ('"Age?" contains 4', '"Language?" = "Rust"', '"Missing?" = 1', '"Age?" >', '"Age?" = "x"'):
+        response = client.get(f"/responses/{survey['id']}", params={"filter": invalid})
+        assert response.status_code == 400, invalid
+
+def test_crosstab_counts_option_pairs():
+    survey = client.post("/surveys/", json={"title": "Crosstab", "questions": [
+        {"question_text": "Language?", "question_type": "multiple_choice", "options": '["Python", "Go"]', "order": 1},
+        {"question_text": "Tools?", "question_type": "checkbox", "options": '["git", "vim"]', "order": 2},
+        {"question_text": "Years?", "question_type": "number", "order": 3}
+    ]}).json()
+    language, tools, years = (q["id"] for q in survey["questions"])
+    for answer, selected, experience in (("Python", ["git", "vim"], 1), ("Python", ["git"], 8), ("Go", ["vim"], 9)):
+        client.post("/responses/", json={"survey_id": survey["id"], "user_id": 1, "answers": [
+            {"question_text": "Language?", "question_type": "multiple_choice", "answer": answer},
+            {"question_text": "Tools?", "question_type": "checkbox", "answer": selected},
+            {"question_text": "Years?", "question_type": "number", "answer": experience}
+        ]})
+    
+    table = client.get(f"/surveys/{survey['id']}/crosstab", params={"row": language, "column": tools}).json()
+    assert table["rows"] == ["Python", "Go"]
+    assert table["columns"] == ["git", "vim"]
+    assert table["counts"] == [[2, 1], [0, 1]]
+    assert table["responses"] == 3
+    
+    filtered = client.get(f"/surveys/{survey['id']}/crosstab", params={
+        "row": language, "column": tools, "filter": '"Years?" > 5'
+    }).json()
+    assert filtered["counts"] == [[1, 0], [0, 1]]
+    assert client.get(f"/surveys/{survey['id']}/crosstab", params={"row": language, "column": years}).status_code == 400
+
+def test_change_feed_lists_inserts_edits_and_deletes_in_order():
+    survey = create_stats_survey()
+    with TestingSessionLocal() as db:
+        start = db.query(func.max(models.ResponseChange.id)).scalar() or 0
+    
+    kept = submit_stats_response(survey["id"], 30, "Python", "2024-01-05").json()["response"]["id"]
+    removed = submit_stats_response(survey["id"], 40, "Go", "2024-02-10").json()["response"]["id"]
+    client.patch(f"/responses/{kept}", json={"answers": [{"question_text": "Age?", "question_type": "number", "answer": 31}]})
+    
+    assert client.delete(f"/responses/{removed}", headers={"If-Match": '"7"'}).status_code == 412
+    assert client.delete(f"/responses/{removed}").status_code == 204
+    assert client.delete(f"/responses/{removed}").status_code == 404
+    
+    first = client.get("/changes", params={"after": start, "limit": 3, "survey_id": survey["id"]}).json()
+    assert [(c["operation"], c["response_id"], c["version"]) for c in first["changes"]] == [
+        ("insert", kept, 1), ("insert", removed, 1), ("update", kept, 2)
+    ]
+    assert first["has_more"]
+    assert first["changes"][0]["response"]["response_data"]["Age?"]["answer"] == 31
+    
+    rest = client.get("/changes", params={"after": first["next_cursor"], "survey_id": survey["id"]}).json()
+    assert [(c["operation"], c["response_id"], c["response"]) for c in rest["changes"]] == [("delete", removed, None)]
+    assert not rest["has_more"]
+    idle = client.get("/changes", params={"after": rest["next_cursor"], "survey_id": survey["id"]}).json()
+    assert idle == {"changes": [], "next_cursor": rest["next_cursor"], "has_more": False}
+    
+    # The delete also took the response out of the counters and the answers table
+    summary = client.get(f"/surveys/{survey['id']}/summary").json()
+    assert summary["total_responses"] == 1
+    with TestingSessionLocal() as db:
+        assert db.query(models.Answer).filter(models.Answer.response_id == removed).count() == 0
+        stored = db.get(models.Response, kept)
+        assert stored.created_at is not None and stored.updated_at >= stored.created_at
+
+def test_change_feed_pages_by_commit_ordered_seq():
+    from app.services.changes import INSERT, record_changes
+    
+    survey = create_test_survey()
+    start = client.get("/changes", params={"survey_id": survey["id"]}).json()["next_cursor"]
+    with TestingSessionLocal() as db:
+        # A change a PostgreSQL writer committed but no reader has numbered yet
+        db.add(models.ResponseChange(response_id=1, survey_id=survey["id"], operation=INSERT, version=1))
+        record_changes(db, survey["id"], INSERT, [(2, 1), (3, 1)])
+        db.commit()
+        sequenced = [seq for seq, in db.query(models.ResponseChange.seq).filter(
+            models.ResponseChange.survey_id == survey["id"], models.ResponseChange.seq.isnot(None)
+        ).order_by(models.ResponseChange.seq)]
+    
+    feed = client.get("/changes", params={"after": start, "survey_id": survey["id"]}).json()
+    assert [change["seq"] for change in feed["changes"]] == sequenced
+    assert sequenced[1] == sequenced[0] + 1
+    assert [change["response_id"] for change in feed["changes"]] == [2, 3]
+
+def test_deleting_the_newest_response_does_not_free_its_id():
+    survey = create_test_survey()
+    newest = submit_test_response(survey["id"], "Removed").json()["response"]["id"]
+    assert client.delete(f"/responses/{newest}").status_code == 204
+    
+    replacement = submit_test_response(survey["id"], "Added").json()["response"]["id"]
+    assert replacement > newest
+    changes = client.get("/changes", params={"survey_id": survey["id"]}).json()["changes"]
+    assert [(c["operation"], c["response_id"]) for c in changes] == [
+        ("insert", newest), ("delete", newest), ("insert", replacement)
+    ]
+    assert changes[0]["response"] is None
+
+@pytest.fixture
+def job_results_dir(tmp_path, monkeypatch):
+    from app.config import settings
+    from app.services.jobs import job_runner
+    
+    # Pool processes read settings from the environment when they start
+    monkeypatch.setenv("JOB_RESULTS_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "JOB_RESULTS_DIR", str(tmp_path))
+    job_runner.shutdown()
+    yield tmp_path
+    job_runner.shutdown()
+
+def wait_for_job(job_id, timeout=60):
+    import time
+    
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed", "cancelled"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def test_export_and_bulk_import_jobs_run_in_the_job_pool(job_results_dir):
+    survey = create_test_survey()
+    submit_test_response(survey["id"], name="Exported")
+    
+    created = client.post("/jobs", json={"type": "export", "survey_id": survey["id"], "format": "csv"})
+    assert created.status_code == 202
+    assert created.headers["location"] == f"/jobs/{created.json()['id']}"
+    job = wait_for_job(created.json()["id"])
+    assert (job["status"], job["progress"], job["result"]) == ("succeeded", 1.0, {"rows": 1})
+    download = client.get(job["result_url"])
+    assert "Exported" in download.text
+    for path in job_results_dir.iterdir():
+        path.unlink()
+    assert client.get(job["result_url"]).status_code == 410
+    
+    imported = client.post("/jobs", json={"type": "bulk_import", "survey_id": survey["id"], "responses": [
+        bulk_row("Imported"), {"user_id": 1, "answers": []}
+    ]}).json()
+    assert "responses" not in imported["params"]
+    job = wait_for_job(imported["id"])
+    assert job["result"] == {"accepted": 1, "rejected": 1}
+    assert [json.loads(line)["status"] for line in client.get(job["result_url"]).text.splitlines()] == [
+        "accepted", "rejected"
+    ]
+    assert count_survey_responses(survey["id"]) == 2
+    
+    assert client.post("/jobs", json={"type": "export", "survey_id": 99999}).status_code == 404
+    assert client.post("/jobs", json={"type": "unknown"}).status_code == 422
+
+def test_rebuild_stats_job_succeeds_and_restores_counters(job_results_dir):
+    survey = create_test_survey()
+    submit_test_response(survey["id"], name="Counted")
+    submit_test_response(survey["id"], name="Counted again")
+    with TestingSessionLocal() as db:
+        db.query(models.SurveyStat).filter(models.SurveyStat.survey_id == survey["id"]).delete()
+        db.commit()
+    assert client.get(f"/surveys/{survey['id']}/summary").json()["total_responses"] == 0
+    
+    created = client.post("/jobs", json={"type": "rebuild_stats", "survey_id": survey["id"]}).json()
+    job = wait_for_job(created["id"])
+    assert (job["status"], job["error"]) == ("succeeded", None)
+    assert job["result"]["counters"] > 0
+    assert client.get(job["result_url"]).json() == job["result"]
+    survey_cache.invalidate(survey["id"])
+    assert client.get(f"/surveys/{survey['id']}/summary").json()["total_responses"] == 2
+
+def test_jobs_over_their_type_limit_wait_and_can_be_cancelled(job_results_dir, monkeypatch):
+    from app.services.jobs import job_runner
+    
+    monkeypatch.setitem(job_runner.type_limits, "rebuild_stats", 0)
+    job = client.post("/jobs", json={"type": "rebuild_stats"}).json()
+    assert client.get(f"/jobs/{job['id']}").json()["status"] == "queued"
+    assert client.get(f"/jobs/{job['id']}/result").status_code == 409
+    
+    cancelled = client.post(f"/jobs/{job['id']}/cancel").json()
+    assert (cancelled["status"], cancelled["cancel_requested"]) == ("cancelled", True)
+    assert client.post(f"/jobs/{job['id']}/cancel").status_code == 409
+
+def test_jobs_are_claimed_once_and_only_silent_running_jobs_are_failed():
+    from datetime import timedelta
+    from app.services.jobs import JobRunner, _claim
+    
+    now = models.utcnow()
+    with TestingSessionLocal() as db:
+        queued, live, silent = jobs = [
+            models.Job(job_type="rebuild_stats", status=status, params={}, heartbeat_at=heartbeat)
+            for status, heartbeat in (
+                ("queued", None), ("running", now), ("running", now - timedelta(hours=1))
+            )
+        ]
+        db.add_all(jobs)
+        db.commit()
+        
+        # Two workers handed the same job: only the first one runs it
+        assert _claim(db, queued.id) is True
+        assert _claim(db, queued.id) is False
+        
+        requeued = []
+        runner = JobRunner(1, {})
+        runner.submit = lambda job_id, job_type: requeued.append(job_id)
+        runner.recover(db)
+        db.expire_all()
+        assert (live.status, silent.status, silent.error) == ("running", "failed", "Worker stopped responding")
+        assert queued.id not in requeued
+
+def test_live_broadcaster_coalesces_updates_and_resyncs_slow_viewers():
+    import asyncio
+    from app.services.live import LiveBroadcaster
+    
+    broadcaster = LiveBroadcaster(interval=0.05, max_responses_per_frame=2, subscriber_buffer=1)
+    
+    def entry(response_id):
+        return {"response_id": response_id, "user_id": 1, "answers": {}}
+    
+    def frame_data(frame):
+        event, frame_id, data = frame.decode().strip().split("\n")
+        return event, frame_id, json.loads(data[len("data: "):])
+    
+    async def broadcast():
+        # Nobody watches survey 1: nothing is held or scheduled
+        broadcaster.publish(1, [entry(1)])
+        assert broadcaster._pending == {} and broadcaster._timers == {}
+        
+        queue = broadcaster.subscribe(1)
+        broadcaster.publish(1, [entry(2)])
+        broadcaster.publish(1, [entry(3), entry(4)])
+        await asyncio.sleep(0.1)
+        frames = [queue.get_nowait() for _ in range(queue.qsize())]
+        
+        # The viewer never reads this frame, so the next one finds its buffer full
+        broadcaster.publish(1, [entry(5)])
+        await asyncio.sleep(0.1)
+        broadcaster.publish(1, [entry(6)])
+        await asyncio.sleep(0.1)
+        frames.append(queue.get_nowait())
+        assert queue.empty()
+        
+        broadcaster.unsubscribe(1, queue)
+        assert broadcaster.subscriber_count(1) == 0
+        return frames
+    
+    coalesced, resync = asyncio.run(broadcast())
+    event, frame_id, data = frame_data(coalesced)
+    assert (event, frame_id) == ("event: responses", "id: 4")
+    assert data["count"] == 3 and data["cursor"] == 4 and data["truncated"] is True
+    assert [r["response_id"] for r in data["responses"]] == [2, 3]
+    event, frame_id, data = frame_data(resync)
+    assert (event, frame_id) == ("event: resync", "id: 6")
+    assert data == {"survey_id": 1, "cursor": 6}
+
+def test_live_endpoint_streams_a_snapshot_then_new_submissions(monkeypatch):
+    import asyncio
+    import httpx
+    from app.services.live import live_results
+    
+    survey = create_test_survey()
+    first = submit_test_response(survey["id"], "Before", 1).json()["response"]
+    monkeypatch.setattr(live_results, "interval", 0.05)
+    assert client.get("/surveys/999999/live").status_code == 404
+    
+    async def watch():
+        received = []
+        disconnected = asyncio.Event()
+        
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            received.append(message)
+        
+        scope = {
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": f"/surveys/{survey['id']}/live", "raw_path": b"", "root_path": "",
+            "query_string": b"", "headers": [], "server": ("test", 80), "client": ("test", 1),
+        }
+        stream = asyncio.ensure_future(app(scope, receive, send))
+        
+        def body():
+            return b"".join(m.get("body", b"") for m in received if m["type"] == "http.response.body")
+        
+        while b"event: snapshot" not in body():
+            await asyncio.sleep(0.01)
+        assert live_results.subscriber_count(survey["id"]) == 1
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            created = await asyncio.gather(*(
+                async_client.post("/responses/", json=idempotent_submission(survey["id"], name=f"Live {i}"))
+                for i in range(2)
+            ))
+        while b"event: responses" not in body():
+            await asyncio.sleep(0.01)
+        disconnected.set()
+        await stream
+        return received[0], body(), [r.json()["response"]["id"] for r in created]
+    
+    start, body, created_ids = asyncio.run(watch())
+    assert start["status"] == 200
+    assert dict(start["headers"])[b"content-type"].startswith(b"text/event-stream")
+    snapshot, update = body.decode().strip().split("\n\n")[:2]
+    assert json.loads(snapshot.split("data: ")[1]) == {
+        "survey_id": survey["id"], "total_responses": 1, "cursor": first["id"]
+    }
+    data = json.loads(update.split("data: ")[1])
+    assert data["count"] == 2 and data["cursor"] == max(created_ids)
+    assert sorted(r["answers"]["What is your name?"] for r in data["responses"]) == ["Live 0", "Live 1"]
+    assert live_results.subscriber_count(survey["id"]) == 0
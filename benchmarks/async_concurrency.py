@@ -0,0 +1,120 @@
+"""Concurrency load test for the survey API.
+
+Starts uvicorn against a throwaway SQLite database and measures requests per
+second for survey reads and response submissions at increasing concurrency.
+Run it from the project root on two checkouts to compare handler models:
+
+    python benchmarks/async_concurrency.py --concurrency 1 16 64 256
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ANSWERS = [
+    {"question_text": "Name?", "question_type": "short_text", "answer": "Load Test"},
+    {"question_text": "Years?", "question_type": "number", "answer": 7},
+    {"question_text": "Language?", "question_type": "multiple_choice", "answer": "Python"},
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, database_url: str) -> subprocess.Popen:
+    env = dict(os.environ, DATABASE_URL=database_url)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/users/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def run_level(client, concurrency, requests_per_worker, make_request):
+    latencies = []
+
+    async def worker():
+        for _ in range(requests_per_worker):
+            started = time.perf_counter()
+            response = await make_request()
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+async def main(args) -> None:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        await wait_until_ready(client)
+        survey = (await client.post("/surveys/", json={
+            "title": "Load test",
+            "questions": [
+                {"question_text": "Name?", "question_type": "short_text", "order": 1},
+                {"question_text": "Years?", "question_type": "number", "order": 2},
+                {"question_text": "Language?", "question_type": "multiple_choice",
+                 "options": '["Python", "Go"]', "order": 3},
+            ],
+        })).json()
+
+        scenarios = {
+            "submit response": lambda: client.post(
+                "/responses/", json={"survey_id": survey["id"], "user_id": 1, "answers": ANSWERS}
+            ),
+            "list responses": lambda: client.get(f"/responses/{survey['id']}", params={"limit": 50}),
+        }
+        for name, make_request in scenarios.items():
+            for concurrency in args.concurrency:
+                result = await run_level(client, concurrency, args.requests, make_request)
+                print(
+                    f"{name:16} concurrency={concurrency:<4} "
+                    f"rps={result['rps']:8.1f} p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=20, help="Requests per concurrent client")
+    parser.add_argument("--base-url", help="Benchmark an already running server instead")
+    args = parser.parse_args()
+
+    server = None
+    if args.base_url is None:
+        database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        port = free_port()
+        args.base_url = f"http://127.0.0.1:{port}"
+        server = start_server(port, f"sqlite:///{database.name}")
+    try:
+        asyncio.run(main(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+            os.unlink(database.name)
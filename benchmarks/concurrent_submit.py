@@ -0,0 +1,103 @@
+"""Concurrent response submissions against SQLite, default engine vs tuned engine.
+
+Each worker thread commits one response per transaction through the same
+write path as POST /responses/. The "default" engine is a bare create_engine();
+the "tuned" engine adds the Settings-driven pool options and the WAL /
+synchronous=NORMAL / busy_timeout connect hook.
+
+    python benchmarks/concurrent_submit.py --threads 16 --submits 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, configure_engine, engine_options
+from app.schemas import schemas
+from app.services import surveys as survey_service
+from app.services.ingest import insert_responses
+from app.services.validation import get_survey_validator
+from app.models import models
+
+ANSWERS = [
+    schemas.QuestionAnswer(question_text="Name?", question_type="short_text", answer="Bench"),
+    schemas.QuestionAnswer(question_text="Years?", question_type="number", answer=3),
+]
+
+
+def build_engine(url: str, tuned: bool):
+    if tuned:
+        return configure_engine(create_engine(url, **engine_options(url)))
+    # Sqlite's default 5 second lock timeout is what requests run into today
+    return create_engine(url)
+
+
+def run(tuned: bool, threads: int, submits: int) -> dict:
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    url = f"sqlite:///{path}"
+    engine = build_engine(url, tuned)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        survey_id = survey_service.create_survey(db, schemas.SurveyCreate(title="Bench", questions=[
+            {"question_text": "Name?", "question_type": "short_text"},
+            {"question_text": "Years?", "question_type": "number"},
+        ]))
+        db.commit()
+        validator = get_survey_validator(db, db.get(models.Survey, survey_id))
+
+    committed = 0
+    locked = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal committed, locked
+        for _ in range(submits):
+            with Session() as db:
+                try:
+                    insert_responses(db, validator, [(1, validator.validate(ANSWERS))])
+                    db.commit()
+                    with lock:
+                        committed += 1
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        locked += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.unlink(path + suffix)
+    return {"submits_per_sec": committed / elapsed, "committed": committed, "locked_errors": locked}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--submits", type=int, default=50, help="Submissions per thread")
+    args = parser.parse_args()
+
+    for label, tuned in (("default", False), ("tuned", True)):
+        result = run(tuned, args.threads, args.submits)
+        print(
+            f"{label:8} {result['submits_per_sec']:8.1f} submits/s "
+            f"committed={result['committed']} locked={result['locked_errors']}"
+        )
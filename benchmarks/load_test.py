@@ -0,0 +1,255 @@
+"""Load-test harness for the survey API.
+
+Seeds a scratch SQLite database with configurable volumes, starts uvicorn on
+it and drives the real ASGI app with concurrent httpx clients. For every
+scenario and concurrency level it reports RPS and p50/p95/p99 latency, and
+writes the full results as JSON so runs can be diffed for regressions:
+
+    python benchmarks/load_test.py --users 10000 --surveys 100 --questions 10 \\
+        --responses 1000000 --concurrency 1 16 64 --output results.json
+
+Seeding goes through the same insert path as the API (normalized answers and
+summary counters included), so large volumes take a while; pass --database
+to reuse an already seeded file across runs.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base, configure_engine
+from app.models import models
+from app.schemas import schemas
+from app.services.ingest import insert_responses
+from app.services.surveys import create_survey
+from app.services.validation import get_survey_validator
+
+from async_concurrency import free_port, start_server, wait_until_ready
+
+SEED_CHUNK_SIZE = 10000
+LANGUAGES = ["Python", "Java", "Go", "Rust", "TypeScript"]
+QUESTION_TYPES = ["number", "multiple_choice", "date", "checkbox", "long_text"]
+SCENARIOS = ("create survey", "fetch survey", "submit response", "list responses")
+
+
+def question_specs(count: int):
+    """A mix of every aggregated question type, cycled to the requested count"""
+    specs = []
+    for index in range(count):
+        question_type = QUESTION_TYPES[index % len(QUESTION_TYPES)]
+        options = json.dumps(LANGUAGES) if question_type in ("multiple_choice", "checkbox") else None
+        specs.append({
+            "question_text": f"Question {index}?",
+            "question_type": question_type,
+            "options": options,
+            "order": index,
+        })
+    return specs
+
+
+def random_answers(rng: random.Random, specs):
+    answers = []
+    for spec in specs:
+        question_type = spec["question_type"]
+        if question_type == "number":
+            answer = rng.randint(18, 80)
+        elif question_type == "multiple_choice":
+            answer = rng.choice(LANGUAGES)
+        elif question_type == "checkbox":
+            answer = rng.sample(LANGUAGES, rng.randint(1, 3))
+        elif question_type == "date":
+            answer = (datetime.date(2024, 1, 1) + datetime.timedelta(days=rng.randrange(365))).isoformat()
+        else:
+            answer = f"Free text answer {rng.randrange(1000)}"
+        answers.append({"question_text": spec["question_text"], "question_type": question_type, "answer": answer})
+    return answers
+
+
+def seed(database_url: str, users: int, surveys: int, questions: int, responses: int) -> None:
+    engine = create_engine(database_url)
+    configure_engine(engine)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(0)
+    specs = question_specs(questions)
+
+    with Session() as db:
+        if db.scalar(select(models.Survey.id).limit(1)) is not None:
+            print("Database already seeded, reusing it")
+            return
+
+        started = time.perf_counter()
+        for offset in range(0, users, SEED_CHUNK_SIZE):
+            db.execute(insert(models.User.__table__), [
+                {"email": f"user{i}@example.com", "username": f"user{i}", "full_name": f"User {i}", "password": ""}
+                for i in range(offset, min(offset + SEED_CHUNK_SIZE, users))
+            ])
+        survey_ids = [
+            create_survey(db, schemas.SurveyCreate(title=f"Survey {i}", questions=specs))
+            for i in range(surveys)
+        ]
+        db.commit()
+
+        validators = [get_survey_validator(db, db.get(models.Survey, survey_id)) for survey_id in survey_ids]
+        for offset in range(0, responses, SEED_CHUNK_SIZE):
+            by_survey = {}
+            for _ in range(offset, min(offset + SEED_CHUNK_SIZE, responses)):
+                validator = rng.choice(validators)
+                answers = [schemas.QuestionAnswer(**answer) for answer in random_answers(rng, specs)]
+                by_survey.setdefault(validator, []).append((rng.randrange(max(users, 1)) + 1, validator.validate(answers)))
+            for validator, rows in by_survey.items():
+                insert_responses(db, validator, rows)
+            db.commit()
+        print(
+            f"Seeded {users} users, {surveys} surveys x {questions} questions and "
+            f"{responses} responses in {time.perf_counter() - started:.1f}s"
+        )
+    engine.dispose()
+
+
+def percentile(latencies, percent: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(int(len(latencies) * percent / 100 + 0.5), 1)
+    return latencies[min(rank, len(latencies)) - 1]
+
+
+async def run_level(concurrency: int, requests_per_worker: int, make_request):
+    latencies = []
+    errors = 0
+
+    async def worker(rng):
+        nonlocal errors
+        for _ in range(requests_per_worker):
+            started = time.perf_counter()
+            try:
+                response = await make_request(rng)
+                response.raise_for_status()
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(random.Random(seed)) for seed in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    result = {"concurrency": concurrency, "requests": len(latencies), "errors": errors, "seconds": elapsed,
+              "rps": len(latencies) / elapsed if elapsed else 0.0}
+    if latencies:
+        result.update({
+            "mean_ms": sum(latencies) / len(latencies) * 1000,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        })
+    return result
+
+
+async def run(args) -> list:
+    specs = question_specs(args.questions)
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        await wait_until_ready(client)
+        # Seeding creates the surveys first, so their ids are 1..surveys
+        survey_ids = list(range(1, args.surveys + 1))
+
+        scenarios = {
+            "create survey": lambda rng: client.post("/surveys/", json={
+                "title": "Load test survey", "questions": [{k: v for k, v in s.items() if v is not None} for s in specs],
+            }),
+            "fetch survey": lambda rng: client.get(f"/surveys/{rng.choice(survey_ids)}"),
+            "submit response": lambda rng: client.post("/responses/", json={
+                "survey_id": rng.choice(survey_ids),
+                "user_id": rng.randrange(max(args.users, 1)) + 1,
+                "answers": random_answers(rng, specs),
+            }),
+            "list responses": lambda rng: client.get(
+                f"/responses/{rng.choice(survey_ids)}", params={"limit": args.page_size}
+            ),
+        }
+
+        results = []
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                result = await run_level(concurrency, args.requests, scenarios[name])
+                result["scenario"] = name
+                results.append(result)
+                print(
+                    f"{name:16} concurrency={concurrency:<4} rps={result['rps']:8.1f} "
+                    f"p50={result.get('p50_ms', 0):7.1f}ms p95={result.get('p95_ms', 0):7.1f}ms "
+                    f"p99={result.get('p99_ms', 0):7.1f}ms errors={result['errors']}"
+                )
+        return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--surveys", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=10, help="Questions per survey")
+    parser.add_argument("--responses", type=int, default=100000, help="Responses seeded across all surveys")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=50, help="Requests per concurrent client")
+    parser.add_argument("--page-size", type=int, default=100, help="limit used by the list responses scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--database", help="SQLite file to seed or reuse (a temporary file by default)")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    temporary = args.database is None
+    path = args.database or tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+    database_url = f"sqlite:///{path}"
+    seed(database_url, args.users, args.surveys, args.questions, args.responses)
+
+    port = free_port()
+    args.base_url = f"http://127.0.0.1:{port}"
+    server = start_server(port, database_url)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        server.terminate()
+        server.wait()
+        if temporary:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.unlink(path + suffix)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "seed": {"users": args.users, "surveys": args.surveys, "questions": args.questions,
+                 "responses": args.responses},
+        "requests_per_client": args.requests,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
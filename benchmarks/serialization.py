@@ -0,0 +1,77 @@
+"""CPU cost of GET /responses/{survey_id} per 10k responses, with and without
+the FAST_JSON_RESPONSES path.
+
+Seeds a scratch SQLite database and calls the app in-process, paging through
+10k responses at a time, so the number reflects handler, ORM and serialization
+work rather than network overhead:
+
+    python benchmarks/serialization.py --responses 10000 --page-size 1000 --rounds 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def page_through(client, survey_id: int, page_size: int) -> int:
+    fetched = 0
+    after = None
+    while True:
+        params = {"limit": page_size}
+        if after is not None:
+            params["after"] = after
+        response = client.get(f"/responses/{survey_id}", params=params)
+        response.raise_for_status()
+        body = response.json()
+        fetched += len(body["responses"])
+        after = body["next_cursor"]
+        if after is None:
+            return fetched
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=10000)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+    # Import after DATABASE_URL is set so the app binds to the scratch database
+    from fastapi.testclient import TestClient
+    from app.config import settings
+    from app.main import app
+    from load_test import seed
+
+    try:
+        seed(os.environ["DATABASE_URL"], 100, 1, args.questions, args.responses)
+        client = TestClient(app)
+        page_through(client, 1, args.page_size)  # warm caches and the connection pool
+
+        results = {}
+        for fast in (False, True):
+            settings.FAST_JSON_RESPONSES = fast
+            timings = []
+            for _ in range(args.rounds):
+                started = time.process_time()
+                fetched = page_through(client, 1, args.page_size)
+                timings.append((time.process_time() - started) * 1000 * 10000 / fetched)
+            results[fast] = statistics.median(timings)
+            print(f"{'fast path' if fast else 'validated':10} cpu={results[fast]:8.1f}ms per 10k responses")
+        print(f"speedup: {results[False] / results[True]:.2f}x")
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
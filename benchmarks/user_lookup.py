@@ -0,0 +1,88 @@
+"""Latency of "responses by user for a survey" as the responses table grows.
+
+Seeds a scratch SQLite database in steps and times a keyset page of one
+user's responses for a survey, with and without the composite indexes.
+
+    python benchmarks/user_lookup.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base
+from app.models import models
+from app.services.responses import fetch_response_page
+
+SURVEYS = 50
+USERS = 5000
+LOOKUPS = 200
+
+
+def seed(engine, start: int, stop: int) -> None:
+    rng = random.Random(start)
+    table = models.Response.__table__
+    with engine.begin() as connection:
+        for offset in range(start, stop, 10000):
+            connection.execute(insert(table), [
+                {"survey_id": rng.randrange(SURVEYS), "user_id": rng.randrange(USERS), "response_data": {}, "version": 1}
+                for _ in range(offset, min(offset + 10000, stop))
+            ])
+
+
+def time_lookups(Session) -> float:
+    rng = random.Random(0)
+    timings = []
+    with Session() as db:
+        for _ in range(LOOKUPS):
+            survey_id, user_id = rng.randrange(SURVEYS), rng.randrange(USERS)
+            started = time.perf_counter()
+            fetch_response_page(db, survey_id, None, 50, user_id)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main(sizes) -> None:
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    index_ddl = [
+        (index.name, index) for index in models.Response.__table__.indexes
+        if index.name.startswith(("ix_responses_survey", "ix_responses_user"))
+    ]
+
+    seeded = 0
+    try:
+        for size in sorted(sizes):
+            seed(engine, seeded, size)
+            seeded = size
+            indexed = time_lookups(Session)
+
+            with engine.begin() as connection:
+                for name, _ in index_ddl:
+                    connection.execute(text(f"DROP INDEX {name}"))
+            unindexed = time_lookups(Session)
+            with engine.begin() as connection:
+                for _, index in index_ddl:
+                    index.create(connection)
+
+            print(f"rows={size:>9}  indexed p50={indexed:7.3f}ms  without indexes p50={unindexed:8.3f}ms")
+    finally:
+        engine.dispose()
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 500000])
+    main(parser.parse_args().sizes)
@@ -0,0 +1,85 @@
+"""POST /responses/ throughput with one commit per request vs the write-behind
+group commit (WRITE_BEHIND_ENABLED).
+
+Calls the app in-process against a scratch SQLite database with many
+concurrent submitters, so the difference is the number of commits (and disk
+flushes) rather than network overhead. Run with synchronous=FULL to see the
+fsync-bound case:
+
+    python benchmarks/write_behind.py --concurrency 64 --submits 20
+    SQLITE_PERFORMANCE_MODE=false python benchmarks/write_behind.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+ANSWERS = [
+    {"question_text": "Name?", "question_type": "short_text", "answer": "Write behind"},
+    {"question_text": "Years?", "question_type": "number", "answer": 7},
+]
+
+
+async def submit_all(app, survey_id: int, concurrency: int, submits: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def worker():
+            for _ in range(submits):
+                response = await client.post(
+                    "/responses/", json={"survey_id": survey_id, "user_id": 1, "answers": ANSWERS}
+                )
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return concurrency * submits / (time.perf_counter() - started)
+
+
+async def run(args) -> None:
+    from app.config import settings
+    from app.main import app
+    from app.services.write_behind import response_writer
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        survey = (await client.post("/surveys/", json={"title": "Write behind", "questions": [
+            {"question_text": "Name?", "question_type": "short_text", "order": 1},
+            {"question_text": "Years?", "question_type": "number", "order": 2},
+        ]})).json()
+
+    results = {}
+    for enabled in (False, True):
+        settings.WRITE_BEHIND_ENABLED = enabled
+        await submit_all(app, survey["id"], args.concurrency, 1)  # warm up
+        results[enabled] = await submit_all(app, survey["id"], args.concurrency, args.submits)
+        await response_writer.stop()
+        label = "write-behind" if enabled else "per-request"
+        print(f"{label:13} {results[enabled]:8.1f} submits/s")
+    print(f"speedup: {results[True] / results[False]:.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--submits", type=int, default=20, help="Submissions per concurrent client")
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    # Set before importing the app so it binds to the scratch database
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    try:
+        asyncio.run(run(args))
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.unlink(path + suffix)
+
+
+if __name__ == "__main__":
+    main()